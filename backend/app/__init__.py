@@ -5,7 +5,17 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import config
-from app.models import db
+from app.models import db, User
+from app.user_purge import user_purger
+from app.compression import compressor
+from app.cache import response_cache
+from app.db_tuning import engine_options, init_db_tuning
+from app.replica import replica_router
+from app.metrics import metrics
+from app.query_budget import init_query_budget
+from app.tracing import tracer, span
+from app.admission import admission, admission_class
+from app.db_budget import db_time_budget
 
 
 def create_app(config_name='default'):
@@ -14,11 +24,35 @@ def create_app(config_name='default'):
     
     # Load config
     app.config.from_object(config[config_name])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     
     # Initialize extensions
     CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
-    JWTManager(app)
+    jwt = JWTManager(app)
+    
+    @jwt.user_lookup_loader
+    def load_active_user(jwt_header, jwt_data):
+        # Every token is checked against the account, so a deleted or deactivated
+        # user loses access at once rather than when the token expires
+        with span('auth'):
+            user = db.session.get(User, jwt_data['sub'])
+        return user if user is not None and user.status == 'active' else None
+    
+    @jwt.user_lookup_error_loader
+    def inactive_user(jwt_header, jwt_data):
+        return jsonify({'error': 'Account is not active'}), 401
+    
+    # First, so its after_request hook runs last and times the whole response
+    tracer.init_app(app)
+    replica_router.init_app(app)
     db.init_app(app)
+    metrics.init_app(app)
+    init_query_budget(app)
+    admission.init_app(app)
+    db_time_budget.init_app(app)
+    user_purger.init_app(app)
+    compressor.init_app(app)
+    response_cache.init_app(app)
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -26,42 +60,40 @@ def create_app(config_name='default'):
     from app.routes.analytics import analytics_bp
     from app.routes.tasks import tasks_bp
     from app.routes.announcements import announcements_bp
+    from app.routes.dashboard import dashboard_bp
+    from app.routes.system import system_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(analytics_bp)
     app.register_blueprint(tasks_bp)
     app.register_blueprint(announcements_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(system_bp)
+    
+    # CLI commands
+    from app.commands import register_commands
+    register_commands(app)
     
-    # Create database tables
     with app.app_context():
-        db.create_all()
+        # SQLite pragmas must be in place before the first connection
+        init_db_tuning(app, db)
+        
+        # With FAST_START these are one-off `flask init-db` / `flask create-admin` steps
+        if not app.config['FAST_START']:
+            from app.bootstrap import init_schema, create_default_admin, DEFAULT_ADMIN_PASSWORD
+            init_schema(app)
+            admin = create_default_admin()
+            if admin:
+                print(f"Default admin user created: {admin.email} / {DEFAULT_ADMIN_PASSWORD}")
         
-        # Create default admin user if not exists
-        from app.models import User
-        admin = User.query.filter_by(email='admin@ainsight.ai').first()
-        if not admin:
-            admin = User(
-                email='admin@ainsight.ai',
-                username='admin',
-                full_name='System Administrator',
-                role='admin',
-                status='active'
-            )
-            admin.set_password('admin123')  # Change this in production!
-            admin.set_permissions({
-                'document_summary': True,
-                'email_draft': True,
-                'code_assist': True,
-                'voice_notes': True,
-                'chat': True
-            })
-            db.session.add(admin)
-            db.session.commit()
-            print("Default admin user created: admin@ainsight.ai / admin123")
+        # Finish purges interrupted by a restart, from the first request on: a master
+        # that preloads the app must not start threads before forking its workers
+        user_purger.resume(background=True)
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
+    @admission_class(None)
     def health_check():
         return jsonify({
             'status': 'healthy',
@@ -71,6 +103,7 @@ def create_app(config_name='default'):
     
     # Root endpoint
     @app.route('/', methods=['GET'])
+    @admission_class(None)
     def root():
         return jsonify({
             'message': 'Welcome to AInSight API',
@@ -81,7 +114,8 @@ def create_app(config_name='default'):
                 'users': '/api/users/*',
                 'analytics': '/api/analytics/*',
                 'tasks': '/api/tasks/*',
-                'announcements': '/api/announcements/*'
+                'announcements': '/api/announcements/*',
+                'dashboard': '/api/dashboard/*'
             }
         }), 200
     
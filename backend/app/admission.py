@@ -0,0 +1,217 @@
+"""
+Admission control: concurrency limits per endpoint class
+
+Every view belongs to an endpoint class: the one given with
+@admission_class, or ADMISSION_DEFAULT_CLASS. ADMISSION_CLASSES sets,
+per class, how many of its requests a process serves at once, how many
+more may wait for a slot, and how long one may wait. A request that
+finds the queue full, or is still queued at its deadline, is shed with
+a 503 and a Retry-After header. Classes not listed, and views marked
+@admission_class(None), are never limited.
+
+Limits are per process: with the production server each worker admits
+up to `limit` requests of a class. A queued request holds its worker
+thread while it waits, so the limits are fitted to the SERVER_THREADS
+of a worker: a class limited to fewer requests than there are threads
+(heavy) keeps at least one thread free with its running and queued
+requests together, so a burst of heavy admin exports cannot starve
+ingest and login traffic, and no class admits more requests than there
+are threads.
+"""
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, jsonify, request
+from app.metrics import metrics
+from app.tracing import span
+
+# Set on views marked @admission_class(None)
+EXEMPT = 'exempt'
+
+
+class AdmissionGate:
+    """A counting semaphore with a bounded, deadline-limited wait queue"""
+    
+    def __init__(self, name, limit, queue, wait_s):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.wait_s = wait_s
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.wait_seconds = 0.0
+        self.shed = Counter()
+    
+    def acquire(self):
+        """True once a slot is held; False if the request was shed"""
+        with self._cond:
+            # Queued requests go first
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue:
+                self.shed['queue_full'] += 1
+                return False
+            
+            started = time.monotonic()
+            deadline = started + self.wait_s
+            self.waiting += 1
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed['queue_timeout'] += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+                self.wait_seconds += time.monotonic() - started
+    
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+    
+    def get_stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'queue': self.queue,
+                'wait_ms': round(self.wait_s * 1000),
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'queue_wait_seconds': round(self.wait_seconds, 6),
+                'shed': dict(self.shed),
+            }
+
+
+def parse_classes(value):
+    # 'heavy=2/2/5000,ingest=32/64/250' -> {class: (limit, queue, wait ms)}
+    classes = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, spec = item.partition('=')
+        limit, queue, wait_ms = (int(part) for part in spec.split('/'))
+        classes[name.strip()] = (limit, queue, wait_ms)
+    return classes
+
+
+def fit_classes(classes, threads):
+    """Fit parsed class limits to the threads of a worker"""
+    fitted = {}
+    for name, (limit, queue, wait_ms) in classes.items():
+        if limit >= threads:
+            limit = threads
+        else:
+            # Running and queued requests together leave a thread to the other classes
+            queue = max(min(queue, threads - 1 - limit), 0)
+        fitted[name] = (limit, queue, wait_ms)
+    return fitted
+
+
+def admission_class(name):
+    """Put a view in an endpoint class; None exempts it from admission control.
+    
+    Apply it directly below the route decorator.
+    """
+    def decorator(fn):
+        fn.admission_class = EXEMPT if name is None else name
+        return fn
+    return decorator
+
+
+class AdmissionController:
+    """Admits or sheds each request by its view's endpoint class"""
+    
+    def __init__(self):
+        self.gates = {}
+    
+    def init_app(self, app):
+        if not app.config['ADMISSION_ENABLED']:
+            return
+        self.build_gates(app, app.config['SERVER_THREADS'])
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        metrics.add_collector(self.samples)
+    
+    def build_gates(self, app, threads):
+        """(Re)create the gates from ADMISSION_CLASSES for workers with this many threads"""
+        classes = parse_classes(app.config['ADMISSION_CLASSES'])
+        fitted = fit_classes(classes, threads)
+        for name, (limit, queue, wait_ms) in fitted.items():
+            if (limit, queue) != classes[name][:2] and classes[name][0] < threads:
+                app.logger.warning(
+                    'Admission class %s: queue lowered from %d to %d to leave a thread of %d to other classes',
+                    name, classes[name][1], queue, threads
+                )
+        self.gates = {
+            name: AdmissionGate(name, limit, queue, wait_ms / 1000)
+            for name, (limit, queue, wait_ms) in fitted.items()
+        }
+    
+    def _before_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        if view is None:
+            return None
+        name = getattr(view, 'admission_class', current_app.config['ADMISSION_DEFAULT_CLASS'])
+        gate = self.gates.get(name)
+        if gate is None:
+            return None
+        
+        with span('admission.wait', endpoint_class=name):
+            admitted = gate.acquire()
+        if not admitted:
+            return self._shed(gate)
+        g.admission_gate = gate
+        return None
+    
+    def _after_request(self, response):
+        # A streamed body is still being produced; hold the slot until it is written
+        if response.is_streamed:
+            gate = g.pop('admission_gate', None)
+            if gate is not None:
+                response.call_on_close(gate.release)
+        return response
+    
+    def _teardown_request(self, exc):
+        gate = g.pop('admission_gate', None)
+        if gate is not None:
+            gate.release()
+    
+    def _shed(self, gate):
+        return jsonify({
+            'error': 'Server busy, retry later',
+            'endpoint_class': gate.name,
+        }), 503, {'Retry-After': str(current_app.config['ADMISSION_RETRY_AFTER_S'])}
+    
+    def get_stats(self):
+        return {name: gate.get_stats() for name, gate in self.gates.items()}
+    
+    def samples(self):
+        """Queue depth, in-flight, admitted and shed counts for the metrics endpoint"""
+        samples = []
+        for name, stats in self.get_stats().items():
+            labels = {'class': name}
+            samples += [
+                ('admission_in_flight', 'gauge', 'Requests holding an admission slot', labels, stats['active']),
+                ('admission_queue_depth', 'gauge', 'Requests waiting for an admission slot', labels, stats['waiting']),
+                ('admission_admitted_total', 'counter', 'Requests admitted', labels, stats['admitted']),
+                ('admission_queue_wait_seconds_total', 'counter', 'Time requests spent queued for a slot',
+                 labels, stats['queue_wait_seconds']),
+            ]
+            for reason in ('queue_full', 'queue_timeout'):
+                samples.append((
+                    'admission_shed_total', 'counter', 'Requests rejected with 503',
+                    {**labels, 'reason': reason}, stats['shed'].get(reason, 0)
+                ))
+        return samples
+
+
+admission = AdmissionController()
@@ -0,0 +1,60 @@
+"""
+Database bootstrap: schema and the default admin user
+
+create_app() runs these on every start unless FAST_START is set. In that
+mode they are one-off deployment steps instead:
+
+    flask init-db          create tables, add missing columns and indexes,
+                           backfill permission bitmasks
+    flask create-admin     create the default admin user
+"""
+from app.models import db, User
+from app.migrations import add_missing_columns, backfill_permission_bits
+from app.search import init_user_search
+
+DEFAULT_ADMIN_EMAIL = 'admin@ainsight.ai'
+DEFAULT_ADMIN_PASSWORD = 'admin123'  # Change this in production!
+
+
+def init_schema(app):
+    """Bring the database schema up to date (idempotent); returns the columns added"""
+    db.create_all()
+    
+    # Columns added to tables that already exist, and the permission bitmasks of
+    # rows that predate them (a no-op once every row is migrated)
+    added = add_missing_columns()
+    backfill_permission_bits()
+    
+    # create_all() skips indexes added to tables that already exist
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    
+    # Search index for the admin user listing
+    init_user_search(app)
+    return added
+
+
+def create_default_admin(email=DEFAULT_ADMIN_EMAIL, password=DEFAULT_ADMIN_PASSWORD):
+    """Create the admin user unless it exists; returns it if created"""
+    if User.query.filter_by(email=email).first():
+        return None
+    
+    admin = User(
+        email=email,
+        username='admin',
+        full_name='System Administrator',
+        role='admin',
+        status='active'
+    )
+    admin.set_password(password)
+    admin.set_permissions({
+        'document_summary': True,
+        'email_draft': True,
+        'code_assist': True,
+        'voice_notes': True,
+        'chat': True
+    })
+    db.session.add(admin)
+    db.session.commit()
+    return admin
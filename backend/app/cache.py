@@ -0,0 +1,399 @@
+"""
+Multi-level response cache with tag-based invalidation
+
+Views opt in with @cached(key, tags). Responses are kept in an in-process
+LRU with a TTL and, when CACHE_SHARED_PATH is set, in a SQLite file shared
+by every worker on the host. Write handlers call response_cache.invalidate()
+with the tags they touched after committing; with more than one worker the
+invalidation is also published on the bus (app/cache_bus.py) so the other
+workers evict their local copies.
+
+Every tag carries a generation counter. A computed response is only stored
+if none of its tags were invalidated while it was being computed, so a
+read that raced a write can never repopulate the cache with stale data.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity
+from app.wire import response_mimetype
+from app.cache_bus import InvalidationBus, CLEAR_ALL
+
+CachedResponse = namedtuple('CachedResponse', 'status headers body')
+
+
+class MemoryCache:
+    """In-process LRU level with per-entry TTL and a tag index"""
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.stats = Counter()
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tags = {}  # tag -> keys
+        self._versions = {}  # tag -> generation
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def versions(self, tags):
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                self.stats['expirations'] += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value, tags, ttl, versions):
+        """Store a value unless one of its tags was invalidated since versions was read"""
+        with self._lock:
+            if versions != tuple(self._versions.get(tag, 0) for tag in tags):
+                self.stats['stale_sets'] += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+            return True
+    
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+    
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+SQLITE_DDL = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    tags TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cache_tag_versions (
+    tag TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteCache:
+    """Shared level in a local SQLite file, visible to every worker process"""
+    
+    # Expired rows are swept every this many stores
+    SWEEP_INTERVAL = 100
+    
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = Counter()
+        self._local = threading.local()
+        self._sets = 0
+        self._connect().executescript(SQLITE_DDL)
+    
+    def _connect(self):
+        # Connections are per thread and are not carried across fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+    
+    def __len__(self):
+        return self._connect().execute('SELECT count(*) FROM cache_entries').fetchone()[0]
+    
+    def _versions(self, conn, tags):
+        if not tags:
+            return ()
+        rows = dict(conn.execute(
+            f"SELECT tag, version FROM cache_tag_versions WHERE tag IN ({','.join('?' * len(tags))})",
+            tags
+        ).fetchall())
+        return tuple(rows.get(tag, 0) for tag in tags)
+    
+    def versions(self, tags):
+        return self._versions(self._connect(), tags)
+    
+    def get(self, key):
+        """Return (value, tags, expires_at as a wall-clock time) or None"""
+        row = self._connect().execute(
+            'SELECT status, headers, body, tags, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[4] <= time.time():
+            self.stats['expirations'] += 1
+            return None
+        value = CachedResponse(row[0], [tuple(header) for header in json.loads(row[1])], row[2])
+        return value, tuple(json.loads(row[3])), row[4]
+    
+    def set(self, key, value, tags, ttl, versions):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if versions != self._versions(conn, tags):
+                conn.execute('ROLLBACK')
+                self.stats['stale_sets'] += 1
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)',
+                (key, value.status, json.dumps(value.headers), value.body, json.dumps(tags), time.time() + ttl)
+            )
+            conn.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+            conn.executemany('INSERT INTO cache_tags VALUES (?, ?)', [(tag, key) for tag in tags])
+            self._sets += 1
+            if self._sets % self.SWEEP_INTERVAL == 0:
+                self._sweep(conn)
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def _sweep(self, conn):
+        expired = conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),)).rowcount
+        self.stats['expirations'] += expired
+        # Past the size cap, drop the entries closest to expiry
+        excess = conn.execute('SELECT count(*) FROM cache_entries').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM cache_entries WHERE key IN '
+                '(SELECT key FROM cache_entries ORDER BY expires_at LIMIT ?)', (excess,)
+            )
+            self.stats['evictions'] += excess
+        conn.execute('DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)')
+    
+    def invalidate(self, tags):
+        conn = self._connect()
+        placeholders = ','.join('?' * len(tags))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO cache_tag_versions VALUES (?, 1) '
+                'ON CONFLICT(tag) DO UPDATE SET version = version + 1',
+                [(tag,) for tag in tags]
+            )
+            keys = f'SELECT key FROM cache_tags WHERE tag IN ({placeholders})'
+            conn.execute(f'DELETE FROM cache_entries WHERE key IN ({keys})', tags)
+            conn.execute(f'DELETE FROM cache_tags WHERE key IN ({keys})', tags)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def clear(self):
+        self._connect().executescript('DELETE FROM cache_entries; DELETE FROM cache_tags;')
+
+
+class ResponseCache:
+    """Local level in front of an optional shared level"""
+    
+    def __init__(self):
+        self.enabled = False
+        self.default_ttl = 60
+        self.local = MemoryCache(0)
+        self.shared = None
+        self.bus = None
+        self.stats = Counter()
+    
+    def init_app(self, app):
+        self.enabled = app.config['CACHE_ENABLED']
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        self.local = MemoryCache(app.config['CACHE_MAX_ENTRIES'])
+        path = app.config['CACHE_SHARED_PATH']
+        self.shared = SQLiteCache(path, app.config['CACHE_SHARED_MAX_ENTRIES']) if self.enabled and path else None
+        self.init_bus(app)
+    
+    def init_bus(self, app):
+        """(Re)connect the invalidation bus from CACHE_BUS_PATH or CACHE_SHARED_PATH"""
+        # Other workers' local levels learn about invalidations through the bus
+        bus_path = app.config['CACHE_BUS_PATH'] or app.config['CACHE_SHARED_PATH']
+        self.bus = None
+        if self.enabled and bus_path:
+            self.bus = InvalidationBus(
+                bus_path, app.config['CACHE_BUS_POLL_MS'],
+                app.config['CACHE_BUS_MAX_LAG_MS'], app.config['CACHE_BUS_RETENTION_S']
+            )
+            self.bus.subscribe(lambda tags: self.local.invalidate(tags), lambda: self.local.clear())
+    
+    def _local_usable(self):
+        # A worker that is behind on the bus may hold entries other workers invalidated
+        if self.bus is None or self.bus.is_current():
+            return True
+        self.stats['bus_bypasses'] += 1
+        return False
+    
+    def token(self, tags):
+        """Tag generations to read before computing a value that will be stored"""
+        return self.local.versions(tags), self.shared.versions(tags) if self.shared is not None else None
+    
+    def get(self, key, tags, token):
+        local_usable = self._local_usable()
+        value = self.local.get(key) if local_usable else None
+        if value is not None:
+            self.stats['hits'] += 1
+            return value
+        
+        found = self.shared.get(key) if self.shared is not None else None
+        if found is not None:
+            value, shared_tags, expires_at = found
+            # The local token predates this read, so an invalidation in between rejects the copy
+            if local_usable:
+                self.local.set(key, value, shared_tags, expires_at - time.time(), token[0])
+            self.stats['shared_hits'] += 1
+            return value
+        
+        self.stats['misses'] += 1
+        return None
+    
+    def set(self, key, value, tags, ttl, token):
+        stored = self._local_usable() and self.local.set(key, value, tags, ttl, token[0])
+        if self.shared is not None:
+            stored = self.shared.set(key, value, tags, ttl, token[1]) and stored
+        if stored:
+            self.stats['sets'] += 1
+        return stored
+    
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the tags, in every level"""
+        if not tags:
+            return
+        if not self.enabled:
+            # Nothing is cached, but coalesced results are keyed on tag generations
+            self.local.invalidate(tags)
+            return
+        # Shared level first: a local miss must never be refilled from a stale shared copy
+        if self.shared is not None:
+            self.shared.invalidate(tags)
+        self.local.invalidate(tags)
+        if self.bus is not None:
+            self.bus.publish(tags)
+        self.stats['invalidations'] += len(tags)
+    
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+        if self.bus is not None:
+            self.bus.publish((CLEAR_ALL,))
+    
+    def get_stats(self):
+        """Hit/miss/evict counters for every level"""
+        lookups = self.stats['hits'] + self.stats['shared_hits'] + self.stats['misses']
+        stats = {
+            'enabled': self.enabled,
+            'hits': self.stats['hits'],
+            'shared_hits': self.stats['shared_hits'],
+            'misses': self.stats['misses'],
+            'hit_ratio': round((lookups - self.stats['misses']) / lookups, 4) if lookups else None,
+            'sets': self.stats['sets'],
+            'invalidations': self.stats['invalidations'],
+            'local': {'entries': len(self.local), **self.local.stats},
+        }
+        if self.shared is not None:
+            stats['shared'] = {'entries': len(self.shared), **self.shared.stats}
+        if self.bus is not None:
+            stats['bus'] = self.bus.get_stats()
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def request_key(key, tags, view_args):
+    """Fill key and tag templates for the current request.
+    
+    Templates see the view arguments plus the caller's JWT identity as
+    current_user_id. The query string and the negotiated response format
+    are appended to the key.
+    """
+    params = dict(view_args, current_user_id=get_jwt_identity())
+    query = urlencode(sorted(request.args.items(multi=True)))
+    return f'{key.format(**params)}?{query}#{response_mimetype()}', tuple(tag.format(**params) for tag in tags)
+
+
+def snapshot(response):
+    """CachedResponse copy of a buffered response"""
+    headers = [(name, value) for name, value in response.headers if name != 'Content-Length']
+    return CachedResponse(response.status_code, headers, response.get_data())
+
+
+def restore(entry):
+    """Fresh response object from a CachedResponse"""
+    return current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+
+
+def cached(key, tags=(), ttl=None):
+    """Cache a view's 200 responses, invalidated by tag.
+    
+    key and tags are format strings filled by request_key(), e.g.
+    'tasks:user:{current_user_id}'. Apply it below
+    @jwt_required()/@admin_required so access is checked first.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled:
+                return fn(*args, **kwargs)
+            
+            entry_key, entry_tags = request_key(key, tags, kwargs)
+            token = response_cache.token(entry_tags)
+            hit = response_cache.get(entry_key, entry_tags, token)
+            if hit is not None:
+                response = restore(hit)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                entry_ttl = ttl or response_cache.default_ttl
+                # A replica read can predate writes whose invalidation already ran
+                if g.get('replica_read'):
+                    entry_ttl = min(entry_ttl, current_app.config['REPLICA_MAX_LAG_S'])
+                response_cache.set(entry_key, snapshot(response), entry_tags, entry_ttl, token)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
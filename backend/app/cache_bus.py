@@ -0,0 +1,155 @@
+"""
+Cross-worker cache invalidation bus
+
+Invalidated tags are appended to a change log in a SQLite file shared by
+the workers on a host. Each worker polls the log from a background thread
+and applies other workers' invalidations to its in-process cache level.
+A worker whose subscriber has not caught up within the lag bound stops
+serving from its local level until it has, so stale reads are bounded by
+CACHE_BUS_MAX_LAG_MS even if the thread stalls.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+SQLITE_DDL = """
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Published in place of tags when the whole cache is cleared
+CLEAR_ALL = '*'
+
+# Old log rows are pruned every this many polls
+PRUNE_INTERVAL = 200
+
+
+class InvalidationBus:
+    """Shared SQLite change log of invalidated cache tags"""
+    
+    def __init__(self, path, poll_interval_ms=50, max_lag_ms=1000, retention_s=300):
+        self.path = path
+        self.poll_interval = poll_interval_ms / 1000
+        self.max_lag = max_lag_ms / 1000
+        self.retention = retention_s
+        self.stats = Counter()
+        self.latencies = deque(maxlen=1024)
+        self._on_invalidate = None
+        self._on_clear = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._origin = None
+        self._last_poll = 0.0
+        conn = self._connect()
+        conn.executescript(SQLITE_DDL)
+        self._last_id = conn.execute('SELECT coalesce(max(id), 0) FROM cache_invalidations').fetchone()[0]
+    
+    def _connect(self):
+        # Connections are per thread and are not carried across fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+    
+    def subscribe(self, on_invalidate, on_clear):
+        """Set the callbacks applying remote invalidations to the local level"""
+        self._on_invalidate = on_invalidate
+        self._on_clear = on_clear
+    
+    def publish(self, tags):
+        """Broadcast invalidated tags to every other worker"""
+        self._ensure_worker()
+        self._connect().execute(
+            'INSERT INTO cache_invalidations (origin, tags, created_at) VALUES (?, ?, ?)',
+            (self._origin, json.dumps(list(tags)), time.time())
+        )
+        self.stats['published'] += 1
+    
+    def is_current(self):
+        """Whether this worker has applied the log recently enough to trust its local level"""
+        self._ensure_worker()
+        return time.monotonic() - self._last_poll <= self.max_lag
+    
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            # Threads do not survive fork; start one per process
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._origin = uuid.uuid4().hex
+                self._last_poll = 0.0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='cache-bus', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        polls = 0
+        while True:
+            try:
+                self.poll()
+                polls += 1
+                if polls % PRUNE_INTERVAL == 0:
+                    self._prune()
+            except Exception:
+                self.stats['errors'] += 1
+            time.sleep(self.poll_interval)
+    
+    def poll(self):
+        """Apply log entries published since the last poll"""
+        rows = self._connect().execute(
+            'SELECT id, origin, tags, created_at FROM cache_invalidations WHERE id > ? ORDER BY id',
+            (self._last_id,)
+        ).fetchall()
+        now = time.time()
+        
+        # Entries pruned before this worker read them: nothing local can be trusted
+        if rows and rows[0][0] > self._last_id + 1 and self._last_id:
+            self._on_clear()
+            self.stats['gaps'] += 1
+        
+        for row_id, origin, tags, created_at in rows:
+            if origin != self._origin:
+                tags = json.loads(tags)
+                if CLEAR_ALL in tags:
+                    self._on_clear()
+                else:
+                    self._on_invalidate(tags)
+                self.latencies.append(now - created_at)
+                self.stats['applied'] += 1
+            self._last_id = row_id
+        self._last_poll = time.monotonic()
+    
+    def _prune(self):
+        self._connect().execute(
+            'DELETE FROM cache_invalidations WHERE created_at < ?', (time.time() - self.retention,)
+        )
+    
+    def get_stats(self):
+        """Published/applied counters and propagation latency in milliseconds"""
+        latencies = sorted(self.latencies)
+        stats = {
+            **self.stats,
+            'lag_ms': round((time.monotonic() - self._last_poll) * 1000, 1) if self._last_poll else None,
+        }
+        if latencies:
+            stats['latency_ms'] = {
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p99': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1),
+            }
+        return stats
@@ -0,0 +1,128 @@
+"""
+Single-flight coalescing of identical expensive requests
+
+Concurrent identical requests to a coalesced view share one computation:
+the first caller runs the view and the others wait for its response. The
+response is then reused for a short TTL. Keys include the generations of
+the view's cache tags, so a write that invalidates those tags also starts
+a new flight instead of handing out the old result.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app, request
+from app.cache import response_cache, request_key, snapshot, restore
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class SingleFlight:
+    """In-flight computations and their recent results, per key"""
+    
+    def __init__(self, max_results=256):
+        self.max_results = max_results
+        self.stats = Counter()
+        self._flights = {}
+        self._results = OrderedDict()  # key -> (entry, expires_at)
+        self._lock = threading.Lock()
+    
+    def do(self, key, compute, ttl, timeout):
+        """Return compute()'s result for key, sharing it with concurrent callers"""
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                if result[1] > time.monotonic():
+                    self.stats['result_hits'] += 1
+                    return result[0]
+                del self._results[key]
+            
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            if flight.done.wait(timeout):
+                self.stats['coalesced'] += 1
+                if flight.error is not None:
+                    raise flight.error
+                return flight.entry
+            # The leader is taking too long; compute independently
+            self.stats['wait_timeouts'] += 1
+            return compute()
+        
+        self.stats['computed'] += 1
+        try:
+            flight.entry = compute()
+            return flight.entry
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and ttl > 0 and flight.entry.status == 200:
+                    self._results[key] = (flight.entry, time.monotonic() + ttl)
+                    while len(self._results) > self.max_results:
+                        self._results.popitem(last=False)
+            flight.done.set()
+    
+    def get_stats(self):
+        """Computed/coalesced/result-hit counters"""
+        with self._lock:
+            return {**self.stats, 'in_flight': len(self._flights), 'results': len(self._results)}
+
+
+single_flight = SingleFlight()
+
+
+def _parse_overrides(value):
+    # 'analytics.get_summary=5000,analytics.export_analytics=0' -> {endpoint: ms}
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, ms = item.partition('=')
+        overrides[endpoint.strip()] = int(ms)
+    return overrides
+
+
+def coalesced(key, tags=(), ttl_ms=None):
+    """Share one computation among concurrent identical requests to a view.
+    
+    key and tags are templates as for @cached. ttl_ms is how long the shared
+    response is reused afterwards (COALESCE_RESULT_TTL_MS by default); an
+    entry in COALESCE_TTL_OVERRIDES for the endpoint takes precedence, and 0
+    disables the result reuse. Apply it below the auth decorators.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if not config['COALESCE_ENABLED']:
+                return fn(*args, **kwargs)
+            
+            overrides = current_app.extensions.get('coalesce_overrides')
+            if overrides is None:
+                overrides = current_app.extensions['coalesce_overrides'] = _parse_overrides(
+                    config['COALESCE_TTL_OVERRIDES']
+                )
+            result_ttl = overrides.get(request.endpoint, ttl_ms)
+            if result_ttl is None:
+                result_ttl = config['COALESCE_RESULT_TTL_MS']
+            
+            flight_key, flight_tags = request_key(key, tags, kwargs)
+            generations = response_cache.local.versions(flight_tags)
+            
+            entry = single_flight.do(
+                (flight_key, generations),
+                lambda: snapshot(current_app.make_response(fn(*args, **kwargs))),
+                result_ttl / 1000, config['COALESCE_WAIT_TIMEOUT_S']
+            )
+            return restore(entry)
+        return wrapper
+    return decorator
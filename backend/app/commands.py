@@ -0,0 +1,137 @@
+"""
+Flask CLI commands
+"""
+import json
+import os
+import sys
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.user_import import PARSERS, import_users
+from app.migrations import add_missing_columns, backfill_permission_bits
+from app.replica import sync_sqlite_replica
+from app.bootstrap import init_schema, create_default_admin, DEFAULT_ADMIN_EMAIL
+from app.tracing import read_traces, summarize_traces
+
+
+@click.command('import-users')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(sorted(PARSERS)),
+              help='Input format (default: from the file extension)')
+@click.option('--chunk-size', default=500, show_default=True, help='Rows per transaction')
+@click.option('--workers', type=int, help='Password hashing processes (default: CPU count)')
+@with_appcontext
+def import_users_command(source, fmt, chunk_size, workers):
+    """Bulk import users from a CSV or NDJSON file ('-' for stdin)"""
+    if not fmt:
+        fmt = 'csv' if source.name.endswith('.csv') else 'ndjson'
+    workers = workers or current_app.config['IMPORT_HASH_WORKERS']
+    
+    created = failed = 0
+    for result in import_users(PARSERS[fmt](source), chunk_size=chunk_size, workers=workers):
+        if result['status'] == 'created':
+            created += 1
+        else:
+            failed += 1
+        click.echo(json.dumps(result))
+    
+    click.echo(f'Imported {created} users ({failed} failed)', err=True)
+    sys.exit(1 if failed and not created else 0)
+
+
+@click.command('migrate-permissions')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction')
+@with_appcontext
+def migrate_permissions_command(batch_size):
+    """Backfill permission bitmasks from the JSON permissions column"""
+    for column in add_missing_columns():
+        click.echo(f'Added column {column}')
+    migrated = backfill_permission_bits(batch_size)
+    click.echo(f'Migrated permissions for {migrated} users')
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables, columns and indexes"""
+    for column in init_schema(current_app):
+        click.echo(f'Added column {column}')
+    click.echo('Database initialized')
+
+
+@click.command('create-admin')
+@click.option('--email', default=DEFAULT_ADMIN_EMAIL, show_default=True)
+@click.password_option(help='Admin password (prompted for if not given)')
+@with_appcontext
+def create_admin_command(email, password):
+    """Create the default admin user if it does not exist"""
+    if create_default_admin(email, password):
+        click.echo(f'Admin user created: {email}')
+    else:
+        click.echo(f'Admin user already exists: {email}')
+
+
+@click.command('sync-replica')
+@click.option('--interval', type=float, help='Keep copying every this many seconds')
+@with_appcontext
+def sync_replica_command(interval):
+    """Copy the primary SQLite database to the replica file (local testing)"""
+    if 'replica' not in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+        raise click.UsageError('REPLICA_DATABASE_URL is not set')
+    try:
+        while True:
+            sync_sqlite_replica()
+            if not interval:
+                break
+            time.sleep(interval)
+    except ValueError as exc:
+        raise click.UsageError(str(exc))
+    click.echo('Replica synced')
+
+
+@click.command('traces')
+@click.option('--top', default=10, show_default=True, help='Entries per section')
+@click.option('--endpoint', help='Only traces of this endpoint (e.g. analytics.get_summary)')
+@click.option('--json', 'as_json', is_flag=True, help='Print the summary as JSON')
+@with_appcontext
+def traces_command(top, endpoint, as_json):
+    """Summarize the slow-request traces written by the tracer"""
+    directory = current_app.config['TRACE_DIR'] or os.path.join(current_app.instance_path, 'traces')
+    traces = read_traces(directory)
+    if endpoint:
+        traces = (trace for trace in traces if trace['endpoint'] == endpoint)
+    summary = summarize_traces(traces, top)
+    
+    if as_json:
+        click.echo(json.dumps(summary, indent=2))
+        return
+    if not summary['traces']:
+        click.echo(f'No traces in {directory}')
+        return
+    
+    click.echo(f"{summary['traces']} slow requests traced\n")
+    click.echo('Endpoints by total time:')
+    for item in summary['endpoints']:
+        click.echo(f"  {item['total_ms']:>10.1f} ms  {item['count']:>5}x  p50 {item['p50_ms']:>8.1f}  "
+                   f"p95 {item['p95_ms']:>8.1f}  max {item['max_ms']:>8.1f}  {item['endpoint']}")
+    click.echo('\nTime by span:')
+    for name, total in summary['spans']:
+        click.echo(f'  {total:>10.1f} ms  {name}')
+    click.echo('\nSQL statements by total time:')
+    for item in summary['statements']:
+        click.echo(f"  {item['total_ms']:>10.1f} ms  {item['count']:>5}x  max {item['max_ms']:>8.1f}  "
+                   f"{item['statement'][:120]}")
+    click.echo('\nSlowest requests:')
+    for item in summary['slowest']:
+        click.echo(f"  {item['duration_ms']:>10.1f} ms  {item['status']}  {item['method']} {item['path']}  {item['ts']}")
+
+
+def register_commands(app):
+    """Register CLI commands on the app"""
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(migrate_permissions_command)
+    app.cli.add_command(sync_replica_command)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(create_admin_command)
+    app.cli.add_command(traces_command)
@@ -0,0 +1,179 @@
+"""
+Response compression negotiated from Accept-Encoding
+
+gzip is always available; brotli and zstd are used when their packages are
+installed and the client prefers them. Bodies below the size threshold go
+out as-is, streamed responses are compressed chunk by chunk (flushed so
+each chunk still reaches the client promptly), and cacheable bodies are
+compressed once and served from a small LRU keyed by their digest.
+Compressed responses carry Vary: Accept-Encoding and a weakened ETag.
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'application/msgpack', 'application/x-msgpack',
+    'application/vnd.msgpack', 'application/cbor', 'text/csv',
+}
+
+# Levels tuned for dynamic content: most of the ratio for a fraction of the CPU
+DEFAULT_LEVELS = {'br': 4, 'zstd': 3, 'gzip': 6}
+
+
+def _gzip_stream(level):
+    obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return (lambda data: obj.compress(data) + obj.flush(zlib.Z_SYNC_FLUSH)), obj.flush
+
+
+def _brotli_stream(level):
+    obj = brotli.Compressor(quality=level)
+    return (lambda data: obj.process(data) + obj.flush()), obj.finish
+
+
+def _zstd_stream(level):
+    obj = zstandard.ZstdCompressor(level=level).compressobj()
+    return (lambda data: obj.compress(data) + obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)), obj.flush
+
+
+def _codecs():
+    # name -> (one-shot compress(body, level), streaming factory(level))
+    codecs = {'gzip': (lambda body, level: gzip.compress(body, compresslevel=level, mtime=0), _gzip_stream)}
+    if brotli is not None:
+        codecs['br'] = (lambda body, level: brotli.compress(body, quality=level), _brotli_stream)
+    if zstandard is not None:
+        codecs['zstd'] = (lambda body, level: zstandard.ZstdCompressor(level=level).compress(body), _zstd_stream)
+    return codecs
+
+
+CODECS = _codecs()
+
+
+class CompressedCache:
+    """LRU of compressed bodies bounded by their total size"""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+    
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def _compress_stream(source, chunks, push, finish):
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield push(chunk)
+        yield finish()
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def _mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag promises these exact bytes, and the encoded ones differ from the
+    # identity body; weakened, it still validates every encoding of the same content
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+class Compressor:
+    """after_request hook compressing responses the client can decode"""
+    
+    def __init__(self):
+        self.cache = CompressedCache(0)
+        self.encodings = ()
+        self.min_size = 0
+    
+    def init_app(self, app):
+        if not app.config['COMPRESSION_ENABLED']:
+            return
+        preferred = [name.strip() for name in app.config['COMPRESSION_ALGORITHMS'].split(',')]
+        self.encodings = tuple(name for name in preferred if name in CODECS)
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.cache = CompressedCache(app.config['COMPRESSION_CACHE_BYTES'])
+        app.after_request(self.process)
+    
+    def process(self, response):
+        """Compress a response in place when worthwhile"""
+        if (response.mimetype not in COMPRESSIBLE_TYPES and not response.mimetype.startswith('text/')) \
+                or response.direct_passthrough or 'Content-Encoding' in response.headers \
+                or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+        compress, stream = CODECS[encoding]
+        level = DEFAULT_LEVELS[encoding]
+        
+        # Streamed bodies have no known size; compress them as they are produced
+        if response.is_streamed:
+            push, finish = stream(level)
+            response.response = _compress_stream(response.response, response.iter_encoded(), push, finish)
+            response.headers.pop('Content-Length', None)
+            _mark_encoded(response, encoding)
+            return response
+        
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        
+        cacheable = request.method == 'GET' and response.status_code == 200 \
+            and 'no-store' not in response.headers.get('Cache-Control', '')
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding) if cacheable else None
+        compressed = self.cache.get(key) if cacheable else None
+        if compressed is None:
+            compressed = compress(body, level)
+            if cacheable:
+                self.cache.put(key, compressed)
+        
+        if len(compressed) >= len(body):
+            return response
+        response.set_data(compressed)
+        _mark_encoded(response, encoding)
+        return response
+
+
+compressor = Compressor()
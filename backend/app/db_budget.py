@@ -0,0 +1,214 @@
+"""
+Per-request database time budgets
+
+Each view gets a budget: its entry in DB_BUDGET_OVERRIDES, else the one
+given with @db_budget, else DB_BUDGET_DEFAULT_MS (0 = no limit). The
+clock starts at the request's first SQL statement; once the budget is
+spent the statement running is cancelled by the database and later ones
+are refused, and the request fails with a structured 503 instead of
+holding a worker and a pooled connection for minutes.
+
+How a running statement is cancelled depends on the backend:
+- SQLite: a progress handler, called every DB_BUDGET_SQLITE_STEPS
+  virtual machine steps, interrupts it after the deadline (fetching rows
+  included).
+- PostgreSQL: statement_timeout is set to the remaining budget on the
+  request's first statement on a connection, and reset when the
+  connection goes back to the pool.
+- Other backends only get the check before each statement.
+
+Statements run outside a request (CLI, background purges) are never
+limited; dashboard sections run on worker threads share the deadline of
+their request. A view that streams its body (the
+user import) should opt out with @db_budget(0): a cancellation there can
+no longer become a 503.
+"""
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from app.metrics import metrics
+
+# PostgreSQL SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+
+class DatabaseBudgetExceeded(Exception):
+    """A request used up its database time budget"""
+    
+    def __init__(self, budget_ms, elapsed_ms):
+        super().__init__(f'Database time budget of {budget_ms} ms exceeded after {elapsed_ms:.0f} ms')
+        self.budget_ms = budget_ms
+        self.elapsed_ms = elapsed_ms
+
+
+def db_budget(ms):
+    """Database time budget of a view in milliseconds (0 = no limit).
+    
+    Apply it directly below the route decorator; DB_BUDGET_OVERRIDES
+    takes precedence.
+    """
+    def decorator(fn):
+        fn.db_budget_ms = ms
+        return fn
+    return decorator
+
+
+def _parse_overrides(value):
+    # 'analytics.get_summary=5000,analytics.export_analytics=0' -> {endpoint: ms}
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, ms = item.partition('=')
+        overrides[endpoint.strip()] = int(ms)
+    return overrides
+
+
+class DatabaseBudget:
+    """Starts each request's budget and turns cancellations into 503s"""
+    
+    def __init__(self):
+        self._app = None
+        self._overrides = {}
+        self.sqlite_steps = 10000
+        self._lock = threading.Lock()
+        self.cancellations = defaultdict(int)  # (endpoint, reason) -> count
+    
+    def init_app(self, app):
+        if not app.config['DB_BUDGET_ENABLED']:
+            return
+        self._app = app
+        self._overrides = _parse_overrides(app.config['DB_BUDGET_OVERRIDES'])
+        app.before_request(self._before_request)
+        app.register_error_handler(DatabaseBudgetExceeded, self._handle_exceeded)
+        metrics.add_collector(self.samples)
+        
+        self.sqlite_steps = app.config['DB_BUDGET_SQLITE_STEPS']
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            event.listen(Pool, 'connect', _install_progress_handler)
+            event.listen(Pool, 'checkin', _checkin)
+    
+    def budget_for(self, endpoint):
+        """Budget in ms of an endpoint (0 = no limit)"""
+        if endpoint in self._overrides:
+            return self._overrides[endpoint]
+        view = self._app.view_functions.get(endpoint)
+        return getattr(view, 'db_budget_ms', self._app.config['DB_BUDGET_DEFAULT_MS'])
+    
+    def _before_request(self):
+        budget = self.budget_for(request.endpoint) if request.endpoint else 0
+        if budget:
+            g.db_budget_ms = budget
+    
+    def record_cancellation(self, reason):
+        with self._lock:
+            self.cancellations[(request.endpoint or 'unmatched', reason)] += 1
+    
+    def _handle_exceeded(self, error):
+        from app.models import db
+        db.session.rollback()
+        return jsonify({
+            'error': 'Database time budget exceeded',
+            'code': 'db_budget_exceeded',
+            'endpoint': request.endpoint,
+            'budget_ms': error.budget_ms,
+            'elapsed_ms': round(error.elapsed_ms),
+        }), 503
+    
+    def samples(self):
+        """Budgets in use and cancellations for the metrics endpoint"""
+        samples = []
+        for endpoint in sorted(self._app.view_functions):
+            budget = self.budget_for(endpoint)
+            if endpoint != 'static' and budget:
+                samples.append((
+                    'db_time_budget_seconds', 'setting', 'Database time budget of an endpoint',
+                    {'endpoint': endpoint}, budget / 1000
+                ))
+        with self._lock:
+            for (endpoint, reason), count in sorted(self.cancellations.items()):
+                samples.append((
+                    'db_budget_cancellations_total', 'counter', 'Requests failed for exceeding their database time budget',
+                    {'endpoint': endpoint, 'reason': reason}, count
+                ))
+        return samples
+
+
+db_time_budget = DatabaseBudget()
+
+
+def _deadline():
+    # The request's deadline, started by its first statement; None without a budget
+    if not has_request_context():
+        return None
+    budget = g.get('db_budget_ms')
+    if not budget:
+        return None
+    if 'db_deadline' not in g:
+        g.db_deadline = time.perf_counter() + budget / 1000
+    return g.db_deadline
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    deadline = _deadline()
+    if deadline is None:
+        return
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        db_time_budget.record_cancellation('deadline_passed')
+        raise DatabaseBudgetExceeded(g.db_budget_ms, g.db_budget_ms - remaining * 1000)
+    
+    # Read by the SQLite progress handler until the connection is checked in
+    conn.info['db_deadline'] = deadline
+    if conn.dialect.name == 'postgresql' and not conn.info.get('db_statement_timeout'):
+        cursor.execute(f'SET statement_timeout = {max(1, int(remaining * 1000))}')
+        conn.info['db_statement_timeout'] = True
+
+
+def _handle_error(context):
+    if isinstance(context.original_exception, DatabaseBudgetExceeded) or not has_request_context():
+        return
+    info = context.connection.info if context.connection is not None else {}
+    tripped = info.pop('db_budget_tripped', False)
+    exc = context.original_exception
+    if not tripped and QUERY_CANCELED not in (getattr(exc, 'pgcode', None), getattr(exc, 'sqlstate', None)):
+        return
+    deadline = g.get('db_deadline')
+    if deadline is None:
+        return
+    db_time_budget.record_cancellation('statement_cancelled')
+    raise DatabaseBudgetExceeded(
+        g.db_budget_ms, g.db_budget_ms + (time.perf_counter() - deadline) * 1000
+    ) from context.sqlalchemy_exception
+
+
+def _install_progress_handler(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    info = connection_record.info
+    
+    def interrupt_after_deadline():
+        deadline = info.get('db_deadline')
+        if deadline is not None and time.perf_counter() > deadline:
+            info['db_budget_tripped'] = True
+            return 1
+        return 0
+    dbapi_connection.set_progress_handler(interrupt_after_deadline, db_time_budget.sqlite_steps)
+
+
+def _checkin(dbapi_connection, connection_record):
+    info = connection_record.info
+    info.pop('db_deadline', None)
+    info.pop('db_budget_tripped', None)
+    if info.pop('db_statement_timeout', False) and dbapi_connection is not None:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('RESET statement_timeout')
+            dbapi_connection.commit()
+        finally:
+            cursor.close()
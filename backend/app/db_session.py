@@ -0,0 +1,30 @@
+"""
+Session class that can route reads to the replica bind
+"""
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Session sending statements to the replica bind while g.use_replica is set.
+    
+    Flushes always go to the primary, so a view routed to the replica that
+    does write still writes in the right place.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_write(session, flush_context):
+    # Read-your-writes: the replica router pins this caller to the primary for a while
+    if has_app_context():
+        g.db_wrote = True
@@ -0,0 +1,83 @@
+"""
+Database engine tuning
+
+Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings (pool sizing,
+recycling, pre-ping, compiled statement cache) and applies the SQLITE_*
+pragmas to every new SQLite connection: WAL so readers do not block the
+writer, synchronous=NORMAL, a busy timeout so concurrent writers wait for
+the lock instead of failing with "database is locked", and larger page
+and mmap caches.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config, uri=None):
+    """SQLAlchemy create_engine() options for a database URI from the config"""
+    uri = uri or config['SQLALCHEMY_DATABASE_URI']
+    options = {
+        'query_cache_size': config['DB_QUERY_CACHE_SIZE'],
+    }
+    
+    if is_sqlite(uri):
+        options['connect_args'] = {
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'cached_statements': config['SQLITE_CACHED_STATEMENTS'],
+        }
+        # In-memory databases use a single-connection pool that takes no sizing
+        if is_memory_sqlite(uri):
+            return options
+    
+    options.update({
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    })
+    return options
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        'PRAGMA temp_store = MEMORY',
+    ]
+    if config['SQLITE_JOURNAL_MODE']:
+        pragmas.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    return pragmas
+
+
+def tune_engine(engine, config):
+    """Apply the configured pragmas to an engine's new connections (SQLite only)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_db_tuning(app, db):
+    """Tune every engine of the app (call inside an app context after db.init_app)"""
+    for engine in db.engines.values():
+        tune_engine(engine, app.config)
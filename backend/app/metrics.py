@@ -0,0 +1,394 @@
+"""
+Request and SQL metrics in the Prometheus text format
+
+Every request records its latency in a histogram per blueprint, endpoint
+and method, its status code, and the number and total time of the SQL
+statements it ran (counted by SQLAlchemy cursor events). Recording is a
+few dict updates under a lock; nothing is written per request.
+
+Each process keeps its own numbers. When METRICS_DIR is set (the
+production server sets it for its workers), every process writes a
+snapshot of them to METRICS_DIR/metrics-<pid>.json every METRICS_FLUSH_S
+seconds, and a scrape of /api/metrics sums the snapshots of all workers,
+so whichever worker answers reports the totals. A scrape folds the
+counters of exited workers into METRICS_DIR/metrics-retired.json and
+removes their snapshots, so recycled workers neither pile up files nor
+lose their totals when a new worker reuses the pid.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Seconds (Prometheus client defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# SQL statements per request
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# Counters of exited workers, in snapshot form
+RETIRED_FILE = 'metrics-retired.json'
+
+
+def _observe(histogram, buckets, value):
+    # histogram: [per-bucket counts (last one is +Inf), sum]
+    counts = histogram[0]
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            counts[i] += 1
+            break
+    else:
+        counts[-1] += 1
+    histogram[1] += value
+
+
+class Metrics:
+    """Per-process request and SQL counters"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._flushed_pid = None
+        self._collectors = []
+        self._reset()
+    
+    def _reset(self):
+        self.in_flight = 0
+        self.latency = defaultdict(lambda: [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])
+        self.statements = defaultdict(lambda: [[0] * (len(STATEMENT_BUCKETS) + 1), 0.0])
+        self.sql_seconds = defaultdict(float)
+        self.responses = defaultdict(int)
+    
+    def init_app(self, app):
+        if not app.config['METRICS_ENABLED']:
+            return
+        self._app = app
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    
+    def add_collector(self, collect):
+        """Register a callable returning extra samples, as (name, type, help, labels, value).
+        
+        Across workers, 'counter' samples are summed, 'gauge' samples are
+        summed over live workers, and 'setting' samples (the same in every
+        worker) are reported once, as a gauge.
+        """
+        if collect not in self._collectors:
+            self._collectors.append(collect)
+    
+    def _before_request(self):
+        self._ensure_flusher()
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = [0, 0.0]
+        with self._lock:
+            self.in_flight += 1
+    
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+    
+    def _teardown_request(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        statements, sql_seconds = g.pop('metrics_sql')
+        labels = (request.blueprint or '', request.endpoint or 'unmatched', request.method)
+        status = g.get('metrics_status', 500)
+        
+        with self._lock:
+            self.in_flight -= 1
+            _observe(self.latency[labels], LATENCY_BUCKETS, elapsed)
+            _observe(self.statements[labels], STATEMENT_BUCKETS, statements)
+            self.sql_seconds[labels] += sql_seconds
+            self.responses[labels + (str(status),)] += 1
+    
+    def _ensure_flusher(self):
+        if not self._app.config['METRICS_DIR'] or (self._pid == os.getpid() and self._thread.is_alive()):
+            return
+        with self._lock:
+            # Threads do not survive fork; start one per process
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # A forked worker starts from zero rather than re-reporting the parent's numbers
+                self._reset()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self._app.config['METRICS_FLUSH_S'])
+            try:
+                self.flush()
+            except OSError:
+                self._app.logger.exception('Writing the metrics snapshot failed')
+    
+    def snapshot(self):
+        """This process's numbers as a JSON-serializable dict"""
+        extra = [
+            [name, kind, help_text, sorted(labels.items()), value]
+            for collect in self._collectors
+            for name, kind, help_text, labels, value in collect()
+        ]
+        with self._lock:
+            return {
+                'extra': extra,
+                'pid': os.getpid(),
+                'in_flight': self.in_flight,
+                'latency': [[list(k), [list(v[0]), v[1]]] for k, v in self.latency.items()],
+                'statements': [[list(k), [list(v[0]), v[1]]] for k, v in self.statements.items()],
+                'sql_seconds': [[list(k), v] for k, v in self.sql_seconds.items()],
+                'responses': [[list(k), v] for k, v in self.responses.items()],
+            }
+    
+    def flush(self):
+        """Write this process's snapshot for the other workers to read"""
+        directory = self._app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        if self._flushed_pid != os.getpid():
+            # A snapshot already at this path is an exited worker's whose pid was reused
+            with _retire_lock(directory):
+                _retire(directory, path)
+                self._write(path)
+            self._flushed_pid = os.getpid()
+        else:
+            self._write(path)
+    
+    def _write(self, path):
+        # Concurrent scrapes in one worker each flush; they must not share a temp file
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+    
+    def collect(self):
+        """Snapshots of every worker (just this process without METRICS_DIR)"""
+        directory = self._app.config['METRICS_DIR']
+        if not directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        exited = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snap['pid'] is not None and not _alive(snap['pid']):
+                exited.append(path)
+            else:
+                snapshots.append(snap)
+        if exited:
+            with _retire_lock(directory):
+                for path in exited:
+                    _retire(directory, path)
+                # Read under the lock, so another scrape's retirement is neither missed nor counted twice
+                snapshots = [s for s in snapshots if s['pid'] is not None] + [_read_retired(directory)]
+        return snapshots
+    
+    def render(self):
+        """Prometheus text exposition of the totals across workers"""
+        latency = defaultdict(lambda: [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])
+        statements = defaultdict(lambda: [[0] * (len(STATEMENT_BUCKETS) + 1), 0.0])
+        sql_seconds = defaultdict(float)
+        responses = defaultdict(int)
+        extra = {}  # name -> [type, help, {labels: value}]
+        in_flight = 0
+        
+        for snap in self.collect():
+            alive = snap['pid'] is not None and _alive(snap['pid'])
+            if alive:
+                in_flight += snap['in_flight']
+            for name, kind, help_text, labels, value in snap.get('extra', ()):
+                # Gauges describe live workers only; counters of exited ones still count
+                if kind != 'counter' and not alive:
+                    continue
+                series = extra.setdefault(name, [kind, help_text, defaultdict(float)])
+                key = tuple(map(tuple, labels))
+                if kind == 'setting':
+                    series[2][key] = max(series[2].get(key, value), value)
+                else:
+                    series[2][key] += value
+            for merged, entries in ((latency, snap['latency']), (statements, snap['statements'])):
+                for key, (counts, total) in entries:
+                    target = merged[tuple(key)]
+                    target[0] = [a + b for a, b in zip(target[0], counts)]
+                    target[1] += total
+            for key, value in snap['sql_seconds']:
+                sql_seconds[tuple(key)] += value
+            for key, value in snap['responses']:
+                responses[tuple(key)] += value
+        
+        lines = [
+            '# HELP http_requests_in_flight Requests being served',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {in_flight}',
+            '# HELP http_requests_total Responses by status code',
+            '# TYPE http_requests_total counter',
+        ]
+        for key, value in sorted(responses.items()):
+            lines.append(f'http_requests_total{_labels(key[:3], status=key[3])} {value}')
+        lines += _histogram(
+            'http_request_duration_seconds', 'Request latency in seconds', latency, LATENCY_BUCKETS
+        )
+        lines += _histogram(
+            'db_statements_per_request', 'SQL statements run per request', statements, STATEMENT_BUCKETS
+        )
+        lines += [
+            '# HELP db_statement_duration_seconds_total Time spent in SQL statements',
+            '# TYPE db_statement_duration_seconds_total counter',
+        ]
+        for key, value in sorted(sql_seconds.items()):
+            lines.append(f'db_statement_duration_seconds_total{_labels(key)} {value:.6f}')
+        for name, (kind, help_text, series) in sorted(extra.items()):
+            lines += [f'# HELP {name} {help_text}', f"# TYPE {name} {'gauge' if kind == 'setting' else kind}"]
+            for labels, value in sorted(series.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class _retire_lock:
+    """Exclusive lock of METRICS_DIR among the workers"""
+    
+    def __init__(self, directory):
+        self.path = os.path.join(directory, 'retire.lock')
+    
+    def __enter__(self):
+        self.file = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        else:
+            # Locks the first byte; retries for up to 10 s, then raises OSError
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+    
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+
+
+def _read_retired(directory):
+    try:
+        with open(os.path.join(directory, RETIRED_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {
+            'extra': [], 'pid': None, 'in_flight': 0,
+            'latency': [], 'statements': [], 'sql_seconds': [], 'responses': [],
+        }
+
+
+def _retire(directory, path):
+    """Add the counters of an exited worker's snapshot to the retired totals and remove it (hold the lock)"""
+    try:
+        with open(path) as f:
+            snap = json.load(f)
+    except FileNotFoundError:
+        return  # Retired by another worker
+    except ValueError:
+        os.remove(path)
+        return
+    retired = _read_retired(directory)
+    for field in ('latency', 'statements'):
+        merged = {tuple(key): value for key, value in retired[field]}
+        for key, (counts, total) in snap[field]:
+            before = merged.get(tuple(key), [[0] * len(counts), 0.0])
+            merged[tuple(key)] = [[a + b for a, b in zip(before[0], counts)], before[1] + total]
+        retired[field] = [[list(key), value] for key, value in merged.items()]
+    for field in ('sql_seconds', 'responses'):
+        merged = defaultdict(int, {tuple(key): value for key, value in retired[field]})
+        for key, value in snap[field]:
+            merged[tuple(key)] += value
+        retired[field] = [[list(key), value] for key, value in merged.items()]
+    # Only counters outlive a worker
+    merged = defaultdict(float)
+    for name, kind, help_text, labels, value in retired['extra'] + snap['extra']:
+        if kind == 'counter':
+            merged[name, help_text, tuple(map(tuple, labels))] += value
+    retired['extra'] = [
+        [name, 'counter', help_text, [list(pair) for pair in labels], value]
+        for (name, help_text, labels), value in merged.items()
+    ]
+    tmp = os.path.join(directory, f'{RETIRED_FILE}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(retired, f)
+    os.replace(tmp, os.path.join(directory, RETIRED_FILE))
+    os.remove(path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _labels(key, **extra):
+    blueprint, endpoint, method = key
+    return _format_labels([('blueprint', blueprint), ('endpoint', endpoint), ('method', method), *extra.items()])
+
+
+def _histogram(name, help_text, series, buckets):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, (counts, total) in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip((*buckets, '+Inf'), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(key, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(key)} {total:.6f}')
+        lines.append(f'{name}_count{_labels(key)} {cumulative}')
+    return lines
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info['metrics_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    start = conn.info.pop('metrics_start', None)
+    sql = g.get('metrics_sql')
+    if start is not None and sql is not None:
+        sql[0] += 1
+        sql[1] += time.perf_counter() - start
@@ -0,0 +1,61 @@
+"""
+Schema migrations for databases created by an earlier version
+
+db.create_all() only creates missing tables, so columns added to existing
+models are added here, and their data is backfilled by CLI commands.
+"""
+import json
+from sqlalchemy import inspect, text
+from app.models import db, User
+
+
+def add_missing_columns():
+    """Add model columns missing from existing tables (as nullable columns)"""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(
+                f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            ))
+            added.append(f'{table.name}.{column.name}')
+    
+    db.session.commit()
+    return added
+
+
+def backfill_permission_bits(batch_size=1000):
+    """Fill permission_bits/permission_mask from the JSON permissions column"""
+    migrated = 0
+    while True:
+        rows = db.session.query(User.id, User.permissions).filter(
+            User.permission_mask == None
+        ).limit(batch_size).all()
+        if not rows:
+            return migrated
+        
+        updates = []
+        for user_id, permissions in rows:
+            try:
+                decoded = json.loads(permissions) if permissions else {}
+            except ValueError:
+                decoded = {}
+            values = User.encode_permissions(decoded if isinstance(decoded, dict) else {})
+            updates.append({
+                'id': user_id,
+                'permission_bits': values['permission_bits'],
+                'permission_mask': values['permission_mask']
+            })
+        
+        # Bulk UPDATE by primary key, one executemany per batch
+        db.session.execute(db.update(User), updates)
+        db.session.commit()
+        migrated += len(updates)
@@ -5,13 +5,29 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
+from app.db_session import RoutingSession
+from app.tracing import traced
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Known permission features; bit positions are append-only
+PERMISSION_FEATURES = (
+    'document_summary',
+    'email_draft',
+    'code_assist',
+    'voice_notes',
+    'chat',
+)
+PERMISSION_BITS = {feature: 1 << i for i, feature in enumerate(PERMISSION_FEATURES)}
 
 
 class User(db.Model):
     """User model for employees and admins"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # Keyset pagination order for the admin user listing
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
@@ -28,6 +44,11 @@ class User(db.Model):
     # Feature permissions (JSON stored as string)
     permissions = db.Column(db.Text, default='{}')
     
+    # Bitmask form of the known features: mask marks features set explicitly,
+    # bits marks the granted ones. NULL mask means not migrated from JSON yet.
+    permission_bits = db.Column(db.Integer, default=0)
+    permission_mask = db.Column(db.Integer, default=0)
+    
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
@@ -38,30 +59,88 @@ class User(db.Model):
     tasks = db.relationship('Task', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     announcements_sent = db.relationship('Announcement', backref='sender', lazy='dynamic', foreign_keys='Announcement.sender_id')
     
+    @traced('auth.password_hash')
     def set_password(self, password):
         """Hash and set password"""
         self.password_hash = generate_password_hash(password)
     
+    @traced('auth.password_hash')
     def check_password(self, password):
         """Check if password matches"""
         return check_password_hash(self.password_hash, password)
     
     def get_permissions(self):
         """Get permissions as dict"""
-        try:
-            return json.loads(self.permissions) if self.permissions else {}
-        except:
-            return {}
+        # Decoded once per stored value and cached on the instance
+        cached = self.__dict__.get('_permissions_cache')
+        if cached is None or cached[0] != self.permissions:
+            try:
+                decoded = json.loads(self.permissions) if self.permissions else {}
+            except:
+                decoded = {}
+            cached = (self.permissions, decoded)
+            self.__dict__['_permissions_cache'] = cached
+        return dict(cached[1])
     
     def set_permissions(self, permissions_dict):
         """Set permissions from dict"""
-        self.permissions = json.dumps(permissions_dict)
+        for column, value in User.encode_permissions(permissions_dict).items():
+            setattr(self, column, value)
     
     def has_permission(self, feature):
         """Check if user has permission for a feature"""
+        bit = PERMISSION_BITS.get(feature)
+        if bit is not None and self.permission_mask is not None:
+            # Default to True if not specified
+            return not self.permission_mask & bit or bool(self.permission_bits & bit)
         perms = self.get_permissions()
         return perms.get(feature, True)  # Default to True if not specified
     
+    @staticmethod
+    def encode_permissions(permissions_dict):
+        """Column values (JSON and bitmask) for a permissions dict"""
+        mask = bits = 0
+        for feature, value in permissions_dict.items():
+            bit = PERMISSION_BITS.get(feature)
+            if bit is not None:
+                mask |= bit
+                if value:
+                    bits |= bit
+        return {
+            'permissions': json.dumps(permissions_dict),
+            'permission_bits': bits,
+            'permission_mask': mask
+        }
+    
+    @classmethod
+    def permission_filter(cls, feature, granted=True):
+        """SQL filter for users that have (or lack) a known feature.
+        
+        Rows not migrated yet (NULL mask) are judged by their JSON
+        permissions, as has_permission() does, until `flask
+        migrate-permissions` or the next start backfills them.
+        """
+        if feature not in PERMISSION_BITS:
+            raise ValueError(f'Unknown permission: {feature}')
+        bit = PERMISSION_BITS[feature]
+        has_it = db.case(
+            (cls.permission_mask == None, db.func.coalesce(cls._json_permission(feature), db.true())),
+            else_=db.or_(
+                cls.permission_mask.op('&')(bit) == 0,
+                cls.permission_bits.op('&')(bit) != 0
+            )
+        )
+        return has_it if granted else db.not_(has_it)
+    
+    @classmethod
+    def _json_permission(cls, feature):
+        # The feature's value in the JSON column as a boolean, NULL when it is not set
+        if db.engine.dialect.name == 'sqlite':
+            # Unparseable JSON reads as no permissions set, like get_permissions()
+            document = db.case((db.func.json_valid(cls.permissions) == 1, cls.permissions))
+            return db.type_coerce(document, db.JSON)[feature].as_boolean()
+        return db.cast(cls.permissions, db.JSON)[feature].as_boolean()
+    
     def to_dict(self, include_sensitive=False):
         """Convert to dictionary"""
         data = {
@@ -92,7 +171,8 @@ class Analytics(db.Model):
     
     # Metadata (encrypted, no sensitive data)
     # e.g., {"model": "llama-3-8b", "duration_ms": 1234, "success": true}
-    metadata = db.Column(db.Text)
+    # 'metadata' is reserved on declarative models; the column keeps its name
+    metadata_ = db.Column('metadata', db.Text)
     
     # Timestamp
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -103,13 +183,13 @@ class Analytics(db.Model):
     def get_metadata(self):
         """Get metadata as dict"""
         try:
-            return json.loads(self.metadata) if self.metadata else {}
+            return json.loads(self.metadata_) if self.metadata_ else {}
         except:
             return {}
     
     def set_metadata(self, metadata_dict):
         """Set metadata from dict"""
-        self.metadata = json.dumps(metadata_dict)
+        self.metadata_ = json.dumps(metadata_dict)
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -241,3 +321,149 @@ class ChatMessage(db.Model):
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'status': self.status
         }
+
+
+class AnnouncementReadState(db.Model):
+    """Per-user announcement read tracking (watermark + bitset)"""
+    __tablename__ = 'announcement_read_states'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    
+    # Every announcement with id <= last_seen_id counts as read
+    last_seen_id = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Reads above the watermark: bit i marks announcement last_seen_id + 1 + i
+    read_bits = db.Column(db.LargeBinary, default=b'', nullable=False)
+    
+    # Cached unread count (NULL means it must be recomputed)
+    unread_count = db.Column(db.Integer)
+    
+    # The cached count holds until the earliest unread announcement expires
+    unread_valid_until = db.Column(db.DateTime)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def _get_bits(self):
+        return int.from_bytes(self.read_bits or b'', 'little')
+    
+    def _set_bits(self, bits):
+        self.read_bits = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    
+    def is_read(self, announcement_id):
+        """Check if an announcement has been read"""
+        last_seen = self.last_seen_id or 0
+        if announcement_id <= last_seen:
+            return True
+        return bool(self._get_bits() >> (announcement_id - last_seen - 1) & 1)
+    
+    def mark_read(self, announcement_ids):
+        """Mark announcements as read, returning the ids that were unread"""
+        last_seen = self.last_seen_id or 0
+        bits = self._get_bits()
+        newly_read = []
+        for announcement_id in announcement_ids:
+            if announcement_id <= last_seen:
+                continue
+            bit = 1 << (announcement_id - last_seen - 1)
+            if not bits & bit:
+                bits |= bit
+                newly_read.append(announcement_id)
+        self._set_bits(bits)
+        self._compact()
+        return newly_read
+    
+    def advance_watermark(self, announcement_id):
+        """Treat every announcement up to announcement_id as read"""
+        last_seen = self.last_seen_id or 0
+        if announcement_id > last_seen:
+            self._set_bits(self._get_bits() >> (announcement_id - last_seen))
+            self.last_seen_id = announcement_id
+        self._compact()
+    
+    def _compact(self):
+        """Fold contiguous reads just above the watermark into it"""
+        bits = self._get_bits()
+        shift = (~bits & (bits + 1)).bit_length() - 1  # count of trailing ones
+        if shift > 0:
+            self._set_bits(bits >> shift)
+            self.last_seen_id = (self.last_seen_id or 0) + shift
+    
+    def invalidate(self):
+        """Force the cached unread count to be recomputed"""
+        self.unread_count = None
+        self.unread_valid_until = None
+    
+    def is_count_valid(self, now=None):
+        """Check if the cached unread count can be served as-is"""
+        if self.unread_count is None:
+            return False
+        if self.unread_valid_until is None:
+            return True
+        return (now or datetime.utcnow()) < self.unread_valid_until
+    
+    @staticmethod
+    def target_filter(target):
+        """SQL filter on user_id for users an announcement target reaches"""
+        if target == 'all':
+            return db.true()
+        if target and target.startswith('role:'):
+            role = target.split(':', 1)[1]
+            return AnnouncementReadState.user_id.in_(
+                db.select(User.id).where(User.role == role)
+            )
+        if target and target.startswith('user:'):
+            try:
+                return AnnouncementReadState.user_id == int(target.split(':', 1)[1])
+            except ValueError:
+                return db.false()
+        return db.false()
+    
+    @staticmethod
+    def visible_filter(user):
+        """SQL filter on announcements whose target reaches the given user"""
+        return db.or_(
+            Announcement.target == 'all',
+            Announcement.target == f'role:{user.role}',
+            Announcement.target == f'user:{user.id}'
+        )
+    
+    @classmethod
+    def record_new(cls, announcement):
+        """Bump cached unread counts for every user a new announcement targets"""
+        values = {'unread_count': cls.unread_count + 1}
+        if announcement.expires_at:
+            values['unread_valid_until'] = db.case(
+                (db.or_(cls.unread_valid_until == None,
+                        cls.unread_valid_until > announcement.expires_at),
+                 announcement.expires_at),
+                else_=cls.unread_valid_until
+            )
+        db.session.query(cls).filter(
+            cls.target_filter(announcement.target),
+            cls.unread_count != None
+        ).update(values, synchronize_session=False)
+    
+    @classmethod
+    def invalidate_target(cls, target):
+        """Invalidate cached unread counts for every user a target reaches"""
+        db.session.query(cls).filter(cls.target_filter(target)).update(
+            {'unread_count': None, 'unread_valid_until': None},
+            synchronize_session=False
+        )
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'user_id': self.user_id,
+            'last_seen_id': self.last_seen_id,
+            'unread_count': self.unread_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class ReplicaHeartbeat(db.Model):
+    """Primary clock written periodically; its age on a replica is the replication lag"""
+    __tablename__ = 'replica_heartbeat'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.Float, nullable=False)  # Unix time on the primary
@@ -0,0 +1,148 @@
+"""
+Keyset (cursor) pagination and approximate totals
+"""
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from app.models import db
+
+# Rows one cursor page may hold
+MAX_CURSOR_PAGE = 500
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque URL-safe cursor"""
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (created_at, id); raises ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def page_size(per_page, maximum=None):
+    """per_page below 1 falls back to 20, as in paginate(); above maximum it is capped"""
+    per_page = per_page if per_page and per_page > 0 else 20
+    return min(per_page, maximum) if maximum else per_page
+
+
+def keyset_page(stmt, model, per_page, fetch, cursor=None):
+    """Fetch one page ordered by (created_at, id) descending.
+    
+    Seeks past the cursor with a row-value comparison on the
+    (created_at, id) index instead of OFFSET, so every page costs the same.
+    fetch executes the statement and returns rows with created_at and id.
+    per_page is normalized with page_size(per_page, MAX_CURSOR_PAGE).
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    per_page = page_size(per_page, MAX_CURSOR_PAGE)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            db.tuple_(model.created_at, model.id) < db.tuple_(created_at, row_id)
+        )
+    
+    rows = fetch(stmt.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1))
+    items = rows[:per_page]
+    
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+
+def offset_page(stmt, page, per_page, fetch):
+    """Page-number pagination over a SELECT, like Flask-SQLAlchemy's paginate().
+    
+    As there (with error_out=False), a page or per_page below 1 falls back
+    to 1 or 20 and per_page has no upper limit. Returns (items, total, pages).
+    """
+    page = page if page and page > 0 else 1
+    per_page = page_size(per_page)
+    
+    count_stmt = db.select(db.func.count()).select_from(stmt.order_by(None).subquery())
+    total = db.session.execute(count_stmt).scalar()
+    items = fetch(stmt.limit(per_page).offset((page - 1) * per_page))
+    pages = -(-total // per_page) if total else 0
+    return items, total, pages
+
+
+class ApproximateCounter:
+    """Cache of COUNT(*) results refreshed in the background.
+    
+    A cached value is served until it is older than the TTL; after that the
+    stale value is still served while it is recounted. Recounts run one at
+    a time on a single background thread, and at most max_pending keys wait
+    for it: a key that finds the queue full gets no count this time.
+    """
+    
+    def __init__(self, max_entries=256, max_pending=16):
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self._values = {}
+        self._pending = OrderedDict()  # key -> (app, count_fn), oldest first
+        self._running = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+    
+    def get(self, key, count_fn, ttl):
+        """Return (count or None, is_fresh) and schedule a refresh if needed"""
+        with self._lock:
+            entry = self._values.get(key)
+            fresh = entry is not None and time.monotonic() - entry[1] < ttl
+            if (not fresh and key != self._running and key not in self._pending
+                    and len(self._pending) < self.max_pending):
+                self._pending[key] = (current_app._get_current_object(), count_fn)
+                self._ensure_worker()
+                self._wakeup.notify()
+        return (entry[0] if entry else None), fresh
+    
+    def _ensure_worker(self):
+        # Threads do not survive fork; start one per process
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='approximate-counts', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                key, (app, count_fn) = self._pending.popitem(last=False)
+                self._running = key
+            try:
+                self._refresh(app, key, count_fn)
+            finally:
+                with self._lock:
+                    self._running = None
+    
+    def _refresh(self, app, key, count_fn):
+        try:
+            with app.app_context():
+                value = count_fn()
+            with self._lock:
+                if key not in self._values and len(self._values) >= self.max_entries:
+                    self._values.pop(next(iter(self._values)))
+                self._values[key] = (value, time.monotonic())
+        except Exception:
+            app.logger.exception('Approximate count refresh failed for %s', key)
+    
+    def clear(self):
+        """Drop all cached counts"""
+        with self._lock:
+            self._values.clear()
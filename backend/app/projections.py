@@ -0,0 +1,58 @@
+"""
+ORM-bypass read path for list endpoints
+
+A projection selects only the columns a serializer needs and executes the
+SELECT on the session's connection, so no ORM instances are built, nothing
+enters the identity map and there is no change tracking. Rows come back as
+slotted tuples with named fields.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from app.models import db
+from app.serializers import get_serializer
+
+
+class Projection:
+    """Read-only column projection of one model for one field set.
+    
+    extra names model columns the endpoint needs (for filtering or cursors)
+    that are fetched alongside the serialized fields but not serialized.
+    """
+    
+    def __init__(self, model, fields=None, expand=(), extra=()):
+        self.model = model
+        self.serializer = get_serializer(model, fields, expand)
+        names = self.serializer.column_names
+        self.extra = tuple(name for name in extra if name not in names)
+        self.extra_columns = [model.__table__.c[name] for name in self.extra]
+        self.row_class = namedtuple(f'{model.__name__}Row', names + self.extra)
+    
+    def select(self):
+        """SELECT of the projected columns; add filters and ordering to it"""
+        return self.serializer.select(*self.extra_columns)
+    
+    def fetch(self, stmt):
+        """Execute a projection SELECT, returning lightweight rows"""
+        result = db.session.connection().execute(stmt)
+        return list(map(self.row_class._make, result))
+    
+    def serialize(self, rows):
+        """Serialize fetched rows"""
+        return self.serializer.rows(rows)
+    
+    def fetch_serialized(self, stmt):
+        """Execute a projection SELECT straight into serialized dicts"""
+        result = db.session.connection().execute(stmt)
+        return self.serializer.rows(result)
+    
+    def fetch_one(self, stmt):
+        """Execute a projection SELECT for a single serialized row (or None)"""
+        row = db.session.connection().execute(stmt.limit(1)).first()
+        return self.serializer.from_row(row) if row is not None else None
+
+
+# Bounded like get_serializer; parse_fieldset puts fields in model order first
+@lru_cache(maxsize=1024)
+def get_projection(model, fields=None, expand=(), extra=()):
+    """Cached projection for a model, field names, expansions and extra columns"""
+    return Projection(model, fields, expand, extra)
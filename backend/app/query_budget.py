@@ -0,0 +1,140 @@
+"""
+Per-request SQL statement budgets and N+1 detection
+
+Views declare how many statements one request may run with
+@query_budget(n). With QUERY_BUDGET_MODE set to 'warn' (development) or
+'raise' (testing), the statements run inside such a view are counted by
+shape (the SQL with its placeholder lists collapsed) together with the
+app code that issued them. A request over its budget, or one running the
+same shape from the same line QUERY_BUDGET_REPEAT_THRESHOLD times or
+more (the signature of an N+1 loop), is logged as a warning or fails
+with QueryBudgetExceeded, listing the offending call sites. 'off' (production) skips all of it.
+
+Statements run by dashboard sections on worker threads are counted with
+the request that started them; those run by a streamed body after the
+view has returned are not.
+"""
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from functools import wraps
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(APP_DIR)
+
+# One bind placeholder in any DB-API paramstyle
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_PLACEHOLDER_LIST = re.compile(rf'{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more statements than its view's budget, or an N+1 pattern"""
+
+
+def statement_shape(statement):
+    """SQL with whitespace normalized and expanded IN-lists collapsed"""
+    return _PLACEHOLDER_LIST.sub('?, ...', _WHITESPACE.sub(' ', statement).strip())
+
+
+def _call_site():
+    # Innermost frame in app code, skipping this module
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename != __file__:
+            return f'{os.path.relpath(filename, BACKEND_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryTracker:
+    """Statements run during one request, by shape and call site"""
+    
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self.sites = defaultdict(Counter)
+    
+    def record(self, statement):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.shapes[shape] += 1
+        self.sites[shape][_call_site()] += 1
+    
+    def merge(self, other):
+        """Add the statements another tracker recorded (on a worker thread)"""
+        self.count += other.count
+        self.shapes.update(other.shapes)
+        for shape, sites in other.sites.items():
+            self.sites[shape].update(sites)
+    
+    def problems(self, budget, repeat_threshold):
+        """Human-readable findings; empty if the request is within budget"""
+        findings = []
+        if self.count > budget:
+            findings.append(f'{self.count} statements, budget {budget}:')
+            for shape, count in self.shapes.most_common(5):
+                findings.append(self._describe(shape, count))
+        # The same statement from the same line, over and over: a query in a loop
+        for shape, sites in self.sites.items():
+            for site, count in sites.items():
+                if count >= repeat_threshold:
+                    findings.append('Repeated statement (possible N+1):')
+                    findings.append(f'  {count}x {shape[:200]}\n      from {site}')
+        return findings
+    
+    def _describe(self, shape, count):
+        sites = ', '.join(f'{site} (x{n})' for site, n in self.sites[shape].most_common(3))
+        return f'  {count}x {shape[:200]}\n      from {sites}'
+
+
+def query_budget(budget):
+    """Declare the most SQL statements one request to a view may run.
+    
+    Apply it directly below the route decorator so the auth and cache
+    decorators' own queries count too.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            mode = current_app.config['QUERY_BUDGET_MODE']
+            if mode == 'off' or 'query_tracker' in g:
+                return fn(*args, **kwargs)
+            
+            tracker = g.query_tracker = QueryTracker()
+            try:
+                response = current_app.make_response(fn(*args, **kwargs))
+            finally:
+                g.pop('query_tracker')
+            response.headers['X-Query-Count'] = str(tracker.count)
+            
+            findings = tracker.problems(budget, current_app.config['QUERY_BUDGET_REPEAT_THRESHOLD'])
+            if findings:
+                report = '\n'.join([f'Query budget check failed for {fn.__module__}.{fn.__name__}', *findings])
+                if mode == 'raise':
+                    raise QueryBudgetExceeded(report)
+                current_app.logger.warning(report)
+            return response
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        tracker = g.get('query_tracker')
+        if tracker is not None:
+            tracker.record(statement)
+
+
+def init_query_budget(app):
+    """Count statements for @query_budget views unless QUERY_BUDGET_MODE is 'off'"""
+    if app.config['QUERY_BUDGET_MODE'] == 'off':
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
@@ -0,0 +1,276 @@
+"""
+Read replica routing
+
+Views marked with @read_replica run their queries against the 'replica'
+bind (REPLICA_DATABASE_URL) instead of the primary. A request is kept on
+the primary when:
+
+- it sends X-Read-Consistency: primary,
+- its user wrote to the database within the last REPLICA_STICKY_S seconds
+  (read-your-writes; with REPLICA_STICKY_PATH set, which the production
+  server does for its workers, a write seen by any worker counts), or
+- the replica is more than REPLICA_MAX_LAG_S behind, or cannot be reached.
+
+Lag is measured with a heartbeat row the primary rewrites every
+REPLICA_HEARTBEAT_S seconds: its age as seen on the replica is how far
+replication is behind. With REPLICA_STICKY_PATH set, one worker per host
+writes it, holding a lease in that file that another worker takes over
+once it lapses; the others only read the lag. For local testing the replica can be a second
+SQLite file kept up to date with `flask sync-replica --interval 1`.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select, update, insert
+from app.models import db, ReplicaHeartbeat
+from app.db_session import REPLICA_BIND
+from app.db_tuning import engine_options, is_sqlite
+
+# Users remembered for read-your-writes, per process
+MAX_RECENT_WRITERS = 10000
+
+# Expired read-your-writes markers are pruned from the shared file every this many writes
+STICKY_PRUNE_INTERVAL = 1000
+
+STICKY_DDL = """
+CREATE TABLE IF NOT EXISTS recent_writers (
+    user_id TEXT PRIMARY KEY,
+    wrote_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS heartbeat_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Heartbeat intervals a writer's lease outlasts its last renewal
+LEASE_INTERVALS = 3
+
+# Seconds a replica lag measurement is reused
+LAG_CHECK_INTERVAL = 1.0
+
+
+def _identity():
+    # Requests without a verified JWT have no identity
+    try:
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+class ReplicaRouter:
+    """Decides per request whether reads may go to the replica"""
+    
+    def __init__(self):
+        self.stats = Counter()
+        self._app = None
+        self._recent_writers = OrderedDict()  # user_id -> time of last write
+        self._local = threading.local()
+        self._writes = 0
+        self._lag = None
+        self._lag_checked = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+    
+    def init_app(self, app):
+        """Add the replica bind (call before db.init_app)"""
+        self._app = app
+        url = app.config['REPLICA_DATABASE_URL']
+        if not url:
+            return
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = {'url': url, **engine_options(app.config, url)}
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.after_request(self._after_request)
+    
+    @property
+    def enabled(self):
+        return bool(self._app and self._app.config['REPLICA_DATABASE_URL'])
+    
+    def _after_request(self, response):
+        if g.get('db_wrote'):
+            user_id = _identity()
+            if user_id is not None:
+                self.record_write(user_id)
+        return response
+    
+    def _sticky_store(self):
+        # Shared SQLite file of the workers on this host, or None to keep markers in memory
+        path = self._app.config['REPLICA_STICKY_PATH']
+        if not path:
+            return None
+        # Connections are per thread and are not carried across fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.key != (path, os.getpid()):
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(STICKY_DDL)
+            self._local.conn, self._local.key = conn, (path, os.getpid())
+        return conn
+    
+    def record_write(self, user_id):
+        """Keep a user's reads on the primary until the replica has its writes"""
+        now = time.time()
+        conn = self._sticky_store()
+        if conn is not None:
+            conn.execute('INSERT OR REPLACE INTO recent_writers VALUES (?, ?)', (str(user_id), now))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % STICKY_PRUNE_INTERVAL == 0
+            if prune:
+                conn.execute(
+                    'DELETE FROM recent_writers WHERE wrote_at < ?', (now - self._app.config['REPLICA_STICKY_S'],)
+                )
+            return
+        with self._lock:
+            self._recent_writers[user_id] = now
+            self._recent_writers.move_to_end(user_id)
+            while len(self._recent_writers) > MAX_RECENT_WRITERS:
+                self._recent_writers.popitem(last=False)
+    
+    def _wrote_recently(self, user_id):
+        if user_id is None:
+            return False
+        conn = self._sticky_store()
+        if conn is not None:
+            row = conn.execute('SELECT wrote_at FROM recent_writers WHERE user_id = ?', (str(user_id),)).fetchone()
+            wrote_at = row[0] if row else None
+        else:
+            with self._lock:
+                wrote_at = self._recent_writers.get(user_id)
+        return wrote_at is not None and time.time() - wrote_at < self._app.config['REPLICA_STICKY_S']
+    
+    def lag(self):
+        """Seconds the replica is behind the primary (None if unknown)"""
+        self._ensure_heartbeat()
+        now = time.monotonic()
+        if now - self._lag_checked < LAG_CHECK_INTERVAL:
+            return self._lag
+        try:
+            with db.engines[REPLICA_BIND].connect() as conn:
+                beat_at = conn.execute(
+                    select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == 1)
+                ).scalar()
+            self._lag = max(time.time() - beat_at, 0.0) if beat_at is not None else None
+        except Exception:
+            self.stats['lag_check_errors'] += 1
+            self._lag = None
+        self._lag_checked = now
+        return self._lag
+    
+    def should_use_replica(self):
+        """Whether the current request's reads may go to the replica"""
+        if not self.enabled:
+            return False
+        if request.headers.get('X-Read-Consistency', '').lower() == 'primary':
+            self.stats['forced_primary'] += 1
+            return False
+        if self._wrote_recently(_identity()):
+            self.stats['sticky_primary'] += 1
+            return False
+        lag = self.lag()
+        if lag is None or lag > self._app.config['REPLICA_MAX_LAG_S']:
+            self.stats['lag_fallbacks'] += 1
+            return False
+        self.stats['replica_reads'] += 1
+        return True
+    
+    def _ensure_heartbeat(self):
+        with self._lock:
+            # Threads do not survive fork; start one per process
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='replica-heartbeat', daemon=True)
+            self._thread.start()
+    
+    def holds_heartbeat_lease(self):
+        """Take or renew the right to write the heartbeat for this host's workers"""
+        conn = self._sticky_store()
+        if conn is None:
+            return True
+        now = time.time()
+        expires_at = now + LEASE_INTERVALS * self._app.config['REPLICA_HEARTBEAT_S']
+        return conn.execute(
+            'INSERT INTO heartbeat_lease (id, holder, expires_at) VALUES (1, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at '
+            'WHERE heartbeat_lease.holder = excluded.holder OR heartbeat_lease.expires_at < ?',
+            (str(os.getpid()), expires_at, now)
+        ).rowcount == 1
+    
+    def _run(self):
+        while True:
+            try:
+                if self.holds_heartbeat_lease():
+                    with self._app.app_context():
+                        beat()
+            except Exception:
+                self.stats['heartbeat_errors'] += 1
+            time.sleep(self._app.config['REPLICA_HEARTBEAT_S'])
+    
+    def get_stats(self):
+        """Routing counters and the last measured lag"""
+        return {
+            **self.stats,
+            'enabled': self.enabled,
+            'lag_s': round(self._lag, 3) if self._lag is not None else None,
+            'max_lag_s': self._app.config['REPLICA_MAX_LAG_S'] if self._app else None,
+        }
+
+
+replica_router = ReplicaRouter()
+
+
+def beat():
+    """Write the primary's current time to the heartbeat row"""
+    now = time.time()
+    with db.engine.begin() as conn:
+        updated = conn.execute(
+            update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == 1).values(beat_at=now)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(ReplicaHeartbeat).values(id=1, beat_at=now))
+
+
+def read_replica(fn):
+    """Run a read-only view against the replica when it is fresh enough.
+    
+    Apply it innermost, directly above the view function.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = g.get('use_replica', False)
+        g.use_replica = replica_router.should_use_replica()
+        if g.use_replica:
+            g.replica_read = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            g.use_replica = previous
+    return wrapper
+
+
+def sync_sqlite_replica():
+    """Copy the primary SQLite database into the replica file"""
+    primary = db.engine.url
+    replica = db.engines[REPLICA_BIND].url
+    if not (is_sqlite(primary) and is_sqlite(replica)):
+        raise ValueError('sync-replica only copies between SQLite files')
+    
+    # The backup API takes a consistent snapshot while the primary keeps serving writes
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.database, timeout=current_app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+    try:
+        beat()
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
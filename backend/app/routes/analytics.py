@@ -6,6 +6,16 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_
 from app.models import db, User, Analytics
+from app.serializers import get_serializer, json_response, parse_fieldset
+from app.projections import get_projection
+from app.wire import request_data, respond
+from app.cache import cached, response_cache
+from app.coalesce import coalesced
+from app.replica import read_replica
+from app.query_budget import query_budget
+from app.admission import admission_class
+from app.db_budget import db_budget
+from app.tracing import span
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
@@ -17,7 +27,8 @@ def admin_required(fn):
     @jwt_required()
     def wrapper(*args, **kwargs):
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        with span('auth'):
+            user = User.query.get(current_user_id)
         
         if not user or user.role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
@@ -27,11 +38,13 @@ def admin_required(fn):
 
 
 @analytics_bp.route('/log', methods=['POST'])
+@admission_class('ingest')
+@query_budget(3)
 @jwt_required()
 def log_analytics():
     """Log analytics event (privacy-safe metadata only)"""
     current_user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request_data()
     
     # Validate required fields
     if not data.get('feature'):
@@ -51,15 +64,22 @@ def log_analytics():
     
     db.session.add(analytics)
     db.session.commit()
+    response_cache.invalidate('analytics:summary', 'analytics:export', f'analytics:user:{current_user_id}')
     
-    return jsonify({
+    return respond({
         'message': 'Analytics logged successfully',
         'id': analytics.id
-    }), 201
+    }, 201)
 
 
 @analytics_bp.route('/summary', methods=['GET'])
+@admission_class('heavy')
+@db_budget(5000)
+@query_budget(7)
 @admin_required
+@cached('analytics:summary', tags=('analytics:summary',))
+@coalesced('analytics:summary', tags=('analytics:summary',))
+@read_replica
 def get_summary():
     """Get analytics summary (admin only)"""
     # Date range
@@ -113,7 +133,13 @@ def get_summary():
 
 
 @analytics_bp.route('/user/<int:user_id>', methods=['GET'])
+@admission_class('heavy')
+@db_budget(5000)
+@query_budget(6)
 @admin_required
+@cached('analytics:user:{user_id}', tags=('analytics:user:{user_id}', 'user:{user_id}'))
+@coalesced('analytics:user:{user_id}', tags=('analytics:user:{user_id}', 'user:{user_id}'))
+@read_replica
 def get_user_analytics(user_id):
     """Get analytics for specific user (admin only)"""
     user = User.query.get(user_id)
@@ -148,49 +174,55 @@ def get_user_analytics(user_id):
         Analytics.user_id == user_id
     ).order_by(Analytics.timestamp.desc()).limit(50).all()
     
-    return jsonify({
+    return json_response({
         'user': user.to_dict(),
         'period_days': days,
         'total_usage': total_usage,
         'feature_usage': [{'feature': f, 'count': c} for f, c in feature_usage],
-        'recent_activity': [a.to_dict() for a in recent_activity]
-    }), 200
+        'recent_activity': get_serializer(Analytics).objects(recent_activity)
+    })
 
 
 @analytics_bp.route('/export', methods=['GET'])
+@admission_class('heavy')
+@db_budget(15000)
+@query_budget(3)
 @admin_required
+@cached('analytics:export', tags=('analytics:export', 'users'))
+@coalesced('analytics:export', tags=('analytics:export', 'users'), ttl_ms=5000)
+@read_replica
 def export_analytics():
     """Export analytics data (admin only)"""
     # Date range
     days = request.args.get('days', 30, type=int)
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Get all analytics in range
-    analytics = Analytics.query.filter(
+    try:
+        fields, expand, _ = parse_fieldset(Analytics, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Get all analytics in range (column projection of the requested fields, no ORM objects)
+    projection = get_projection(Analytics, fields, expand)
+    analytics = projection.fetch_serialized(projection.select().where(
         Analytics.timestamp >= start_date
-    ).order_by(Analytics.timestamp.desc()).all()
+    ).order_by(Analytics.timestamp.desc()))
     
-    return jsonify({
+    return json_response({
         'period_days': days,
         'count': len(analytics),
-        'data': [a.to_dict() for a in analytics]
-    }), 200
+        'data': analytics
+    })
 
 
-@analytics_bp.route('/my-stats', methods=['GET'])
-@jwt_required()
-def get_my_stats():
-    """Get current user's analytics"""
-    current_user_id = get_jwt_identity()
-    
-    # Date range
-    days = request.args.get('days', 30, type=int)
+def user_stats(user_id, days=30):
+    """Usage totals, per-feature and per-day counts for one user"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
     # Total usage
     total_usage = Analytics.query.filter(
         and_(
-            Analytics.user_id == current_user_id,
+            Analytics.user_id == user_id,
             Analytics.timestamp >= start_date
         )
     ).count()
@@ -201,7 +233,7 @@ def get_my_stats():
         func.count(Analytics.id).label('count')
     ).filter(
         and_(
-            Analytics.user_id == current_user_id,
+            Analytics.user_id == user_id,
             Analytics.timestamp >= start_date
         )
     ).group_by(Analytics.feature).all()
@@ -212,14 +244,25 @@ def get_my_stats():
         func.count(Analytics.id).label('count')
     ).filter(
         and_(
-            Analytics.user_id == current_user_id,
+            Analytics.user_id == user_id,
             Analytics.timestamp >= start_date
         )
     ).group_by(func.date(Analytics.timestamp)).order_by('date').all()
     
-    return jsonify({
+    return {
         'period_days': days,
         'total_usage': total_usage,
         'feature_usage': [{'feature': f, 'count': c} for f, c in feature_usage],
         'daily_usage': [{'date': str(d), 'count': c} for d, c in daily_usage]
-    }), 200
+    }
+
+
+@analytics_bp.route('/my-stats', methods=['GET'])
+@query_budget(4)
+@jwt_required()
+@cached('analytics:my-stats:{current_user_id}', tags=('analytics:user:{current_user_id}',))
+def get_my_stats():
+    """Get current user's analytics"""
+    current_user_id = get_jwt_identity()
+    days = request.args.get('days', 30, type=int)
+    return respond(user_stats(current_user_id, days))
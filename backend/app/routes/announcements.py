@@ -4,7 +4,13 @@ Announcement routes
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from app.models import db, User, Announcement
+from app.models import db, User, Announcement, AnnouncementReadState
+from app.serializers import json_response, parse_fieldset
+from app.projections import get_projection
+from app.wire import request_data, respond
+from app.cache import cached, response_cache
+from app.query_budget import query_budget
+from app.tracing import span
 
 announcements_bp = Blueprint('announcements', __name__, url_prefix='/api/announcements')
 
@@ -16,7 +22,8 @@ def admin_required(fn):
     @jwt_required()
     def wrapper(*args, **kwargs):
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        with span('auth'):
+            user = User.query.get(current_user_id)
         
         if not user or user.role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
@@ -25,18 +32,58 @@ def admin_required(fn):
     return wrapper
 
 
-@announcements_bp.route('', methods=['GET'])
-@jwt_required()
-def list_announcements():
-    """List active announcements for current user"""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+def get_read_state(user_id):
+    """Get (or lazily create) the read state row for a user"""
+    state = AnnouncementReadState.query.get(user_id)
+    if not state:
+        state = AnnouncementReadState(user_id=user_id, last_seen_id=0, read_bits=b'')
+        db.session.add(state)
+    return state
+
+
+def refresh_unread_count(state, user):
+    """Recompute a user's unread count from announcements above the watermark"""
+    now = datetime.utcnow()
+    visible = db.and_(
+        Announcement.status == 'active',
+        db.or_(
+            Announcement.expires_at == None,
+            Announcement.expires_at > now
+        ),
+        AnnouncementReadState.visible_filter(user)
+    )
+    # The state's pending changes do not affect this query; they go out with the commit
+    with db.session.no_autoflush:
+        rows = db.session.query(Announcement.id, Announcement.expires_at, visible).filter(
+            Announcement.id > (state.last_seen_id or 0)
+        ).order_by(Announcement.id).all()
+    
+    unread = [(a_id, expires_at) for a_id, expires_at, shown in rows if shown and not state.is_read(a_id)]
     
-    # Get active, non-expired announcements
+    # Everything up to the first announcement that is unread or hidden from this user is
+    # settled; a hidden one (other target, inactive, expired) may still reach them later
+    settled = None
+    for a_id, _, shown in rows:
+        if not shown or not state.is_read(a_id):
+            break
+        settled = a_id
+    if settled is not None:
+        state.advance_watermark(settled)
+    
+    expiries = [expires_at for _, expires_at in unread if expires_at]
+    state.unread_count = len(unread)
+    state.unread_valid_until = min(expiries) if expiries else None
+    return state.unread_count
+
+
+def visible_announcements(user_id, role, fields=None, expand=(), extras=()):
+    """Active announcements targeted at a user, newest first, with read flags"""
+    # Get active, non-expired announcements (column projection, no ORM objects)
     now = datetime.utcnow()
-    query = Announcement.query.filter(
+    projection = get_projection(Announcement, fields, expand, extra=('id', 'target'))
+    stmt = projection.select().where(
         Announcement.status == 'active'
-    ).filter(
+    ).where(
         db.or_(
             Announcement.expires_at == None,
             Announcement.expires_at > now
@@ -45,43 +92,182 @@ def list_announcements():
     
     # Filter by target
     announcements = []
-    for announcement in query.order_by(Announcement.created_at.desc()).all():
+    for announcement in projection.fetch(stmt.order_by(Announcement.created_at.desc())):
         target = announcement.target
         
         # Check if announcement is for this user
         if target == 'all':
             announcements.append(announcement)
-        elif target.startswith('role:') and target.split(':')[1] == user.role:
+        elif target.startswith('role:') and target.split(':')[1] == role:
             announcements.append(announcement)
-        elif target.startswith('user:') and int(target.split(':')[1]) == current_user_id:
+        elif target.startswith('user:') and int(target.split(':')[1]) == user_id:
             announcements.append(announcement)
     
-    return jsonify({
-        'announcements': [a.to_dict() for a in announcements],
+    state = AnnouncementReadState.query.get(user_id)
+    
+    results = projection.serialize(announcements)
+    if 'read' in extras or fields is None:
+        for item, announcement in zip(results, announcements):
+            item['read'] = state.is_read(announcement.id) if state else False
+    return results
+
+
+@announcements_bp.route('', methods=['GET'])
+@query_budget(4)
+@jwt_required()
+@cached('announcements:{current_user_id}', tags=(
+    'announcements', 'announcements:reads:{current_user_id}', 'user:{current_user_id}', 'users'
+), ttl=30)
+def list_announcements():
+    """List active announcements for current user"""
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    try:
+        fields, expand, extras = parse_fieldset(Announcement, request.args, extra=('read',))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    announcements = visible_announcements(current_user_id, user.role, fields, expand, extras)
+    
+    return json_response({
+        'announcements': announcements,
         'count': len(announcements)
+    })
+
+
+@announcements_bp.route('/unread-count', methods=['GET'])
+@query_budget(7)
+@jwt_required()
+def unread_count():
+    """Get the current user's unread announcement count"""
+    current_user_id = get_jwt_identity()
+    state = get_read_state(current_user_id)
+    
+    # Served from the cached counter unless a write or an expiry invalidated it
+    if not state.is_count_valid():
+        user = User.query.get(current_user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        refresh_unread_count(state, user)
+        db.session.commit()
+    
+    return jsonify({
+        'unread_count': state.unread_count
     }), 200
 
 
+@announcements_bp.route('/mark-read', methods=['POST'])
+@query_budget(6)
+@jwt_required()
+def mark_read():
+    """Mark announcements as read in bulk"""
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request_data() or {}
+    state = get_read_state(current_user_id)
+    
+    if data.get('all'):
+        # Everything that exists right now is read
+        latest_id = db.session.query(db.func.max(Announcement.id)).scalar() or 0
+        state.advance_watermark(latest_id)
+        state.unread_count = 0
+        state.unread_valid_until = None
+        db.session.commit()
+        response_cache.invalidate(f'announcements:reads:{current_user_id}')
+        return respond({
+            'message': 'Announcements marked as read',
+            'unread_count': 0
+        })
+    
+    if 'up_to' in data:
+        try:
+            state.advance_watermark(int(data['up_to']))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'up_to must be an announcement id'}), 400
+        state.invalidate()
+        refresh_unread_count(state, user)
+        db.session.commit()
+        response_cache.invalidate(f'announcements:reads:{current_user_id}')
+        return respond({
+            'message': 'Announcements marked as read',
+            'unread_count': state.unread_count
+        })
+    
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'error': 'ids array, up_to or all required'}), 400
+    
+    try:
+        ids = sorted({int(a_id) for a_id in ids})
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids must be announcement ids'}), 400
+    
+    if len(ids) > 500:
+        return jsonify({'error': 'At most 500 ids per request'}), 400
+    
+    # Only announcements this user can currently see affect the counter
+    now = datetime.utcnow()
+    visible_ids = [a_id for (a_id,) in db.session.query(Announcement.id).filter(
+        Announcement.id.in_(ids),
+        Announcement.status == 'active',
+        db.or_(
+            Announcement.expires_at == None,
+            Announcement.expires_at > now
+        ),
+        AnnouncementReadState.visible_filter(user)
+    ).all()]
+    
+    newly_read = state.mark_read(visible_ids)
+    if state.is_count_valid(now):
+        state.unread_count = max(state.unread_count - len(newly_read), 0)
+    else:
+        refresh_unread_count(state, user)
+    unread = state.unread_count
+    
+    db.session.commit()
+    response_cache.invalidate(f'announcements:reads:{current_user_id}')
+    
+    return respond({
+        'message': 'Announcements marked as read',
+        'marked': len(newly_read),
+        'unread_count': unread
+    })
+
+
 @announcements_bp.route('/all', methods=['GET'])
+@query_budget(3)
 @admin_required
+@cached('announcements:all', tags=('announcements', 'users'))
 def list_all_announcements():
     """List all announcements (admin only)"""
     status = request.args.get('status')
     
-    query = Announcement.query
+    try:
+        fields, expand, _ = parse_fieldset(Announcement, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    projection = get_projection(Announcement, fields, expand)
+    stmt = projection.select()
     
     if status:
-        query = query.filter_by(status=status)
+        stmt = stmt.where(Announcement.status == status)
     
-    announcements = query.order_by(Announcement.created_at.desc()).all()
+    announcements = projection.fetch_serialized(stmt.order_by(Announcement.created_at.desc()))
     
-    return jsonify({
-        'announcements': [a.to_dict() for a in announcements],
+    return json_response({
+        'announcements': announcements,
         'count': len(announcements)
-    }), 200
+    })
 
 
 @announcements_bp.route('', methods=['POST'])
+@query_budget(6)
 @admin_required
 def create_announcement():
     """Create new announcement (admin only)"""
@@ -112,7 +298,10 @@ def create_announcement():
             pass
     
     db.session.add(announcement)
+    db.session.flush()
+    AnnouncementReadState.record_new(announcement)
     db.session.commit()
+    response_cache.invalidate('announcements')
     
     return jsonify({
         'message': 'Announcement created successfully',
@@ -121,6 +310,7 @@ def create_announcement():
 
 
 @announcements_bp.route('/<int:announcement_id>', methods=['PUT'])
+@query_budget(8)
 @admin_required
 def update_announcement(announcement_id):
     """Update announcement (admin only)"""
@@ -130,6 +320,7 @@ def update_announcement(announcement_id):
         return jsonify({'error': 'Announcement not found'}), 404
     
     data = request.get_json()
+    previous_target = announcement.target
     
     # Update fields
     if 'title' in data:
@@ -155,7 +346,14 @@ def update_announcement(announcement_id):
         except:
             pass
     
+    # Visibility changes invalidate cached unread counts of affected users
+    if any(field in data for field in ('target', 'status', 'expires_at')):
+        AnnouncementReadState.invalidate_target(previous_target)
+        if announcement.target != previous_target:
+            AnnouncementReadState.invalidate_target(announcement.target)
+    
     db.session.commit()
+    response_cache.invalidate('announcements')
     
     return jsonify({
         'message': 'Announcement updated successfully',
@@ -164,6 +362,7 @@ def update_announcement(announcement_id):
 
 
 @announcements_bp.route('/<int:announcement_id>', methods=['DELETE'])
+@query_budget(5)
 @admin_required
 def delete_announcement(announcement_id):
     """Delete announcement (admin only)"""
@@ -174,6 +373,8 @@ def delete_announcement(announcement_id):
     
     # Soft delete (change status)
     announcement.status = 'deleted'
+    AnnouncementReadState.invalidate_target(announcement.target)
     db.session.commit()
+    response_cache.invalidate('announcements')
     
     return jsonify({'message': 'Announcement deleted successfully'}), 200
@@ -8,11 +8,14 @@ from flask_jwt_extended import (
 )
 from datetime import datetime
 from app.models import db, User
+from app.cache import response_cache
+from app.query_budget import query_budget
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 
 @auth_bp.route('/register', methods=['POST'])
+@query_budget(5)
 def register():
     """Register a new user (admin only in production)"""
     data = request.get_json()
@@ -51,6 +54,7 @@ def register():
     
     db.session.add(user)
     db.session.commit()
+    response_cache.invalidate('users')
     
     return jsonify({
         'message': 'User registered successfully',
@@ -59,6 +63,7 @@ def register():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@query_budget(4)
 def login():
     """Login user and return JWT tokens"""
     data = request.get_json()
@@ -85,6 +90,7 @@ def login():
         user.device_id = data['device_id']
     
     db.session.commit()
+    response_cache.invalidate('users:list', f'user:{user.id}')
     
     # Create tokens
     access_token = create_access_token(identity=user.id)
@@ -99,6 +105,7 @@ def login():
 
 
 @auth_bp.route('/refresh', methods=['POST'])
+@query_budget(1)
 @jwt_required(refresh=True)
 def refresh():
     """Refresh access token"""
@@ -111,6 +118,7 @@ def refresh():
 
 
 @auth_bp.route('/me', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_current_user():
     """Get current user info"""
@@ -126,6 +134,7 @@ def get_current_user():
 
 
 @auth_bp.route('/change-password', methods=['POST'])
+@query_budget(3)
 @jwt_required()
 def change_password():
     """Change user password"""
@@ -149,6 +158,7 @@ def change_password():
 
 
 @auth_bp.route('/logout', methods=['POST'])
+@query_budget(1)
 @jwt_required()
 def logout():
     """Logout user (client should discard tokens)"""
@@ -0,0 +1,175 @@
+"""
+Dashboard routes
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, current_app, copy_current_request_context, g
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models import User
+from app.serializers import dumps
+from app.wire import respond
+from app.routes.tasks import fetch_tasks
+from app.routes.announcements import visible_announcements
+from app.routes.analytics import user_stats
+from app.query_budget import query_budget, QueryTracker
+from app.db_budget import DatabaseBudgetExceeded
+from app.tracing import Trace
+
+dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Thread pool for section queries (threads do not survive fork; one per process)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['DASHBOARD_WORKERS'], thread_name_prefix='dashboard'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def tasks_section(user_id, role):
+    tasks = fetch_tasks(user_id)
+    return {'tasks': tasks, 'count': len(tasks)}
+
+
+def announcements_section(user_id, role):
+    announcements = visible_announcements(user_id, role)
+    return {'announcements': announcements, 'count': len(announcements)}
+
+
+def stats_section(user_id, role):
+    return user_stats(user_id)
+
+
+# Independent sections fetched concurrently, same payloads as their own endpoints
+SECTIONS = {
+    'tasks': tasks_section,
+    'announcements': announcements_section,
+    'stats': stats_section,
+}
+
+
+def section_etag(data):
+    """Strong ETag of a section's serialized data"""
+    return hashlib.blake2b(dumps(data), digest_size=12).hexdigest()
+
+
+def _section_state():
+    """Fresh counterparts of the request's statement accounting, for one section thread"""
+    state = {}
+    if 'query_tracker' in g:
+        state['query_tracker'] = QueryTracker()
+    if 'metrics_sql' in g:
+        state['metrics_sql'] = [0, 0.0]
+    if 'trace' in g:
+        state['trace'] = Trace()
+    # The section runs against the request's database deadline, not a clock of its own
+    for name in ('db_budget_ms', 'db_deadline'):
+        if name in g:
+            state[name] = g.get(name)
+    return state
+
+
+def _run_section(name, user_id, role, state):
+    # Runs in a copy of the request context: its own app context, session and g,
+    # which counts into `state` for _merge_section to add to the request's
+    for key, value in state.items():
+        setattr(g, key, value)
+    trace = state.get('trace')
+    root = trace.start('dashboard.section', {'section': name}) if trace else None
+    try:
+        return SECTIONS[name](user_id, role)
+    finally:
+        if trace is not None:
+            trace.end(root)
+            # Reported with the request's trace, not by this context's teardown
+            g.pop('trace')
+
+
+def _merge_section(state):
+    if 'query_tracker' in state:
+        g.query_tracker.merge(state['query_tracker'])
+    if 'metrics_sql' in state:
+        sql = g.metrics_sql
+        sql[0] += state['metrics_sql'][0]
+        sql[1] += state['metrics_sql'][1]
+    if 'trace' in state:
+        g.trace.adopt(state['trace'])
+
+
+def _parse_known_etags(value):
+    # 'tasks:abc,stats:def' -> {'tasks': 'abc', 'stats': 'def'}
+    known = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, etag = item.partition(':')
+        known[name] = etag.strip('"')
+    return known
+
+
+@dashboard_bp.route('/bootstrap', methods=['GET'])
+@query_budget(7)
+@jwt_required()
+def bootstrap():
+    """Everything the dashboard needs on load, in one round trip"""
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    requested = list(dict.fromkeys(n.strip() for n in request.args.get('sections', '').split(',') if n.strip()))
+    unknown = [name for name in requested if name != 'user' and name not in SECTIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown sections: {', '.join(unknown)}"}), 400
+    wanted = requested or ['user', *SECTIONS]
+    
+    # The user was resolved once above; the remaining sections only need its id and role
+    executor = get_executor()
+    futures = {}
+    for name in wanted:
+        if name in SECTIONS:
+            state = _section_state()
+            run = copy_current_request_context(_run_section)
+            futures[name] = (executor.submit(run, name, user.id, user.role, state), state)
+    
+    results = {}
+    if 'user' in wanted:
+        results['user'] = {'user': user.to_dict()}
+    for name, (future, state) in futures.items():
+        try:
+            results[name] = future.result()
+        except DatabaseBudgetExceeded:
+            # The request's budget: the whole request fails, as it would in the view itself
+            raise
+        except Exception:
+            current_app.logger.exception('Dashboard section %s failed', name)
+            results[name] = None
+        finally:
+            _merge_section(state)
+    
+    # Sections whose ETag the client already has are sent without their data
+    known = _parse_known_etags(request.args.get('etags', ''))
+    sections = {}
+    for name in wanted:
+        data = results[name]
+        if data is None:
+            sections[name] = {'error': 'Section unavailable'}
+            continue
+        etag = section_etag(data)
+        if known.get(name) == etag:
+            sections[name] = {'etag': etag, 'unchanged': True}
+        else:
+            sections[name] = {'etag': etag, 'data': data}
+    
+    response = respond({'sections': sections})
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
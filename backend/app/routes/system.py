@@ -0,0 +1,93 @@
+"""
+System routes (Admin only)
+"""
+import hmac
+from flask import Blueprint, Response, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from functools import wraps
+from app.models import User
+from app.cache import response_cache
+from app.coalesce import single_flight
+from app.replica import replica_router
+from app.metrics import metrics
+from app.query_budget import query_budget
+from app.admission import admission, admission_class
+from app.tracing import span
+
+system_bp = Blueprint('system', __name__, url_prefix='/api')
+
+
+def admin_required(fn):
+    """Decorator to require admin role"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        current_user_id = get_jwt_identity()
+        with span('auth'):
+            user = User.query.get(current_user_id)
+        
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@system_bp.route('/cache/stats', methods=['GET'])
+@query_budget(1)
+@admin_required
+def cache_stats():
+    """Response cache hit/miss/evict counters (admin only)"""
+    return jsonify(response_cache.get_stats()), 200
+
+
+@system_bp.route('/cache/clear', methods=['POST'])
+@query_budget(1)
+@admin_required
+def clear_cache():
+    """Drop every cached response (admin only)"""
+    response_cache.clear()
+    return jsonify({'message': 'Cache cleared'}), 200
+
+
+@system_bp.route('/coalescing/stats', methods=['GET'])
+@query_budget(1)
+@admin_required
+def coalescing_stats():
+    """Single-flight computed/coalesced/result-hit counters (admin only)"""
+    return jsonify(single_flight.get_stats()), 200
+
+
+@system_bp.route('/replica/status', methods=['GET'])
+@query_budget(1)
+@admin_required
+def replica_status():
+    """Read replica lag and routing counters (admin only)"""
+    return jsonify(replica_router.get_stats()), 200
+
+
+@system_bp.route('/admission/stats', methods=['GET'])
+@query_budget(1)
+@admin_required
+def admission_stats():
+    """Admission slots, queue depth and shed counts per endpoint class (admin only)"""
+    return jsonify(admission.get_stats()), 200
+
+
+@system_bp.route('/metrics', methods=['GET'])
+@admission_class(None)
+@query_budget(0)
+def prometheus_metrics():
+    """Request and SQL metrics in the Prometheus text format (METRICS_TOKEN if set)"""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Metrics disabled'}), 404
+    
+    token = current_app.config['METRICS_TOKEN']
+    if not token and current_app.config['METRICS_TOKEN_REQUIRED']:
+        # Closed rather than open to anyone when the token was forgotten
+        return jsonify({'error': 'Metrics need METRICS_TOKEN to be set'}), 403
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if token and not hmac.compare_digest(supplied, token):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
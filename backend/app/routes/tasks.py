@@ -5,12 +5,38 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from app.models import db, User, Task
+from app.serializers import get_serializer, json_response, parse_fieldset
+from app.projections import get_projection
+from app.wire import request_data, respond
+from app.cache import cached, response_cache
+from app.query_budget import query_budget
+from app.admission import admission_class
 
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/api/tasks')
 
 
+def fetch_tasks(user_id, fields=None, expand=(), status=None, priority=None, source=None):
+    """A user's tasks, newest first, serialized with the given fieldset"""
+    # Column projection of the requested fields, no ORM objects
+    projection = get_projection(Task, fields, expand)
+    stmt = projection.select().where(Task.user_id == user_id)
+    
+    if status:
+        stmt = stmt.where(Task.status == status)
+    
+    if priority:
+        stmt = stmt.where(Task.priority == priority)
+    
+    if source:
+        stmt = stmt.where(Task.source == source)
+    
+    return projection.fetch_serialized(stmt.order_by(Task.created_at.desc()))
+
+
 @tasks_bp.route('', methods=['GET'])
+@query_budget(2)
 @jwt_required()
+@cached('tasks:{current_user_id}', tags=('tasks:user:{current_user_id}', 'user:{current_user_id}'))
 def list_tasks():
     """List user's tasks"""
     current_user_id = get_jwt_identity()
@@ -20,42 +46,47 @@ def list_tasks():
     priority = request.args.get('priority')
     source = request.args.get('source')
     
-    # Build query
-    query = Task.query.filter_by(user_id=current_user_id)
-    
-    if status:
-        query = query.filter_by(status=status)
-    
-    if priority:
-        query = query.filter_by(priority=priority)
-    
-    if source:
-        query = query.filter_by(source=source)
+    try:
+        fields, expand, _ = parse_fieldset(Task, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    tasks = query.order_by(Task.created_at.desc()).all()
+    tasks = fetch_tasks(current_user_id, fields, expand, status, priority, source)
     
-    return jsonify({
-        'tasks': [task.to_dict() for task in tasks],
+    return json_response({
+        'tasks': tasks,
         'count': len(tasks)
-    }), 200
+    })
 
 
 @tasks_bp.route('/<int:task_id>', methods=['GET'])
+@query_budget(2)
 @jwt_required()
+@cached('tasks:{current_user_id}:{task_id}', tags=('tasks:user:{current_user_id}', 'user:{current_user_id}'))
 def get_task(task_id):
     """Get specific task"""
     current_user_id = get_jwt_identity()
-    task = Task.query.filter_by(id=task_id, user_id=current_user_id).first()
+    
+    try:
+        fields, expand, _ = parse_fieldset(Task, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    projection = get_projection(Task, fields, expand)
+    task = projection.fetch_one(projection.select().where(
+        Task.id == task_id, Task.user_id == current_user_id
+    ))
     
     if not task:
         return jsonify({'error': 'Task not found'}), 404
     
-    return jsonify({
-        'task': task.to_dict()
-    }), 200
+    return json_response({
+        'task': task
+    })
 
 
 @tasks_bp.route('', methods=['POST'])
+@query_budget(3)
 @jwt_required()
 def create_task():
     """Create new task"""
@@ -86,6 +117,7 @@ def create_task():
     
     db.session.add(task)
     db.session.commit()
+    response_cache.invalidate(f'tasks:user:{current_user_id}')
     
     return jsonify({
         'message': 'Task created successfully',
@@ -94,6 +126,7 @@ def create_task():
 
 
 @tasks_bp.route('/<int:task_id>', methods=['PUT'])
+@query_budget(4)
 @jwt_required()
 def update_task(task_id):
     """Update task"""
@@ -128,6 +161,7 @@ def update_task(task_id):
             pass
     
     db.session.commit()
+    response_cache.invalidate(f'tasks:user:{current_user_id}')
     
     return jsonify({
         'message': 'Task updated successfully',
@@ -136,6 +170,7 @@ def update_task(task_id):
 
 
 @tasks_bp.route('/<int:task_id>', methods=['DELETE'])
+@query_budget(3)
 @jwt_required()
 def delete_task(task_id):
     """Delete task"""
@@ -147,63 +182,98 @@ def delete_task(task_id):
     
     db.session.delete(task)
     db.session.commit()
+    response_cache.invalidate(f'tasks:user:{current_user_id}')
     
     return jsonify({'message': 'Task deleted successfully'}), 200
 
 
 @tasks_bp.route('/sync', methods=['POST'])
+@admission_class('ingest')
+@query_budget(8)
 @jwt_required()
 def sync_tasks():
     """Sync tasks from mobile (batch create/update)"""
     current_user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request_data()
     
     if not data.get('tasks'):
         return jsonify({'error': 'Tasks array required'}), 400
     
     synced_tasks = []
     
+    # Clients send ids as numbers or strings; compare them as the integers they are
+    try:
+        ids = {int(t['id']) for t in data['tasks'] if t.get('id')}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Task ids must be integers'}), 400
+    
+    # Existing tasks (by id or voice_note_id) in one query per key, not one per item
+    voice_note_ids = {t['voice_note_id'] for t in data['tasks'] if not t.get('id') and t.get('voice_note_id')}
+    by_id = {}
+    by_voice_note = {}
+    if ids:
+        by_id = {task.id: task for task in Task.query.filter(
+            Task.user_id == current_user_id, Task.id.in_(ids)
+        )}
+    if voice_note_ids:
+        for task in Task.query.filter(
+            Task.user_id == current_user_id, Task.voice_note_id.in_(voice_note_ids)
+        ).order_by(Task.id):
+            by_voice_note.setdefault(task.voice_note_id, task)
+    
+    # New tasks are collected as rows and inserted in one statement
+    new_rows = []
     for task_data in data['tasks']:
         # Check if task exists (by voice_note_id or id)
         task = None
         
         if task_data.get('id'):
-            task = Task.query.filter_by(id=task_data['id'], user_id=current_user_id).first()
+            task = by_id.get(int(task_data['id']))
         elif task_data.get('voice_note_id'):
-            task = Task.query.filter_by(
-                voice_note_id=task_data['voice_note_id'],
-                user_id=current_user_id
-            ).first()
+            task = by_voice_note.get(task_data['voice_note_id'])
         
-        if task:
-            # Update existing task
-            if 'title' in task_data:
-                task.title = task_data['title']
-            if 'description' in task_data:
-                task.description = task_data['description']
-            if 'status' in task_data:
-                task.status = task_data['status']
-            if 'priority' in task_data:
-                task.priority = task_data['priority']
+        if task is not None:
+            # Update existing task (or a new one from an earlier item)
+            changes = {
+                key: task_data[key] for key in ('title', 'description', 'status', 'priority') if key in task_data
+            }
+            if isinstance(task, dict):
+                task.update(changes)
+            else:
+                for key, value in changes.items():
+                    setattr(task, key, value)
         else:
             # Create new task
-            task = Task(
-                user_id=current_user_id,
-                title=task_data.get('title', 'Untitled Task'),
-                description=task_data.get('description', ''),
-                status=task_data.get('status', 'pending'),
-                priority=task_data.get('priority', 'medium'),
-                source=task_data.get('source', 'voice_note'),
-                voice_note_id=task_data.get('voice_note_id')
-            )
-            db.session.add(task)
+            task = {
+                'user_id': current_user_id,
+                'title': task_data.get('title', 'Untitled Task'),
+                'description': task_data.get('description', ''),
+                'status': task_data.get('status', 'pending'),
+                'priority': task_data.get('priority', 'medium'),
+                'source': task_data.get('source', 'voice_note'),
+                'voice_note_id': task_data.get('voice_note_id'),
+            }
+            new_rows.append(task)
+            if task['voice_note_id']:
+                # A later item with the same voice note updates this one
+                by_voice_note[task['voice_note_id']] = task
         
         synced_tasks.append(task)
     
+    db.session.flush()
+    if new_rows:
+        # sort_by_parameter_order would make SQLite insert row by row; ids are assigned in row order
+        created = sorted(db.session.scalars(db.insert(Task).returning(Task), new_rows), key=lambda task: task.id)
+        by_row = {id(row): task for row, task in zip(new_rows, created)}
+        synced_tasks = [by_row.get(id(task), task) for task in synced_tasks]
+    
+    # Serialized before the commit expires them, which would reload each task on its own
+    tasks = get_serializer(Task).objects(synced_tasks)
     db.session.commit()
+    response_cache.invalidate(f'tasks:user:{current_user_id}')
     
-    return jsonify({
+    return respond({
         'message': 'Tasks synced successfully',
-        'tasks': [task.to_dict() for task in synced_tasks],
+        'tasks': tasks,
         'count': len(synced_tasks)
-    }), 200
+    })
@@ -1,14 +1,30 @@
 """
 User management routes (Admin only)
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from app.models import db, User
+import io
+import json
+from app.models import db, User, AnnouncementReadState, PERMISSION_BITS
+from app.search import search_filter
+from app.pagination import keyset_page, offset_page, page_size, ApproximateCounter, MAX_CURSOR_PAGE
+from app.user_import import PARSERS, import_users
+from app.user_purge import user_purger
+from app.serializers import json_response, parse_fieldset
+from app.projections import get_projection
+from app.cache import cached, response_cache
+from app.query_budget import query_budget
+from app.admission import admission_class
+from app.db_budget import db_budget
+from app.tracing import span
 from functools import wraps
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
+# Cached totals for cursor-mode listings
+user_counts = ApproximateCounter()
+
 
 def admin_required(fn):
     """Decorator to require admin role"""
@@ -16,73 +32,144 @@ def admin_required(fn):
     @jwt_required()
     def wrapper(*args, **kwargs):
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        with span('auth'):
+            user = User.query.get(current_user_id)
         
-        if not user or user.role != 'admin':
+        if not user or user.status != 'active' or user.role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         
         return fn(*args, **kwargs)
     return wrapper
 
 
-@users_bp.route('', methods=['GET'])
-@admin_required
-def list_users():
-    """List all users (admin only)"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    role = request.args.get('role')
-    status = request.args.get('status')
-    search = request.args.get('search')
+def build_user_filters(role=None, status=None, search=None, fuzzy=False, permission=None):
+    """Build the filter criteria for the user listing"""
+    criteria = []
     
-    # Build query
-    query = User.query
+    if permission:
+        criteria.append(User.permission_filter(permission))
     
     if role:
-        query = query.filter_by(role=role)
+        criteria.append(User.role == role)
     
     if status:
-        query = query.filter_by(status=status)
+        criteria.append(User.status == status)
+    else:
+        criteria.append(User.status != 'deleted')
     
     if search:
-        search_pattern = f'%{search}%'
-        query = query.filter(
-            db.or_(
-                User.email.like(search_pattern),
-                User.username.like(search_pattern),
-                User.full_name.like(search_pattern)
+        criteria.append(search_filter(search, fuzzy=fuzzy))
+    
+    return criteria
+
+
+def count_users(criteria):
+    """COUNT(*) of users matching the criteria"""
+    return db.session.execute(
+        db.select(db.func.count()).select_from(User).where(*criteria)
+    ).scalar()
+
+
+@users_bp.route('', methods=['GET'])
+@query_budget(4)
+@admin_required
+@cached('users:list', tags=('users', 'users:list'), ttl=30)
+def list_users():
+    """List all users (admin only)"""
+    page = request.args.get('page', 1, type=int)
+    per_page = page_size(request.args.get('per_page', 20, type=int))
+    filters = {
+        'role': request.args.get('role'),
+        'status': request.args.get('status'),
+        'search': request.args.get('search'),
+        'fuzzy': request.args.get('fuzzy', '').lower() in ('1', 'true', 'yes'),
+        'permission': request.args.get('permission')
+    }
+    
+    if filters['permission'] and filters['permission'] not in PERMISSION_BITS:
+        return jsonify({'error': f'Invalid permission. Must be one of: {list(PERMISSION_BITS)}'}), 400
+    
+    try:
+        fields, expand, _ = parse_fieldset(User, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Build query (column projection of the requested fields, no ORM objects)
+    projection = get_projection(User, fields, expand, extra=('created_at', 'id'))
+    criteria = build_user_filters(**filters)
+    stmt = projection.select().where(*criteria)
+    
+    # Cursor mode: keyset pagination without a COUNT per page
+    if 'cursor' in request.args:
+        per_page = page_size(per_page, MAX_CURSOR_PAGE)
+        try:
+            users, next_cursor = keyset_page(
+                stmt, User, per_page, projection.fetch, request.args.get('cursor') or None
             )
-        )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        if request.args.get('include_total', '').lower() in ('1', 'true', 'yes'):
+            total, approximate = count_users(criteria), False
+        elif filters['search']:
+            # Every keystroke is a new key; a background count per search is never reused
+            total, approximate = None, True
+        else:
+            key = tuple(sorted(filters.items()))
+            total, _ = user_counts.get(
+                key,
+                lambda: count_users(build_user_filters(**filters)),
+                current_app.config['APPROXIMATE_COUNT_TTL']
+            )
+            approximate = True
+        
+        return json_response({
+            'users': projection.serialize(users),
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total,
+            'total_approximate': approximate
+        })
     
     # Paginate
-    pagination = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    users, total, pages = offset_page(
+        stmt.order_by(User.created_at.desc()), page, per_page, projection.fetch_serialized
     )
     
-    return jsonify({
-        'users': [user.to_dict() for user in pagination.items],
-        'total': pagination.total,
+    return json_response({
+        'users': users,
+        'total': total,
         'page': page,
         'per_page': per_page,
-        'pages': pagination.pages
-    }), 200
+        'pages': pages
+    })
 
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
+@query_budget(3)
 @admin_required
+@cached('users:{user_id}', tags=('user:{user_id}',))
 def get_user(user_id):
     """Get user details (admin only)"""
-    user = User.query.get(user_id)
+    try:
+        fields, expand, _ = parse_fieldset(User, request.args, sensitive=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    projection = get_projection(User, fields, expand)
+    user = projection.fetch_one(projection.select().where(User.id == user_id, User.status != 'deleted'))
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify({
-        'user': user.to_dict(include_sensitive=True)
-    }), 200
+    return json_response({
+        'user': user
+    })
 
 
 @users_bp.route('', methods=['POST'])
+@query_budget(6)
 @admin_required
 def create_user():
     """Create new user (admin only)"""
@@ -115,6 +202,7 @@ def create_user():
     
     db.session.add(user)
     db.session.commit()
+    response_cache.invalidate('users')
     
     return jsonify({
         'message': 'User created successfully',
@@ -122,13 +210,48 @@ def create_user():
     }), 201
 
 
+@users_bp.route('/import', methods=['POST'])
+@admission_class('heavy')
+@db_budget(0)
+@query_budget(3)
+@admin_required
+def bulk_import_users():
+    """Bulk import users from a CSV or NDJSON body (admin only)"""
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in PARSERS:
+        return jsonify({'error': f'Invalid format. Must be one of: {list(PARSERS)}'}), 400
+    
+    chunk_size = max(1, min(request.args.get('chunk_size', 500, type=int), 5000))
+    workers = current_app.config['IMPORT_HASH_WORKERS']
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    
+    def generate():
+        created = failed = 0
+        try:
+            for result in import_users(PARSERS[fmt](lines), chunk_size=chunk_size, workers=workers):
+                if result['status'] == 'created':
+                    created += 1
+                else:
+                    failed += 1
+                yield json.dumps(result) + '\n'
+        finally:
+            # Chunks are committed as they go, so also on an aborted import
+            if created:
+                response_cache.invalidate('users')
+        yield json.dumps({'summary': {'created': created, 'failed': failed}}) + '\n'
+    
+    # Per-row results are streamed back as NDJSON while the body is read
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @users_bp.route('/<int:user_id>', methods=['PUT'])
+@query_budget(5)
 @admin_required
 def update_user(user_id):
     """Update user (admin only)"""
     user = User.query.get(user_id)
     
-    if not user:
+    if not user or user.status == 'deleted':
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
@@ -147,8 +270,12 @@ def update_user(user_id):
     if 'full_name' in data:
         user.full_name = data['full_name']
     
-    if 'role' in data:
+    if 'role' in data and data['role'] != user.role:
         user.role = data['role']
+        # Role-targeted announcements visible to this user change
+        state = AnnouncementReadState.query.get(user.id)
+        if state:
+            state.invalidate()
     
     if 'status' in data:
         user.status = data['status']
@@ -160,6 +287,7 @@ def update_user(user_id):
         user.set_password(data['password'])
     
     db.session.commit()
+    response_cache.invalidate('users', f'user:{user_id}')
     
     return jsonify({
         'message': 'User updated successfully',
@@ -168,12 +296,13 @@ def update_user(user_id):
 
 
 @users_bp.route('/<int:user_id>', methods=['DELETE'])
+@query_budget(5)
 @admin_required
 def delete_user(user_id):
     """Delete user (admin only)"""
     user = User.query.get(user_id)
     
-    if not user:
+    if not user or user.status == 'deleted':
         return jsonify({'error': 'User not found'}), 404
     
     # Don't allow deleting yourself
@@ -181,19 +310,23 @@ def delete_user(user_id):
     if user_id == current_user_id:
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
-    db.session.delete(user)
+    # Mark as deleted now; child rows are removed in the background
+    user.status = 'deleted'
     db.session.commit()
+    response_cache.invalidate('users', f'user:{user_id}')
+    user_purger.schedule(user.id)
     
     return jsonify({'message': 'User deleted successfully'}), 200
 
 
 @users_bp.route('/<int:user_id>/permissions', methods=['PUT'])
+@query_budget(5)
 @admin_required
 def update_permissions(user_id):
     """Update user permissions (admin only)"""
     user = User.query.get(user_id)
     
-    if not user:
+    if not user or user.status == 'deleted':
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
@@ -203,6 +336,7 @@ def update_permissions(user_id):
     
     user.set_permissions(data['permissions'])
     db.session.commit()
+    response_cache.invalidate('users', f'user:{user_id}')
     
     return jsonify({
         'message': 'Permissions updated successfully',
@@ -211,12 +345,13 @@ def update_permissions(user_id):
 
 
 @users_bp.route('/<int:user_id>/status', methods=['PUT'])
+@query_budget(5)
 @admin_required
 def update_status(user_id):
     """Update user status (admin only)"""
     user = User.query.get(user_id)
     
-    if not user:
+    if not user or user.status == 'deleted':
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
@@ -230,6 +365,7 @@ def update_status(user_id):
     
     user.status = data['status']
     db.session.commit()
+    response_cache.invalidate('users', f'user:{user_id}')
     
     return jsonify({
         'message': 'Status updated successfully',
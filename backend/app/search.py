@@ -0,0 +1,220 @@
+"""
+Indexed user search for the admin user listing
+
+SQLite uses an FTS5 table with the trigram tokenizer, kept in sync with the
+users table by triggers. Postgres uses a pg_trgm GIN index. Any other engine
+(or an SQLite build without trigram support) falls back to LIKE scans.
+"""
+import sqlite3
+from sqlalchemy import text, func, literal
+from app.models import db, User
+
+# Minimum trigram similarity for typo-tolerant matches (pg_trgm's default)
+SIMILARITY_THRESHOLD = 0.3
+
+# Upper bound on candidates scored for typo-tolerant matching
+FUZZY_CANDIDATES = 200
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+        email, username, full_name,
+        content='users', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_search(rowid, email, username, full_name)
+        VALUES (new.id, new.email, new.username, new.full_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_search(users_search, rowid, email, username, full_name)
+        VALUES ('delete', old.id, old.email, old.username, old.full_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_search_au
+    AFTER UPDATE OF email, username, full_name ON users BEGIN
+        INSERT INTO users_search(users_search, rowid, email, username, full_name)
+        VALUES ('delete', old.id, old.email, old.username, old.full_name);
+        INSERT INTO users_search(rowid, email, username, full_name)
+        VALUES (new.id, new.email, new.username, new.full_name);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin (
+        (lower(email || ' ' || username || ' ' || coalesce(full_name, ''))) gin_trgm_ops
+    )
+    """,
+]
+
+
+def init_user_search(app):
+    """Create the search index for the configured database (idempotent)"""
+    requested = app.config.get('USER_SEARCH_BACKEND', 'auto')
+    backend = 'like'
+    
+    if requested != 'like':
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34, 0):
+            backend = _init_sqlite()
+        elif dialect == 'postgresql':
+            backend = _init_postgres()
+    
+    app.extensions['user_search'] = backend
+    return backend
+
+
+def _init_sqlite():
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_search'"
+    )).first()
+    try:
+        for statement in SQLITE_DDL:
+            db.session.execute(text(statement))
+        if not exists:
+            # Index users created before the search table existed
+            db.session.execute(text("INSERT INTO users_search(users_search) VALUES ('rebuild')"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return 'like'
+    return 'fts5'
+
+
+def _init_postgres():
+    try:
+        for statement in POSTGRES_DDL:
+            db.session.execute(text(statement))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return 'like'
+    return 'trgm'
+
+
+def detect_user_search(app):
+    """Backend of an index created earlier by init_user_search(), without DDL"""
+    if app.config.get('USER_SEARCH_BACKEND', 'auto') == 'like':
+        return 'like'
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        found = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_search'"
+        )).first()
+        return 'fts5' if found else 'like'
+    if dialect == 'postgresql':
+        found = db.session.execute(text(
+            "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_users_search_trgm'"
+        )).first()
+        return 'trgm' if found else 'like'
+    return 'like'
+
+
+def search_backend():
+    """Name of the active search backend ('fts5', 'trgm' or 'like')"""
+    from flask import current_app
+    backend = current_app.extensions.get('user_search')
+    if backend is None:
+        # FAST_START skips init_user_search(); look for an existing index once
+        backend = current_app.extensions['user_search'] = detect_user_search(current_app)
+    return backend
+
+
+def trigrams(value):
+    """Set of lowercase trigrams in a string, padded per word like pg_trgm"""
+    grams = set()
+    for word in (value or '').lower().replace('@', ' ').replace('.', ' ').split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(term, value):
+    """Trigram similarity of term against the closest word in value"""
+    term_grams = trigrams(term)
+    if not term_grams:
+        return 0.0
+    best = 0.0
+    for word in (value or '').replace('@', ' ').replace('.', ' ').split():
+        word_grams = trigrams(word)
+        best = max(best, len(term_grams & word_grams) / len(term_grams | word_grams))
+    return best
+
+
+def like_filter(term):
+    """Legacy substring filter (unindexed)"""
+    search_pattern = f'%{term}%'
+    return db.or_(
+        User.email.like(search_pattern),
+        User.username.like(search_pattern),
+        User.full_name.like(search_pattern)
+    )
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fuzzy_ids_sqlite(term):
+    # Padded grams are not in the FTS index; retrieve on the inner ones
+    grams = sorted(gram for gram in trigrams(term) if ' ' not in gram)
+    if not grams:
+        return []
+    match = ' OR '.join(_fts_phrase(gram) for gram in grams)
+    rows = db.session.execute(text(
+        "SELECT rowid, email, username, full_name FROM users_search "
+        "WHERE users_search MATCH :match ORDER BY rank LIMIT :limit"
+    ), {'match': match, 'limit': FUZZY_CANDIDATES}).all()
+    return [
+        row[0] for row in rows
+        if max(similarity(term, value) for value in row[1:]) >= SIMILARITY_THRESHOLD
+    ]
+
+
+def search_filter(term, fuzzy=False):
+    """SQL filter on User matching a search term via the active index.
+    
+    Substring (and therefore prefix) matches always apply. Typo-tolerant
+    matches are added when fuzzy is set, or when nothing matches exactly.
+    """
+    term = term.strip()
+    backend = search_backend()
+    
+    # Trigram indexes cannot answer terms shorter than one trigram
+    if backend == 'like' or len(term) < 3:
+        return like_filter(term)
+    
+    if backend == 'fts5':
+        params = {'match': _fts_phrase(term)}
+        exact = User.id.in_(
+            text("SELECT rowid FROM users_search WHERE users_search MATCH :match")
+            .bindparams(**params)
+            .columns(db.column('rowid', db.Integer))
+        )
+        if not fuzzy:
+            hit = db.session.execute(text(
+                "SELECT 1 FROM users_search WHERE users_search MATCH :match LIMIT 1"
+            ), params).first()
+            if hit:
+                return exact
+        fuzzy_ids = _fuzzy_ids_sqlite(term)
+        return db.or_(exact, User.id.in_(fuzzy_ids)) if fuzzy_ids else exact
+    
+    # pg_trgm: the same expression as the GIN index so both predicates use it
+    document = func.lower(
+        User.email + ' ' + User.username + ' ' + func.coalesce(User.full_name, '')
+    )
+    escaped = term.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    exact = document.like(f'%{escaped}%', escape='\\')
+    if not fuzzy:
+        hit = db.session.query(User.id).filter(exact).limit(1).first()
+        if hit:
+            return exact
+    return db.or_(exact, document.op('%>')(literal(term.lower())))
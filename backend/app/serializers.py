@@ -0,0 +1,271 @@
+"""
+Compiled fast-path serializers for model lists
+
+One serializer is generated per (model, field set) and cached. It is a
+plain function built from source, so serializing a row costs one dict
+literal plus the few conversions that field set actually needs. Serializers
+accept either ORM objects or column tuples selected in `columns` order.
+"""
+import json
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import DateTime, inspect
+from sqlalchemy.orm import aliased
+from app.models import db, User, Analytics, Task, Announcement
+from app.tracing import span
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# Fields each model serializes, in to_dict() order
+MODEL_FIELDS = {
+    User: ('id', 'email', 'username', 'full_name', 'role', 'status', 'permissions',
+           'created_at', 'last_login', 'device_id'),
+    Analytics: ('id', 'user_id', 'feature', 'metadata', 'timestamp', 'device_type'),
+    Task: ('id', 'user_id', 'title', 'description', 'status', 'priority', 'created_at',
+           'due_date', 'completed_at', 'source', 'voice_note_id'),
+    Announcement: ('id', 'sender_id', 'sender_name', 'title', 'message', 'priority',
+                   'target', 'created_at', 'expires_at', 'status'),
+}
+
+# Fields left out unless asked for (see User.to_dict(include_sensitive=True))
+SENSITIVE_FIELDS = {
+    User: ('device_id',),
+}
+
+# Aliased joins that derived fields read from
+JOINS = {
+    (Announcement, 'sender'): lambda: aliased(User, name='sender'),
+    (Analytics, 'user'): lambda: aliased(User, name='user'),
+    (Task, 'user'): lambda: aliased(User, name='user'),
+}
+
+JOIN_CONDITIONS = {
+    (Announcement, 'sender'): lambda sender: sender.id == Announcement.sender_id,
+    (Analytics, 'user'): lambda user: user.id == Analytics.user_id,
+    (Task, 'user'): lambda user: user.id == Task.user_id,
+}
+
+# Fields that come from a joined model: (join name, column on the join)
+DERIVED_FIELDS = {
+    (Announcement, 'sender_name'): ('sender', 'full_name'),
+}
+
+# Related rows that ?expand= can nest: (join name, nested fields)
+EXPANSIONS = {
+    (Announcement, 'sender'): ('sender', ('id', 'full_name', 'email')),
+    (Analytics, 'user'): ('user', ('id', 'username', 'email')),
+    (Task, 'user'): ('user', ('id', 'username', 'full_name')),
+}
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+@lru_cache(maxsize=1024)
+def _json_text_cached(value):
+    # Most users share a handful of permission sets; the result is shared, never mutate it
+    try:
+        return json.loads(value) if value else {}
+    except ValueError:
+        return {}
+
+
+def _json_text(value):
+    try:
+        return json.loads(value) if value else {}
+    except ValueError:
+        return {}
+
+
+# Column-specific conversions beyond the DateTime -> isoformat default
+CONVERTERS = {
+    (User, 'permissions'): _json_text_cached,
+    (Analytics, 'metadata'): _json_text,
+}
+
+
+def default_fields(model):
+    """Field names a model serializes by default"""
+    hidden = SENSITIVE_FIELDS.get(model, ())
+    return tuple(name for name in MODEL_FIELDS[model] if name not in hidden)
+
+
+def _converter(model, name, column):
+    if (model, name) in CONVERTERS:
+        return CONVERTERS[(model, name)]
+    if isinstance(column.type, DateTime):
+        return _isoformat
+    return None
+
+
+class Serializer:
+    """Serializer for one model, field set and set of expansions"""
+    
+    def __init__(self, model, fields, expand=()):
+        self.model = model
+        self.fields = fields
+        self.expand = expand
+        self.joins = {}
+        self.columns = []
+        self._namespace = {}
+        row_items = []
+        object_items = []
+        
+        for name in fields:
+            index = len(self.columns)
+            if (model, name) in DERIVED_FIELDS:
+                join_name, attr = DERIVED_FIELDS[(model, name)]
+                target = self._join(join_name)
+                self.columns.append(getattr(target, attr).label(name))
+                self._namespace[f'_g{index}'] = self._related_getter(join_name, attr)
+                row_items.append((name, f'r[{index}]'))
+                object_items.append((name, f'_g{index}(r)'))
+                continue
+            
+            column = model.__table__.c[name]
+            key = model.__mapper__.get_property_by_column(column).key
+            self.columns.append(getattr(model, key))
+            row_items.append((name, self._convert(model, name, column, f'r[{index}]', index)))
+            object_items.append((name, self._convert(model, name, column, f'r.{key}', index)))
+        
+        # Expansions nest a related row, e.g. 'sender': {'id': ..., ...}
+        for name in expand:
+            join_name, nested_fields = EXPANSIONS[(model, name)]
+            target = self._join(join_name)
+            related_model = inspect(target).mapper.class_
+            first = len(self.columns)
+            nested_row = []
+            nested_object = []
+            for field in nested_fields:
+                index = len(self.columns)
+                column = related_model.__table__.c[field]
+                key = related_model.__mapper__.get_property_by_column(column).key
+                self.columns.append(getattr(target, key).label(f'{name}__{field}'))
+                nested_row.append((field, self._convert(related_model, field, column, f'r[{index}]', index)))
+                nested_object.append((field, self._convert(related_model, field, column, f'x.{key}', index)))
+            
+            row_items.append((name, f'({self._literal(nested_row)} if r[{first}] is not None else None)'))
+            self._namespace[f'_x{first}'] = self._compile(nested_object, 'x')
+            self._namespace[f'_j{first}'] = self._related_getter(join_name, None)
+            object_items.append((name, f'_x{first}(_j{first}(r)) if _j{first}(r) is not None else None'))
+        
+        self.from_row = self._compile(row_items, 'r')
+        self.from_object = self._compile(object_items, 'r')
+    
+    @property
+    def column_names(self):
+        """Names of the selected columns, in order"""
+        return tuple(column.key for column in self.columns)
+    
+    def _join(self, join_name):
+        if join_name not in self.joins:
+            self.joins[join_name] = JOINS[(self.model, join_name)]()
+        return self.joins[join_name]
+    
+    def _convert(self, model, name, column, access, index):
+        convert = _converter(model, name, column)
+        if convert is None:
+            return access
+        self._namespace[f'_c{index}'] = convert
+        return f'_c{index}({access})'
+    
+    @staticmethod
+    def _related_getter(join_name, attr):
+        def getter(obj):
+            related = getattr(obj, join_name)
+            if attr is None or related is None:
+                return related
+            return getattr(related, attr)
+        return getter
+    
+    @staticmethod
+    def _literal(items):
+        return '{' + ', '.join(f'{name!r}: {access}' for name, access in items) + '}'
+    
+    def _compile(self, items, arg):
+        source = f'def serialize({arg}):\n    return {self._literal(items)}\n'
+        namespace = dict(self._namespace)
+        exec(source, namespace)
+        return namespace['serialize']
+    
+    def select(self, *extra_columns):
+        """SELECT of this serializer's columns (plus any extras), with its joins"""
+        stmt = db.select(*self.columns, *extra_columns).select_from(self.model)
+        for join_name, target in self.joins.items():
+            stmt = stmt.outerjoin(target, JOIN_CONDITIONS[(self.model, join_name)](target))
+        return stmt
+    
+    def rows(self, rows):
+        """Serialize column tuples"""
+        from_row = self.from_row
+        with span('serialize', model=self.model.__name__):
+            return [from_row(row) for row in rows]
+    
+    def objects(self, objects):
+        """Serialize ORM objects"""
+        from_object = self.from_object
+        with span('serialize', model=self.model.__name__):
+            return [from_object(obj) for obj in objects]
+
+
+# Bounded: field sets come from the query string
+@lru_cache(maxsize=1024)
+def get_serializer(model, fields=None, expand=()):
+    """Cached serializer for a model, a tuple of field names and expansions"""
+    return Serializer(model, tuple(fields) if fields is not None else default_fields(model), tuple(expand))
+
+
+def parse_fieldset(model, args, sensitive=False, extra=()):
+    """Fields and expansions requested via ?fields= and ?expand=.
+    
+    Returns (fields or None for the default set, expansions, requested
+    extras); fields is empty when only extras were asked for. Fields come
+    back in MODEL_FIELDS order and expansions sorted, whatever order the
+    client listed them in. Raises ValueError for names the model does not
+    serialize.
+    """
+    allowed = MODEL_FIELDS[model] if sensitive else default_fields(model)
+    fields = None
+    extras = tuple(extra)
+    
+    if args.get('fields'):
+        names = tuple(dict.fromkeys(n.strip() for n in args['fields'].split(',') if n.strip()))
+        unknown = [n for n in names if n not in allowed and n not in extra]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # In model order, so every ordering of the same set shares one cached serializer
+        fields = tuple(n for n in MODEL_FIELDS[model] if n in names and n in allowed)
+        extras = tuple(n for n in names if n in extra)
+        if not fields and not extras:
+            raise ValueError('No fields requested')
+    elif sensitive:
+        fields = MODEL_FIELDS[model]
+    
+    expand = ()
+    if args.get('expand'):
+        valid = {name for (owner, name) in EXPANSIONS if owner is model}
+        expand = tuple(dict.fromkeys(n.strip() for n in args['expand'].split(',') if n.strip()))
+        unknown = [n for n in expand if n not in valid]
+        if unknown:
+            raise ValueError(f"Unknown expansions: {', '.join(unknown)}")
+        expand = tuple(sorted(expand))
+    
+    return fields, expand, extras
+
+
+def dumps(payload):
+    """Encode a payload as JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def json_response(payload, status=200):
+    """Fast-path equivalent of jsonify(payload), status"""
+    with span('encode', mimetype='application/json'):
+        body = dumps(payload)
+    return current_app.response_class(body, status=status, mimetype='application/json')
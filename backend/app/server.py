@@ -0,0 +1,101 @@
+"""
+Production server
+
+Serves the app with gunicorn: a master process that preforks
+SERVER_WORKERS worker processes, each handling requests on a pool of
+SERVER_THREADS threads (the gthread worker), with HTTP keep-alive.
+
+The app is created once in the master and inherited by the forked
+workers, so every worker drops the pooled database connections it
+inherited before serving. Send the master SIGHUP to replace the workers
+gracefully: old workers finish their in-flight requests (up to
+SERVER_GRACEFUL_TIMEOUT_S) while new ones start. SIGHUP reuses the code
+loaded in the master; restart the master to deploy new code.
+"""
+import multiprocessing
+import os
+import tempfile
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # optional dependency (not available on Windows)
+    BaseApplication = None
+
+from app.models import db
+from app.cache import response_cache
+from app.admission import admission
+
+
+def default_workers():
+    """Worker processes for this host: two per CPU plus one"""
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def server_options(config):
+    """gunicorn settings from the SERVER_* config"""
+    return {
+        'bind': f"{config['HOST']}:{config['PORT']}",
+        'workers': config['SERVER_WORKERS'] or default_workers(),
+        'worker_class': 'gthread',
+        'threads': config['SERVER_THREADS'],
+        'keepalive': config['SERVER_KEEPALIVE_S'],
+        'timeout': config['SERVER_TIMEOUT_S'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT_S'],
+        # Recycle workers now and then so slow leaks cannot accumulate
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS'] // 10,
+        'accesslog': '-' if config['SERVER_ACCESS_LOG'] else None,
+    }
+
+
+def reset_after_fork(app):
+    """Drop pooled connections inherited from the master without closing them.
+    
+    The master's sockets are shared with the forked child; closing them here
+    would also end them for the master, so they are only de-referenced.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+if BaseApplication is not None:
+    class Server(BaseApplication):
+        """gunicorn application serving an already created Flask app"""
+        
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set('post_fork', lambda server, worker: reset_after_fork(self.application))
+        
+        def load(self):
+            return self.application
+
+
+def serve(app, **overrides):
+    """Run the app under gunicorn until the master is stopped"""
+    if BaseApplication is None:
+        raise RuntimeError('The production server needs gunicorn (pip install gunicorn)')
+    if app.config['METRICS_ENABLED'] and not app.config['METRICS_DIR']:
+        # Workers exchange metrics snapshots here so any of them can report the totals
+        app.config['METRICS_DIR'] = tempfile.mkdtemp(prefix='ainsight-metrics-')
+    options = {**server_options(app.config), **overrides}
+    if (options['workers'] > 1 and app.config['CACHE_ENABLED']
+            and not (app.config['CACHE_BUS_PATH'] or app.config['CACHE_SHARED_PATH'])):
+        # Every worker caches in its own memory; without the bus a write in one
+        # worker would leave the others serving stale responses until their TTL
+        app.config['CACHE_BUS_PATH'] = os.path.join(tempfile.mkdtemp(prefix='ainsight-cache-'), 'bus.db')
+        response_cache.init_bus(app)
+    if options['workers'] > 1 and app.config['REPLICA_DATABASE_URL'] and not app.config['REPLICA_STICKY_PATH']:
+        # A user's next request usually lands on another worker, which must know about the write
+        app.config['REPLICA_STICKY_PATH'] = os.path.join(tempfile.mkdtemp(prefix='ainsight-replica-'), 'writers.db')
+    if app.config['ADMISSION_ENABLED']:
+        # Queued requests hold a thread; fit the limits to the threads the workers really get
+        admission.build_gates(app, options['threads'])
+    Server(app, options).run()
@@ -0,0 +1,378 @@
+"""
+Sampled tracing of slow requests
+
+A fraction of requests (TRACE_SAMPLE_RATE) is traced: the request and
+its nested spans are timed (auth, password hashing, every SQL statement,
+serialization, encoding, and writing the response body). If the
+request took TRACE_SLOW_MS or longer, the trace is appended as one JSON
+line to a size-rotated file under TRACE_DIR; faster ones are dropped.
+`flask traces` summarizes the files. Each process has its own files, so
+when a process starts writing and on every rotation the oldest files are
+deleted until TRACE_DIR holds at most TRACE_DIR_MAX_BYTES, however many
+worker processes have come and gone.
+
+Unsampled requests pay one random() call; span() and the SQL hooks
+return immediately when the request carries no trace.
+"""
+import glob
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Spans kept per trace; a request with more (an N+1 loop) records how many were dropped
+MAX_SPANS = 2000
+
+# Characters of SQL kept per statement span
+MAX_STATEMENT = 500
+
+
+class Trace:
+    """Spans of one sampled request, timed relative to its start"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.dropped = 0
+    
+    def start(self, name, attrs=None):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        span = {
+            'name': name,
+            'parent': self.stack[-1]['id'] if self.stack else None,
+            'id': len(self.spans),
+            'start': time.perf_counter() - self.started,
+        }
+        if attrs:
+            span['attrs'] = attrs
+        self.spans.append(span)
+        self.stack.append(span)
+        return span
+    
+    def end(self, span):
+        if span is None:
+            return
+        span['duration'] = time.perf_counter() - self.started - span['start']
+        if self.stack and self.stack[-1] is span:
+            self.stack.pop()
+        elif span in self.stack:
+            self.stack.remove(span)
+    
+    def adopt(self, other):
+        """Add the spans of a trace recorded on another thread under the current span"""
+        parent = self.stack[-1]['id'] if self.stack else None
+        offset = other.started - self.started
+        ids = {}
+        for span in other.spans:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                continue
+            ids[span['id']] = len(self.spans)
+            self.spans.append({
+                **span,
+                'id': len(self.spans),
+                'parent': ids.get(span['parent'], parent),
+                'start': span['start'] + offset,
+            })
+        self.dropped += other.dropped
+    
+    def to_dict(self):
+        spans = []
+        for span in self.spans:
+            item = {
+                'id': span['id'],
+                'parent': span['parent'],
+                'name': span['name'],
+                'start_ms': round(span['start'] * 1000, 3),
+                'duration_ms': round(span.get('duration', 0.0) * 1000, 3),
+            }
+            if 'attrs' in span:
+                item['attrs'] = span['attrs']
+            spans.append(item)
+        return {'spans': spans, 'dropped_spans': self.dropped}
+
+
+def current_trace():
+    """The trace of the current request, if it is sampled"""
+    return g.get('trace') if has_app_context() else None
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a child of the current span (no-op when unsampled)"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    current = trace.start(name, attrs)
+    try:
+        yield
+    finally:
+        trace.end(current)
+
+
+def traced(name):
+    """Decorator timing every call of a function as a span"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_trace() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Tracer:
+    """Samples requests and writes the slow ones to rotating JSONL files"""
+    
+    def __init__(self):
+        self._app = None
+        self._logger = None
+        self._pid = None
+    
+    def init_app(self, app):
+        if not app.config['TRACE_SAMPLE_RATE']:
+            return
+        self._app = app
+        if not app.config['TRACE_DIR']:
+            app.config['TRACE_DIR'] = os.path.join(app.instance_path, 'traces')
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if not event.contains(Engine, 'before_cursor_execute', _start_statement):
+            event.listen(Engine, 'before_cursor_execute', _start_statement)
+            event.listen(Engine, 'after_cursor_execute', _end_statement)
+            event.listen(Engine, 'handle_error', _failed_statement)
+    
+    def _before_request(self):
+        if random.random() >= self._app.config['TRACE_SAMPLE_RATE']:
+            return
+        trace = g.trace = Trace()
+        trace.root = trace.start('request')
+    
+    def _after_request(self, response):
+        # Registered first, so this runs after every other after_request hook
+        trace = g.pop('trace', None)
+        if trace is None:
+            return response
+        trace.meta = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint or 'unmatched',
+            'status': response.status_code,
+        }
+        trace.stack = [trace.root]
+        write = trace.start('response.write')
+        
+        # The server writes the body after the request context is gone; finish on close
+        def finish():
+            trace.end(write)
+            trace.end(trace.root)
+            self._record(trace)
+        response.call_on_close(finish)
+        return response
+    
+    def _teardown_request(self, exc):
+        # Only still set when the request failed before a response was made
+        trace = g.pop('trace', None)
+        if trace is not None:
+            trace.end(trace.root)
+            trace.meta = {
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint or 'unmatched',
+                'status': 500,
+                'error': repr(exc),
+            }
+            self._record(trace)
+    
+    def _record(self, trace):
+        duration_ms = trace.root['duration'] * 1000
+        if duration_ms < self._app.config['TRACE_SLOW_MS']:
+            return
+        line = {
+            'ts': datetime.utcnow().isoformat() + 'Z',
+            'pid': os.getpid(),
+            **trace.meta,
+            'duration_ms': round(duration_ms, 3),
+            **trace.to_dict(),
+        }
+        try:
+            self._get_logger().info(json.dumps(line, default=str))
+        except OSError:
+            self._app.logger.exception('Writing a trace failed')
+    
+    def _get_logger(self):
+        # One file per process: rotation is not safe across processes sharing a file
+        if self._logger is None or self._pid != os.getpid():
+            directory = self._app.config['TRACE_DIR']
+            os.makedirs(directory, exist_ok=True)
+            handler = TraceFileHandler(
+                os.path.join(directory, f'traces-{os.getpid()}.jsonl'),
+                max_dir_bytes=self._app.config['TRACE_DIR_MAX_BYTES'],
+                maxBytes=self._app.config['TRACE_MAX_BYTES'],
+                backupCount=self._app.config['TRACE_BACKUP_COUNT'],
+                encoding='utf-8',
+            )
+            handler.prune()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger(f'{__name__}.{os.getpid()}')
+            logger.handlers[:] = [handler]
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            self._logger, self._pid = logger, os.getpid()
+        return self._logger
+
+
+tracer = Tracer()
+
+
+class TraceFileHandler(RotatingFileHandler):
+    """Rotates one process's trace file and keeps the whole directory under a size cap"""
+    
+    def __init__(self, filename, max_dir_bytes, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_dir_bytes = max_dir_bytes
+    
+    def doRollover(self):
+        super().doRollover()
+        self.prune()
+    
+    def prune(self):
+        prune_traces(os.path.dirname(self.baseFilename), self.max_dir_bytes)
+
+
+def prune_traces(directory, max_bytes):
+    """Delete the oldest trace files until the directory holds at most max_bytes"""
+    files = []
+    for path in glob.glob(os.path.join(directory, 'traces-*.jsonl*')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        # A running process keeps its current file open; removing it would not free the space
+        pid = os.path.basename(path)[len('traces-'):-len('.jsonl')]
+        if path.endswith('.jsonl') and pid.isdigit() and _running(int(pid)):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    if trace is not None:
+        conn.info['trace_span'] = trace.start('sql', {'statement': statement[:MAX_STATEMENT]})
+
+
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    current = conn.info.pop('trace_span', None)
+    if current is not None:
+        trace = current_trace()
+        if trace is not None:
+            trace.end(current)
+
+
+def _failed_statement(context):
+    current = context.connection.info.pop('trace_span', None) if context.connection is not None else None
+    if current is not None:
+        trace = current_trace()
+        if trace is not None:
+            current.setdefault('attrs', {})['error'] = type(context.original_exception).__name__
+            trace.end(current)
+
+
+def read_traces(directory):
+    """Traces from every trace file under a directory, rotated ones included"""
+    for path in sorted(glob.glob(os.path.join(directory, 'traces-*.jsonl*'))):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p), len(sorted_values) - 1)]
+
+
+def summarize_traces(traces, top=10):
+    """Slowest endpoints, where their time went, and the costliest SQL"""
+    from app.query_budget import statement_shape
+    
+    durations = defaultdict(list)
+    span_ms = defaultdict(float)
+    statements = defaultdict(lambda: [0, 0.0, 0.0])  # shape -> [count, total ms, max ms]
+    slowest = []
+    
+    for trace in traces:
+        durations[trace['endpoint']].append(trace['duration_ms'])
+        for item in trace['spans']:
+            if item['name'] != 'request':
+                span_ms[item['name']] += item['duration_ms']
+            if item['name'] == 'sql':
+                entry = statements[statement_shape(item.get('attrs', {}).get('statement', ''))]
+                entry[0] += 1
+                entry[1] += item['duration_ms']
+                entry[2] = max(entry[2], item['duration_ms'])
+        slowest.append(trace)
+    
+    endpoints = []
+    for endpoint, values in durations.items():
+        values.sort()
+        endpoints.append({
+            'endpoint': endpoint,
+            'count': len(values),
+            'p50_ms': _percentile(values, 0.50),
+            'p95_ms': _percentile(values, 0.95),
+            'max_ms': values[-1],
+            'total_ms': sum(values),
+        })
+    endpoints.sort(key=lambda item: item['total_ms'], reverse=True)
+    slowest.sort(key=lambda trace: trace['duration_ms'], reverse=True)
+    
+    return {
+        'traces': sum(len(values) for values in durations.values()),
+        'endpoints': endpoints[:top],
+        'spans': sorted(span_ms.items(), key=lambda item: item[1], reverse=True),
+        'statements': sorted(
+            ({'statement': shape, 'count': c, 'total_ms': t, 'max_ms': m} for shape, (c, t, m) in statements.items()),
+            key=lambda item: item['total_ms'], reverse=True
+        )[:top],
+        'slowest': [
+            {key: trace[key] for key in ('ts', 'method', 'path', 'status', 'duration_ms')}
+            for trace in slowest[:top]
+        ],
+    }
@@ -0,0 +1,206 @@
+"""
+Streaming bulk user import (CSV / NDJSON)
+
+Rows are processed in chunks: uniqueness is checked with one IN query per
+column per chunk, passwords are hashed in parallel across processes, and
+each chunk is inserted with a single executemany and committed on its own.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from app.models import db, User
+
+REQUIRED_FIELDS = ('email', 'username', 'password', 'full_name')
+VALID_ROLES = ('admin', 'employee')
+VALID_STATUSES = ('active', 'inactive', 'suspended')
+
+
+def parse_csv(lines):
+    """Yield (line_no, row dict or None, error) from CSV text lines"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, {k.strip(): v for k, v in row.items() if k}, None
+
+
+def parse_ndjson(lines):
+    """Yield (line_no, row dict or None, error) from NDJSON text lines"""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, 'Invalid JSON'
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, 'Expected a JSON object'
+            continue
+        yield line_no, row, None
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ndjson': parse_ndjson,
+}
+
+
+def _validate(row):
+    """Return (user values, error) for one parsed row"""
+    missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    
+    role = row.get('role') or 'employee'
+    if role not in VALID_ROLES:
+        return None, f'Invalid role: {role}'
+    
+    status = row.get('status') or 'active'
+    if status not in VALID_STATUSES:
+        return None, f'Invalid status: {status}'
+    
+    permissions = row.get('permissions') or {}
+    if isinstance(permissions, str):
+        try:
+            permissions = json.loads(permissions)
+        except ValueError:
+            return None, 'Invalid permissions JSON'
+    if not isinstance(permissions, dict):
+        return None, 'Permissions must be an object'
+    
+    return {
+        'email': str(row['email']).strip(),
+        'username': str(row['username']).strip(),
+        'full_name': str(row['full_name']).strip(),
+        'password': str(row['password']),
+        'role': role,
+        'status': status,
+        **User.encode_permissions(permissions),
+    }, None
+
+
+def _insert_chunk(pending):
+    """Insert validated rows, returning {index: id or error message}"""
+    results = {}
+    try:
+        inserted = db.session.execute(
+            db.insert(User).returning(User.id, sort_by_parameter_order=True),
+            [values for _, values in pending]
+        ).all()
+        db.session.commit()
+        for (index, _), row in zip(pending, inserted):
+            results[index] = row.id
+        return results
+    except IntegrityError:
+        db.session.rollback()
+    
+    # Lost a race with a concurrent writer: retry row by row to isolate it
+    for index, values in pending:
+        try:
+            results[index] = db.session.execute(
+                db.insert(User).returning(User.id), values
+            ).scalar_one()
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            results[index] = 'Email or username already exists'
+    return results
+
+
+def hash_pool_context():
+    """Start method of the hashing processes: never a fork of the calling process.
+    
+    Imports run in threaded web workers, where another thread may hold a
+    lock at fork time that the child would then wait on forever. forkserver
+    children are forked from a single-threaded server process instead
+    (spawn where forkserver is unavailable).
+    """
+    import multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def import_users(parsed_rows, chunk_size=500, workers=None):
+    """Import parsed rows, yielding one result dict per input row"""
+    # Imported on first use: it pulls in multiprocessing, which slows every app start
+    from concurrent.futures import ProcessPoolExecutor
+    
+    workers = workers or os.cpu_count() or 1
+    seen_emails = set()
+    seen_usernames = set()
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=hash_pool_context()) as pool:
+        chunk = []
+        for item in parsed_rows:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield from _import_chunk(chunk, pool, workers, seen_emails, seen_usernames)
+                chunk = []
+        if chunk:
+            yield from _import_chunk(chunk, pool, workers, seen_emails, seen_usernames)
+
+
+def _import_chunk(chunk, pool, workers, seen_emails, seen_usernames):
+    results = [None] * len(chunk)
+    candidates = []
+    
+    for index, (line_no, row, error) in enumerate(chunk):
+        values = None
+        if not error:
+            values, error = _validate(row)
+        if not error:
+            if values['email'] in seen_emails:
+                error = 'Duplicate email in import'
+            elif values['username'] in seen_usernames:
+                error = 'Duplicate username in import'
+        if error:
+            results[index] = {'line': line_no, 'status': 'error', 'error': error}
+            continue
+        seen_emails.add(values['email'])
+        seen_usernames.add(values['username'])
+        candidates.append((index, values))
+    
+    # Set-based uniqueness checks against existing users
+    if candidates:
+        emails = [values['email'] for _, values in candidates]
+        usernames = [values['username'] for _, values in candidates]
+        taken_emails = {email for (email,) in db.session.query(User.email).filter(User.email.in_(emails))}
+        taken_usernames = {name for (name,) in db.session.query(User.username).filter(User.username.in_(usernames))}
+        
+        remaining = []
+        for index, values in candidates:
+            line_no = chunk[index][0]
+            if values['email'] in taken_emails:
+                results[index] = {'line': line_no, 'status': 'error', 'error': 'Email already registered'}
+            elif values['username'] in taken_usernames:
+                results[index] = {'line': line_no, 'status': 'error', 'error': 'Username already taken'}
+            else:
+                remaining.append((index, values))
+        candidates = remaining
+    
+    if candidates:
+        passwords = [values.pop('password') for _, values in candidates]
+        hashes = pool.map(
+            generate_password_hash, passwords,
+            chunksize=max(1, len(passwords) // (workers * 4))
+        )
+        now = datetime.utcnow()
+        for (_, values), password_hash in zip(candidates, hashes):
+            values['password_hash'] = password_hash
+            values['created_at'] = now
+        
+        by_index = dict(candidates)
+        for index, outcome in _insert_chunk(candidates).items():
+            line_no = chunk[index][0]
+            if isinstance(outcome, int):
+                results[index] = {
+                    'line': line_no, 'status': 'created',
+                    'id': outcome, 'email': by_index[index]['email']
+                }
+            else:
+                results[index] = {'line': line_no, 'status': 'error', 'error': outcome}
+    
+    yield from results
@@ -0,0 +1,174 @@
+"""
+Background purge of deleted users' data
+
+Deleting a user only flips its status to 'deleted'. A background thread
+then removes the user's child rows with set-based DELETEs in bounded
+chunks, committing after each one so no transaction holds the write lock
+for longer than the configured budget.
+"""
+import os
+import queue
+import threading
+import time
+from app.models import db, User, Analytics, Task, Announcement, AnnouncementReadState, ChatMessage
+from app.cache import response_cache
+
+# Child tables removed for a deleted user, in order
+PURGE_TABLES = (
+    (Analytics, Analytics.user_id),
+    (Task, Task.user_id),
+    (AnnouncementReadState, AnnouncementReadState.user_id),
+)
+
+# Queued in place of a user id: look up interrupted purges on the purge thread
+RESUME = object()
+
+
+class UserPurger:
+    """Queue of deleted users whose data is removed in the background"""
+    
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._resume_requested = False
+        self._resumed_in = None  # (app, pid) that queued the resume
+    
+    def init_app(self, app):
+        self._app = app
+        app.before_request(self._resume_in_process)
+    
+    def schedule(self, user_id):
+        """Queue a deleted user for purging"""
+        self._ensure_worker()
+        self._queue.put(user_id)
+    
+    def resume(self, background=False):
+        """Queue users left in 'deleted' state by an earlier process.
+        
+        With background=True the lookup runs on the purge thread, so startup
+        does not wait for it (or fail if the schema is not created yet). The
+        thread is started by the first request of each process that serves
+        them, never in a master that preloads the app and forks workers.
+        """
+        if background:
+            self._resume_requested = True
+            return None
+        pending = [user_id for (user_id,) in db.session.query(User.id).filter_by(status='deleted')]
+        for user_id in pending:
+            self.schedule(user_id)
+        return len(pending)
+    
+    def _resume_in_process(self):
+        key = (self._app, os.getpid())
+        if not self._resume_requested or self._resumed_in == key:
+            return
+        with self._lock:
+            if self._resumed_in == key:
+                return
+            self._resumed_in = key
+        self._ensure_worker()
+        self._queue.put(RESUME)
+    
+    def _ensure_worker(self):
+        with self._lock:
+            # Threads do not survive fork; start one per process
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='user-purge', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            user_id = self._queue.get()
+            try:
+                with self._app.app_context():
+                    if user_id is RESUME:
+                        self.resume()
+                    else:
+                        purge_user(user_id, self._app.config)
+            except Exception:
+                if user_id is RESUME:
+                    self._app.logger.exception('Resuming interrupted purges failed')
+                else:
+                    self._app.logger.exception('Purge of user %s failed', user_id)
+            finally:
+                self._queue.task_done()
+    
+    def join(self):
+        """Block until every queued purge has finished"""
+        self._queue.join()
+
+
+def delete_in_chunks(model, column, user_id, config):
+    """Delete a user's rows from one table, adapting the chunk size to the lock budget"""
+    budget = config['USER_PURGE_LOCK_BUDGET_MS'] / 1000
+    pause = config['USER_PURGE_PAUSE_MS'] / 1000
+    max_chunk = config['USER_PURGE_CHUNK_SIZE']
+    chunk = max_chunk
+    pk = model.__mapper__.primary_key[0]
+    deleted = 0
+    
+    while True:
+        start = time.perf_counter()
+        result = db.session.execute(
+            db.delete(model).where(
+                pk.in_(db.select(pk).where(column == user_id).limit(chunk))
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+        deleted += result.rowcount
+        
+        if result.rowcount < chunk:
+            return deleted
+        
+        # Shrink chunks that overran the budget, grow ones well under it
+        if elapsed > budget:
+            chunk = max(1, chunk // 2)
+        elif elapsed < budget / 2:
+            chunk = min(max_chunk, chunk * 2)
+        time.sleep(pause)
+
+
+def purge_user(user_id, config):
+    """Remove a deleted user's data, then the user row itself"""
+    user = User.query.get(user_id)
+    if not user or user.status != 'deleted':
+        return False
+    
+    for model, column in PURGE_TABLES:
+        delete_in_chunks(model, column, user_id, config)
+    
+    # Announcements and chat messages keep their sender; the row stays as a tombstone,
+    # with its email and username released so the account can be created again, and
+    # no role beyond the least privileged one
+    referenced = (
+        db.session.query(Announcement.id).filter_by(sender_id=user_id).first()
+        or db.session.query(ChatMessage.id).filter_by(sender_id=user_id).first()
+    )
+    if referenced:
+        db.session.execute(
+            db.update(User).where(User.id == user_id, User.status == 'deleted')
+            .values(
+                email=f'deleted-{user_id}@invalid', username=f'deleted-{user_id}', device_id=None, role='employee'
+            )
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.session.execute(
+            db.delete(User).where(User.id == user_id, User.status == 'deleted')
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    response_cache.invalidate(
+        'users', f'user:{user_id}', f'tasks:user:{user_id}', f'analytics:user:{user_id}',
+        'analytics:summary', 'analytics:export', f'announcements:reads:{user_id}'
+    )
+    return True
+
+
+user_purger = UserPurger()
@@ -0,0 +1,79 @@
+"""
+Content negotiation between JSON and compact binary wire formats
+
+Clients that send Accept: application/msgpack (or application/cbor) get the
+same response shapes encoded in that format, and may send request bodies
+in it with the matching Content-Type. Everything else stays JSON.
+"""
+from flask import request, current_app
+from werkzeug.exceptions import BadRequest
+from app.serializers import dumps
+from app.tracing import span
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional dependency
+    cbor2 = None
+
+JSON = 'application/json'
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+CBOR = 'application/cbor'
+
+
+def _encoders():
+    encoders = {JSON: dumps}
+    if msgpack is not None:
+        for mimetype in MSGPACK_TYPES:
+            encoders[mimetype] = lambda payload: msgpack.packb(payload, use_bin_type=True)
+    if cbor2 is not None:
+        encoders[CBOR] = cbor2.dumps
+    return encoders
+
+
+def _decoders():
+    decoders = {}
+    if msgpack is not None:
+        for mimetype in MSGPACK_TYPES:
+            decoders[mimetype] = lambda body: msgpack.unpackb(body, raw=False)
+    if cbor2 is not None:
+        decoders[CBOR] = cbor2.loads
+    return decoders
+
+
+ENCODERS = _encoders()
+DECODERS = _decoders()
+
+
+def response_mimetype():
+    """Best response format for the request's Accept header (JSON by default)"""
+    # JSON is listed first so wildcard Accept headers keep getting JSON
+    return request.accept_mimetypes.best_match(list(ENCODERS), default=JSON) or JSON
+
+
+def respond(payload, status=200):
+    """Encode a payload in the negotiated format"""
+    mimetype = response_mimetype()
+    with span('encode', mimetype=mimetype):
+        body = ENCODERS[mimetype](payload)
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def request_data():
+    """Decode the request body from JSON or a binary format"""
+    decode = DECODERS.get(request.mimetype)
+    if decode is None:
+        return request.get_json()
+    body = request.get_data(cache=True)
+    if not body:
+        return None
+    try:
+        return decode(body)
+    except Exception as exc:
+        raise BadRequest(f'Invalid {request.mimetype} body') from exc
@@ -0,0 +1,70 @@
+"""
+Benchmark: cross-worker invalidation propagation latency
+
+Forks subscriber processes that each poll a shared invalidation log, then
+publishes invalidations from the parent and reports how long they took to
+reach every subscriber (p50/p99/max), alongside the configured lag bound.
+
+Usage (from backend/):
+    python -m benchmarks.cache_bus [--workers 4] [--events 200] [--poll-ms 50]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from app.cache_bus import InvalidationBus
+
+
+def subscriber(path, poll_ms, events, results):
+    bus = InvalidationBus(path, poll_interval_ms=poll_ms)
+    bus.subscribe(lambda tags: None, lambda: None)
+    bus.is_current()  # starts the polling thread
+    deadline = time.monotonic() + 60
+    while bus.stats['applied'] < events and time.monotonic() < deadline:
+        time.sleep(0.01)
+    results.put(list(bus.latencies))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--poll-ms', type=int, default=50)
+    parser.add_argument('--interval-ms', type=float, default=5)
+    args = parser.parse_args()
+    
+    ctx = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bus.db')
+        publisher = InvalidationBus(path, poll_interval_ms=args.poll_ms)
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=subscriber, args=(path, args.poll_ms, args.events, results))
+            for _ in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.5)
+        
+        for i in range(args.events):
+            publisher.publish((f'user:{i}', 'users'))
+            time.sleep(args.interval_ms / 1000)
+        
+        latencies = sorted(value * 1000 for _ in workers for value in results.get())
+        for worker in workers:
+            worker.join()
+    
+    print(f"{args.workers} workers, {args.events} events, poll every {args.poll_ms} ms")
+    print(f"applied {len(latencies)} of {args.workers * args.events}")
+    if latencies:
+        print(f"latency ms  p50 {percentile(latencies, 0.5):.1f}  p99 {percentile(latencies, 0.99):.1f}  "
+              f"max {latencies[-1]:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark dataset: synthetic users, analytics events, tasks and announcements
+
+Creates a fresh database with the app's own bootstrap (schema, search
+index, default admin) and fills it with chunked executemany inserts. Rows
+come from a seeded random generator, so the same sizes and seed give the
+same data (timestamps are spread over the SPAN_DAYS before seeding).
+Every user shares one precomputed password hash: 10k users cost one hash,
+not 10k. A manifest written next to the database records the sizes, the
+seed and the accounts the load driver logs in with; benchmarks.load
+reuses a dataset whose manifest matches instead of seeding again.
+
+Usage (from backend/):
+    python -m benchmarks.datagen --database /tmp/bench.db [--preset large]
+        [--users N] [--analytics N] [--tasks N] [--announcements N] [--seed 42]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+PRESETS = {
+    'small': {'users': 1_000, 'analytics': 100_000, 'tasks': 20_000, 'announcements': 200},
+    'medium': {'users': 10_000, 'analytics': 1_000_000, 'tasks': 200_000, 'announcements': 2_000},
+    'large': {'users': 10_000, 'analytics': 5_000_000, 'tasks': 1_000_000, 'announcements': 10_000},
+}
+
+# Rows per executemany
+CHUNK_SIZE = 20_000
+
+# Timestamps are spread over this many days before seeding
+SPAN_DAYS = 90
+
+# Password of every synthetic user
+PASSWORD = 'bench123'
+
+# user0 is the employee whose reads are measured, user1 the one whose rows get written and deleted;
+# the first RESERVED_USERS users are always active employees
+RESERVED_USERS = 10
+
+FIRST_NAMES = ('Ava', 'Ben', 'Chloe', 'Dev', 'Elena', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jonas',
+               'Kira', 'Liam', 'Maya', 'Noah', 'Olga', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq')
+LAST_NAMES = ('Anders', 'Brooks', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen',
+              'Kowalski', 'Lopez', 'Moreau', 'Nakamura', 'Okafor', 'Patel', 'Rossi', 'Silva', 'Tanaka', 'Weber')
+FEATURES = ('document_summary', 'email_draft', 'code_assist', 'voice_notes', 'chat')
+TASK_STATUSES = ('pending', 'pending', 'in_progress', 'completed')
+PRIORITIES = ('low', 'medium', 'medium', 'high')
+
+
+def manifest_path(database):
+    return database + '.json'
+
+
+def read_manifest(database):
+    """The manifest of a seeded dataset, or None"""
+    try:
+        with open(manifest_path(database)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def user_email(i):
+    return f'user{i}@bench.local'
+
+
+def _when(rng, now):
+    return now - timedelta(seconds=rng.randrange(SPAN_DAYS * 86400))
+
+
+def generate_users(rng, count, password_hash, permissions, now):
+    for i in range(count):
+        reserved = i < RESERVED_USERS
+        yield {
+            'email': user_email(i),
+            'username': f'user{i}',
+            'password_hash': password_hash,
+            'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'role': 'admin' if i % 100 == 99 and not reserved else 'employee',
+            'status': 'active' if reserved or rng.random() < 0.95 else 'inactive',
+            **permissions,
+            'created_at': _when(rng, now),
+        }
+
+
+def generate_analytics(rng, count, user_ids, now):
+    for _ in range(count):
+        yield {
+            'user_id': rng.choice(user_ids),
+            'feature': rng.choice(FEATURES),
+            'metadata': json.dumps({'duration_ms': rng.randrange(50, 5000)}) if rng.random() < 0.3 else None,
+            'timestamp': _when(rng, now),
+            'device_type': 'mobile' if rng.random() < 0.7 else 'web',
+        }
+
+
+def generate_tasks(rng, count, user_ids, now):
+    for i in range(count):
+        status = rng.choice(TASK_STATUSES)
+        created_at = _when(rng, now)
+        voice = rng.random() < 0.3
+        yield {
+            'user_id': rng.choice(user_ids),
+            'title': f'Task {i}',
+            'description': 'Synthetic benchmark task',
+            'status': status,
+            'priority': rng.choice(PRIORITIES),
+            'created_at': created_at,
+            'due_date': created_at + timedelta(days=rng.randrange(1, 30)) if rng.random() < 0.5 else None,
+            'completed_at': created_at + timedelta(hours=rng.randrange(1, 72)) if status == 'completed' else None,
+            'source': 'voice_note' if voice else 'manual',
+            'voice_note_id': f'vn-{i}' if voice else None,
+        }
+
+
+def generate_announcements(rng, count, sender_id, now):
+    for i in range(count):
+        created_at = _when(rng, now)
+        yield {
+            'sender_id': sender_id,
+            'title': f'Announcement {i}',
+            'message': 'Synthetic benchmark announcement. ' * rng.randrange(1, 6),
+            'priority': rng.choice(('info', 'info', 'warning', 'urgent')),
+            'target': 'all',
+            'created_at': created_at,
+            'expires_at': created_at + timedelta(days=365) if rng.random() < 0.2 else None,
+            'status': 'active' if rng.random() < 0.9 else 'archived',
+        }
+
+
+def bulk_insert(conn, table, rows, label):
+    """executemany in chunks; returns the row count"""
+    started = time.perf_counter()
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            conn.execute(table.insert(), chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(table.insert(), chunk)
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(f'  {label:<14} {total:>10,} rows  {elapsed:>7.1f}s  {total / max(elapsed, 1e-9):>10,.0f} rows/s')
+    return total
+
+
+def seed(database, sizes, seed=42):
+    """Create and fill a fresh SQLite database; returns its manifest"""
+    # Config is read at import, so the app must not be imported before this
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(database)
+    os.environ['FAST_START'] = 'False'
+    from sqlalchemy import select, text
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from app.bootstrap import DEFAULT_ADMIN_EMAIL, DEFAULT_ADMIN_PASSWORD
+    from app.models import db, User, Analytics, Task, Announcement
+    
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    
+    app = create_app('production')
+    with app.app_context():
+        admin_id = db.session.execute(select(User.id).where(User.email == DEFAULT_ADMIN_EMAIL)).scalar_one()
+        db.session.remove()
+        
+        with db.engine.begin() as conn:
+            # A throwaway file: durability during the load buys nothing
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+            bulk_insert(conn, User.__table__, generate_users(
+                rng, sizes['users'], generate_password_hash(PASSWORD), User.encode_permissions({}), now
+            ), 'users')
+            user_ids = conn.execute(
+                select(User.id).where(User.email.like('%@bench.local')).order_by(User.id)
+            ).scalars().all()
+            bulk_insert(conn, Analytics.__table__, generate_analytics(rng, sizes['analytics'], user_ids, now), 'analytics')
+            bulk_insert(conn, Task.__table__, generate_tasks(rng, sizes['tasks'], user_ids, now), 'tasks')
+            bulk_insert(conn, Announcement.__table__, generate_announcements(
+                rng, sizes['announcements'], admin_id, now
+            ), 'announcements')
+        
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+            # Fold the WAL into the main file so a copy of it is the whole dataset
+            conn.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.engine.dispose()
+    
+    manifest = {
+        'sizes': sizes,
+        'seed': seed,
+        'created': now.isoformat() + 'Z',
+        'seconds': round(time.perf_counter() - started, 1),
+        'admin': {'email': DEFAULT_ADMIN_EMAIL, 'password': DEFAULT_ADMIN_PASSWORD},
+        'employee': {'email': user_email(0), 'password': PASSWORD},
+        'writer': {'email': user_email(1), 'password': PASSWORD},
+    }
+    with open(manifest_path(database), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def remove_dataset(database):
+    for path in (database, database + '-wal', database + '-shm', manifest_path(database)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def add_size_arguments(parser):
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    for name in ('users', 'analytics', 'tasks', 'announcements'):
+        parser.add_argument(f'--{name}', type=int, help=f'Overrides the preset ({name} rows)')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def sizes_from_args(args):
+    sizes = dict(PRESETS[args.preset])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLite file to create')
+    parser.add_argument('--force', action='store_true', help='Replace a file that is not a seeded dataset')
+    add_size_arguments(parser)
+    args = parser.parse_args()
+    
+    database = os.path.abspath(args.database)
+    if os.path.exists(database) and read_manifest(database) is None and not args.force:
+        sys.exit(f'{database} exists and is not a benchmark dataset; pass --force to replace it')
+    remove_dataset(database)
+    
+    sizes = sizes_from_args(args)
+    print(f'Seeding {database} (seed {args.seed})')
+    manifest = seed(database, sizes, args.seed)
+    print(f'Done in {manifest["seconds"]}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: mixed read/write load on SQLite, default vs. tuned engine
+
+Runs threads issuing a mix of point reads, small aggregates and single-row
+inserts (each committed on its own) against the same database file, first
+through a default engine and then through one built with app.db_tuning.
+Reports throughput, latency percentiles and "database is locked" errors.
+
+Usage (from backend/):
+    python -m benchmarks.db_concurrency [--threads 8] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from config import Config
+from app.db_tuning import engine_options, tune_engine
+
+SCHEMA = """
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    feature TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def seed(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA))
+        conn.execute(text('CREATE INDEX ix_events_user ON events (user_id)'))
+        conn.execute(
+            text('INSERT INTO events (user_id, feature, created_at) VALUES (:u, :f, :t)'),
+            [{'u': i % 500, 'f': f'feature{i % 7}', 't': time.time()} for i in range(rows)]
+        )
+
+
+def worker(engine, deadline, write_ratio, results):
+    rng = random.Random()
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                if rng.random() < write_ratio:
+                    conn.execute(
+                        text('INSERT INTO events (user_id, feature, created_at) VALUES (:u, :f, :t)'),
+                        {'u': rng.randrange(500), 'f': 'chat', 't': time.time()}
+                    )
+                    conn.commit()
+                elif rng.random() < 0.5:
+                    conn.execute(
+                        text('SELECT feature, count(*) FROM events WHERE user_id = :u GROUP BY feature'),
+                        {'u': rng.randrange(500)}
+                    ).all()
+                else:
+                    conn.execute(text('SELECT * FROM events WHERE id = :id'), {'id': rng.randrange(1, 1000)}).all()
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+    results.append((latencies, errors))
+
+
+def run(engine, threads, seconds, write_ratio):
+    results = []
+    deadline = time.perf_counter() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(engine, deadline, write_ratio, results))
+        for _ in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    latencies = sorted(value * 1000 for lat, _ in results for value in lat)
+    errors = sum(err for _, err in results)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+    
+    config = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    print(f"{args.threads} threads, {args.seconds:g}s, {args.write_ratio:.0%} writes")
+    print(f"{'engine':<8} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'locked':>7}")
+    
+    for label in ('default', 'tuned'):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            if label == 'tuned':
+                engine = create_engine(url, **engine_options(config, url))
+                tune_engine(engine, config)
+            else:
+                engine = create_engine(url)
+            seed(engine, args.rows)
+            latencies, errors = run(engine, args.threads, args.seconds, args.write_ratio)
+            engine.dispose()
+        
+        pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else 0
+        print(f"{label:<8} {len(latencies) / args.seconds:>8.0f} {pick(0.5):>8.2f} {pick(0.99):>8.2f} "
+              f"{(latencies[-1] if latencies else 0):>8.1f} {errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
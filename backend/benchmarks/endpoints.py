@@ -0,0 +1,178 @@
+"""
+Benchmark catalogue: one request recipe per route of the app
+
+Each Endpoint names the URL rule it exercises (as registered in the
+app's url_map, so coverage can be checked), who it authenticates as, and
+how to build the path and body of one request. Reads pick among ids
+sampled from the dataset; creates use fresh unique values; deletes
+consume ids from a pool, and an endpoint stops early once its pool is
+empty. benchmarks.load runs them against a throwaway copy of the dataset.
+"""
+import itertools
+import json
+import random
+from collections import deque
+
+
+class Context:
+    """Accounts, tokens, sampled ids and deletable-id pools shared by all requests of a run"""
+    
+    def __init__(self, manifest, tokens, samples, pools):
+        self.manifest = manifest
+        self.password = manifest['employee']['password']
+        self.tokens = tokens
+        self.samples = samples
+        self.pools = {name: deque(ids) for name, ids in pools.items()}
+        self._counter = itertools.count()
+        self._rng = random.Random(0)
+    
+    def pick(self, name):
+        return self._rng.choice(self.samples[name])
+    
+    def take(self, name):
+        """Next id of a pool, or None once it is used up"""
+        try:
+            return self.pools[name].popleft()
+        except IndexError:
+            return None
+    
+    def unique(self):
+        return next(self._counter)
+
+
+class Endpoint:
+    """How to issue one request against a route"""
+    
+    def __init__(self, method, rule, path=None, body=None, auth='admin', pool=None, content_type='application/json'):
+        self.method = method
+        self.rule = rule
+        self._path = path or rule
+        self._body = body
+        self.auth = auth
+        self.pool = pool
+        self.content_type = content_type
+    
+    @property
+    def name(self):
+        return f'{self.method} {self.rule}'
+    
+    def build(self, ctx):
+        """(path, headers, body bytes) for one request, or None when the pool is empty"""
+        item = None
+        if self.pool:
+            item = ctx.take(self.pool)
+            if item is None:
+                return None
+        path = self._path(ctx, item) if callable(self._path) else self._path
+        body = self._body(ctx, item) if callable(self._body) else self._body
+        headers = {}
+        if self.auth:
+            headers['Authorization'] = f'Bearer {ctx.tokens[self.auth]}'
+        if body is not None:
+            headers['Content-Type'] = self.content_type
+            body = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        return path, headers, body
+
+
+def _new_user(ctx, _):
+    n = ctx.unique()
+    return {
+        'email': f'new{n}@bench.local',
+        'username': f'new{n}',
+        'password': ctx.password,
+        'full_name': 'New Bench User',
+    }
+
+
+def _import_body(ctx, _):
+    return ''.join(json.dumps(_new_user(ctx, None)) + '\n' for _ in range(10))
+
+
+def _sync_body(ctx, _):
+    return {'tasks': [
+        {'voice_note_id': f'bench-sync-{ctx.unique()}', 'title': 'Synced task', 'priority': 'low'}
+        for _ in range(5)
+    ]}
+
+
+ENDPOINTS = (
+    Endpoint('GET', '/', auth=None),
+    Endpoint('GET', '/api/health', auth=None),
+    
+    # auth
+    Endpoint('POST', '/api/auth/register', auth=None, body=_new_user),
+    Endpoint('POST', '/api/auth/login', auth=None,
+             body=lambda ctx, _: ctx.manifest['employee']),
+    Endpoint('POST', '/api/auth/refresh', auth='refresh'),
+    Endpoint('GET', '/api/auth/me', auth='employee'),
+    Endpoint('POST', '/api/auth/change-password', auth='writer',
+             body=lambda ctx, _: {'old_password': ctx.password, 'new_password': ctx.password}),
+    Endpoint('POST', '/api/auth/logout', auth='employee'),
+    
+    # users
+    Endpoint('GET', '/api/users', path='/api/users?per_page=20'),
+    Endpoint('GET', '/api/users/<int:user_id>', path=lambda ctx, _: f'/api/users/{ctx.pick("users")}'),
+    Endpoint('POST', '/api/users', body=_new_user),
+    Endpoint('POST', '/api/users/import', body=_import_body, content_type='application/x-ndjson'),
+    Endpoint('PUT', '/api/users/<int:user_id>', path=lambda ctx, _: f'/api/users/{ctx.pick("users")}',
+             body={'full_name': 'Renamed Bench User'}),
+    Endpoint('PUT', '/api/users/<int:user_id>/permissions',
+             path=lambda ctx, _: f'/api/users/{ctx.pick("users")}/permissions',
+             body={'permissions': {'chat': True, 'code_assist': False}}),
+    Endpoint('PUT', '/api/users/<int:user_id>/status',
+             path=lambda ctx, _: f'/api/users/{ctx.pick("users")}/status', body={'status': 'active'}),
+    Endpoint('DELETE', '/api/users/<int:user_id>', pool='users', path=lambda ctx, item: f'/api/users/{item}'),
+    
+    # analytics
+    Endpoint('POST', '/api/analytics/log', auth='employee', body={'feature': 'chat', 'device_type': 'web'}),
+    Endpoint('GET', '/api/analytics/summary'),
+    Endpoint('GET', '/api/analytics/user/<int:user_id>', path=lambda ctx, _: f'/api/analytics/user/{ctx.pick("users")}'),
+    Endpoint('GET', '/api/analytics/export', path='/api/analytics/export?days=1'),
+    Endpoint('GET', '/api/analytics/my-stats', auth='employee'),
+    
+    # tasks
+    Endpoint('GET', '/api/tasks', auth='employee'),
+    Endpoint('GET', '/api/tasks/<int:task_id>', auth='employee', path=lambda ctx, _: f'/api/tasks/{ctx.pick("tasks")}'),
+    Endpoint('POST', '/api/tasks', auth='writer', body={'title': 'Bench task', 'priority': 'high'}),
+    Endpoint('PUT', '/api/tasks/<int:task_id>', auth='employee', path=lambda ctx, _: f'/api/tasks/{ctx.pick("tasks")}',
+             body={'priority': 'high', 'status': 'in_progress'}),
+    Endpoint('POST', '/api/tasks/sync', auth='writer', body=_sync_body),
+    Endpoint('DELETE', '/api/tasks/<int:task_id>', auth='writer', pool='writer_tasks',
+             path=lambda ctx, item: f'/api/tasks/{item}'),
+    
+    # announcements
+    Endpoint('GET', '/api/announcements', auth='employee'),
+    Endpoint('GET', '/api/announcements/unread-count', auth='employee'),
+    Endpoint('POST', '/api/announcements/mark-read', auth='employee',
+             body=lambda ctx, _: {'ids': [ctx.pick('announcements') for _ in range(5)]}),
+    Endpoint('GET', '/api/announcements/all'),
+    Endpoint('POST', '/api/announcements', body={'title': 'Bench announcement', 'message': 'Posted by the benchmark'}),
+    Endpoint('PUT', '/api/announcements/<int:announcement_id>',
+             path=lambda ctx, _: f'/api/announcements/{ctx.pick("announcements")}', body={'priority': 'warning'}),
+    Endpoint('DELETE', '/api/announcements/<int:announcement_id>', pool='announcements',
+             path=lambda ctx, item: f'/api/announcements/{item}'),
+    
+    # dashboard
+    Endpoint('GET', '/api/dashboard/bootstrap', auth='employee'),
+    
+    # system
+    Endpoint('GET', '/api/cache/stats'),
+    Endpoint('POST', '/api/cache/clear'),
+    Endpoint('GET', '/api/coalescing/stats'),
+    Endpoint('GET', '/api/replica/status'),
+    Endpoint('GET', '/api/admission/stats'),
+    Endpoint('GET', '/api/metrics'),
+)
+
+
+def uncovered_rules(app):
+    """'METHOD rule' of every app route the catalogue has no endpoint for"""
+    covered = {endpoint.name for endpoint in ENDPOINTS}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if f'{method} {rule.rule}' not in covered:
+                missing.append(f'{method} {rule.rule}')
+    return missing
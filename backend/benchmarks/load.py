@@ -0,0 +1,419 @@
+"""
+Benchmark: every route, in process through the test client and over HTTP
+
+Seeds a synthetic dataset with benchmarks.datagen (or reuses the one
+seeded earlier with the same sizes and seed), copies it so each run
+starts from the same rows, and drives every endpoint in
+benchmarks.endpoints in turn for --seconds: through the Flask test
+client in this process, and/or from --concurrency threads holding
+keep-alive HTTP connections to run.py (the production server unless
+--server says otherwise). Reports throughput and p50/p95/p99 latency
+per endpoint. --output writes the results as JSON; --baseline compares
+the run with such a file and exits with status 1 if an endpoint got
+slower (p95) or slower to serve (requests/s) by more than --tolerance.
+
+Usage (from backend/):
+    python -m benchmarks.load [--driver client|http|both] [--preset small] [--seconds 2]
+        [--concurrency N] [--no-cache] [--output results.json] [--baseline baseline.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from benchmarks.datagen import RESERVED_USERS, add_size_arguments, read_manifest, sizes_from_args
+from benchmarks.endpoints import ENDPOINTS, Context, uncovered_rules
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ids read endpoints pick from; they are never in a delete pool
+SAMPLE_SIZE = 100
+
+
+def ensure_dataset(database, sizes, seed):
+    """Manifest of the dataset at `database`, seeding it unless it already matches"""
+    manifest = read_manifest(database)
+    if manifest and manifest['sizes'] == sizes and manifest['seed'] == seed:
+        print(f'Reusing dataset {database}')
+        return manifest
+    if os.path.exists(database) and manifest is None:
+        sys.exit(f'{database} exists and is not a benchmark dataset')
+    command = [sys.executable, '-m', 'benchmarks.datagen', '--database', database, '--seed', str(seed)]
+    for name, value in sizes.items():
+        command += [f'--{name}', str(value)]
+    subprocess.run(command, cwd=BACKEND, check=True)
+    return read_manifest(database)
+
+
+def working_copy(dataset, directory, label):
+    """A copy of the dataset for one run, which may then write and delete freely"""
+    path = os.path.join(directory, f'{label}.db')
+    source = sqlite3.connect(dataset)
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return path
+
+
+def prepare(database, manifest, pool_size):
+    """Ids to sample and to delete, with rows added for the writer to delete"""
+    conn = sqlite3.connect(database)
+    try:
+        ids = {email: user_id for user_id, email in conn.execute(
+            "SELECT id, email FROM users WHERE email LIKE '%@bench.local' ORDER BY id"
+        )}
+        employee, writer = ids[manifest['employee']['email']], ids[manifest['writer']['email']]
+        users = list(ids.values())[RESERVED_USERS:]
+        
+        # Tasks the employee reads and updates; the writer's are deleted
+        now = str(datetime.utcnow())
+        for user_id, wanted in ((employee, SAMPLE_SIZE), (writer, pool_size)):
+            have = conn.execute('SELECT count(*) FROM tasks WHERE user_id = ?', (user_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO tasks (user_id, title, status, priority, source, created_at) "
+                "VALUES (?, 'Bench task', 'pending', 'medium', 'manual', ?)",
+                [(user_id, now)] * max(0, wanted - have)
+            )
+        conn.commit()
+        tasks = [row[0] for row in conn.execute(
+            'SELECT id FROM tasks WHERE user_id = ? ORDER BY id LIMIT ?', (employee, SAMPLE_SIZE)
+        )]
+        writer_tasks = [row[0] for row in conn.execute(
+            'SELECT id FROM tasks WHERE user_id = ? ORDER BY id LIMIT ?', (writer, pool_size)
+        )]
+        announcements = [row[0] for row in conn.execute(
+            "SELECT id FROM announcements WHERE status = 'active' ORDER BY id DESC"
+        )]
+    finally:
+        conn.close()
+    
+    samples = {
+        'users': users[:SAMPLE_SIZE],
+        'tasks': tasks,
+        'announcements': announcements[:SAMPLE_SIZE],
+    }
+    pools = {
+        'users': users[SAMPLE_SIZE:][::-1][:pool_size],
+        'writer_tasks': writer_tasks,
+        # Oldest first
+        'announcements': announcements[SAMPLE_SIZE:][::-1][:pool_size],
+    }
+    return samples, pools
+
+
+class ClientDriver:
+    """Requests through the Flask test client, in this process"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    def session(self):
+        return ClientSession(self.app.test_client())
+
+
+class ClientSession:
+    def __init__(self, client):
+        self.client = client
+    
+    def request(self, method, path, headers, body):
+        response = self.client.open(path, method=method, headers=headers, data=body)
+        data = response.get_data()
+        # Runs the call_on_close callbacks a server would run after writing the body
+        response.close()
+        return response.status_code, data
+    
+    def close(self):
+        pass
+
+
+class HTTPDriver:
+    """Requests over keep-alive HTTP connections to a local server"""
+    
+    def __init__(self, port):
+        self.port = port
+    
+    def session(self):
+        return HTTPSession(self.port)
+
+
+class HTTPSession:
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    
+    def request(self, method, path, headers, body):
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            return 0, b''
+    
+    def close(self):
+        self.conn.close()
+
+
+def login(driver, account):
+    session = driver.session()
+    try:
+        status, body = session.request(
+            'POST', '/api/auth/login', {'Content-Type': 'application/json'}, json.dumps(account).encode()
+        )
+    finally:
+        session.close()
+    if status != 200:
+        raise RuntimeError(f'Login as {account["email"]} failed with {status}: {body[:200]!r}')
+    return json.loads(body)
+
+
+def make_context(driver, manifest, samples, pools):
+    employee = login(driver, manifest['employee'])
+    tokens = {
+        'admin': login(driver, manifest['admin'])['access_token'],
+        'employee': employee['access_token'],
+        'refresh': employee['refresh_token'],
+        'writer': login(driver, manifest['writer'])['access_token'],
+    }
+    return Context(manifest, tokens, samples, pools)
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p), len(sorted_values) - 1)] if sorted_values else 0.0
+
+
+def run_endpoint(driver, endpoint, ctx, seconds, concurrency, warmup):
+    """Drive one endpoint from `concurrency` sessions; returns its stats"""
+    if not endpoint.pool:
+        session = driver.session()
+        for _ in range(warmup):
+            session.request(endpoint.method, *endpoint.build(ctx))
+        session.close()
+    
+    results = []
+    
+    def worker(deadline):
+        session = driver.session()
+        latencies, statuses = [], Counter()
+        while time.perf_counter() < deadline:
+            built = endpoint.build(ctx)
+            if built is None:
+                break
+            start = time.perf_counter()
+            status, _ = session.request(endpoint.method, *built)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+        session.close()
+        results.append((latencies, statuses))
+    
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(started + seconds,)) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    latencies = sorted(l * 1000 for batch, _ in results for l in batch)
+    statuses = sum((s for _, s in results), Counter())
+    errors = {str(status): count for status, count in sorted(statuses.items()) if not 200 <= status < 400}
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors.values()),
+        'error_statuses': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(_percentile(latencies, 0.50), 3),
+        'p95_ms': round(_percentile(latencies, 0.95), 3),
+        'p99_ms': round(_percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def run_all(driver, ctx, args, concurrency):
+    endpoints = [e for e in ENDPOINTS if not args.only or any(part in e.name for part in args.only)]
+    # Deletes last, so they do not take rows away from the other endpoints
+    endpoints.sort(key=lambda e: e.method == 'DELETE')
+    stats = {}
+    for endpoint in endpoints:
+        stats[endpoint.name] = result = run_endpoint(driver, endpoint, ctx, args.seconds, concurrency, args.warmup)
+        print(f'  {endpoint.name:<48} {result["requests"]:>7} {result["rps"]:>9.1f} '
+              f'{result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} {result["errors"]:>6}')
+    return stats
+
+
+def app_env(database, no_cache):
+    env = {
+        'FLASK_ENV': 'production',
+        'DATABASE_URL': 'sqlite:///' + database,
+        # The copy already has the schema and the admin
+        'FAST_START': 'True',
+        # /api/metrics is driven like every other route, without a token
+        'METRICS_TOKEN_REQUIRED': 'False',
+    }
+    if no_cache:
+        env.update({'CACHE_ENABLED': 'False', 'COALESCE_ENABLED': 'False'})
+    return env
+
+
+def run_client(args, dataset, manifest, workdir):
+    database = working_copy(dataset, workdir, 'client')
+    samples, pools = prepare(database, manifest, args.pool)
+    # Config is read at import, so the app is imported only now
+    os.environ.update(app_env(database, args.no_cache))
+    from app import create_app
+    app = create_app('production')
+    
+    missing = uncovered_rules(app)
+    if missing:
+        print(f'Routes without a benchmark endpoint: {", ".join(missing)}')
+    
+    driver = ClientDriver(app)
+    ctx = make_context(driver, manifest, samples, pools)
+    concurrency = args.concurrency or 1
+    print(f'\nTest client, {concurrency} thread(s), {args.seconds:g}s per endpoint')
+    _header()
+    return {'concurrency': concurrency, 'endpoints': run_all(driver, ctx, args, concurrency)}
+
+
+def run_http(args, dataset, manifest, workdir):
+    from benchmarks.server_throughput import start_server
+    
+    database = working_copy(dataset, workdir, 'http')
+    samples, pools = prepare(database, manifest, args.pool)
+    env = {**os.environ, **app_env(database, args.no_cache)}
+    process = start_server(args.port, args.server, env, args.workers, args.threads)
+    try:
+        driver = HTTPDriver(args.port)
+        ctx = make_context(driver, manifest, samples, pools)
+        concurrency = args.concurrency or 8
+        print(f'\nHTTP ({args.server} server), {concurrency} connections, {args.seconds:g}s per endpoint')
+        _header()
+        return {
+            'concurrency': concurrency,
+            'server': args.server,
+            'endpoints': run_all(driver, ctx, args, concurrency),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _header():
+    print(f'  {"endpoint":<48} {"requests":>7} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Endpoints that got worse than the baseline by more than the tolerance"""
+    if baseline.get('dataset') != results['dataset']:
+        print('Warning: the baseline was recorded on a different dataset')
+    if baseline.get('settings') != results['settings']:
+        print('Warning: the baseline was recorded with different settings')
+    regressions = []
+    for driver, run in results['runs'].items():
+        before_run = baseline.get('runs', {}).get(driver)
+        if before_run is None:
+            continue
+        if before_run.get('concurrency') != run['concurrency']:
+            print(f'Warning: the {driver} baseline ran with concurrency {before_run.get("concurrency")}')
+        for name, now in run['endpoints'].items():
+            before = before_run['endpoints'].get(name)
+            if not before or not before['requests'] or not now['requests']:
+                continue
+            slower = (now['p95_ms'] > before['p95_ms'] * (1 + tolerance)
+                      and now['p95_ms'] - before['p95_ms'] >= min_delta_ms)
+            fewer = now['rps'] < before['rps'] * (1 - tolerance)
+            if slower or fewer:
+                regressions.append(
+                    f'{driver:<6} {name:<48} p95 {before["p95_ms"]:.2f} -> {now["p95_ms"]:.2f} ms, '
+                    f'{before["rps"]:.1f} -> {now["rps"]:.1f} req/s'
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--driver', choices=('client', 'http', 'both'), default='both')
+    parser.add_argument('--dataset', help='Seeded SQLite file to reuse or create (default: in the temp dir)')
+    add_size_arguments(parser)
+    parser.add_argument('--seconds', type=float, default=2, help='Per endpoint')
+    parser.add_argument('--warmup', type=int, default=5, help='Uncounted requests before each endpoint')
+    parser.add_argument('--concurrency', type=int, help='Threads (default: 1 for client, 8 for http)')
+    parser.add_argument('--pool', type=int, default=5000, help='Ids each delete endpoint may consume')
+    parser.add_argument('--only', nargs='*', help='Run endpoints whose "METHOD rule" contains one of these')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache and coalescing')
+    parser.add_argument('--server', choices=('production', 'development'), default='production')
+    parser.add_argument('--workers', type=int, default=0, help='Production workers (0 = from CPU count)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per production worker')
+    parser.add_argument('--port', type=int, default=5602)
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--baseline', help='Results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore p95 slowdowns smaller than this')
+    args = parser.parse_args()
+    
+    sizes = sizes_from_args(args)
+    dataset = os.path.abspath(args.dataset or os.path.join(
+        tempfile.gettempdir(),
+        'ainsight-bench-{users}u-{analytics}a-{tasks}t-{announcements}n'.format(**sizes) + f'-s{args.seed}.db'
+    ))
+    manifest = ensure_dataset(dataset, sizes, args.seed)
+    workdir = tempfile.mkdtemp()
+    
+    results = {
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'dataset': {'sizes': sizes, 'seed': args.seed},
+        'settings': {'seconds': args.seconds, 'warmup': args.warmup, 'cache': not args.no_cache},
+        'runs': {},
+    }
+    # HTTP first: the client run imports the app into this process for good
+    if args.driver in ('http', 'both'):
+        results['runs']['http'] = run_http(args, dataset, manifest, workdir)
+    if args.driver in ('client', 'both'):
+        results['runs']['client'] = run_client(args, dataset, manifest, workdir)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults written to {args.output}')
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) against {args.baseline}:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print(f'\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})')
+
+
+if __name__ == '__main__':
+    main()
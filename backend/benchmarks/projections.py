@@ -0,0 +1,70 @@
+"""
+Benchmark: list reads, hydrated ORM objects vs. column projections
+
+Reports peak traced memory per row and rows/second for fetching and
+serializing a full list the old way (Model.query.all() + to_dict()) and
+through the projection read path.
+
+Usage (from backend/):
+    python -m benchmarks.projections [--rows 50000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from benchmarks.serializers import build_app, seed
+
+
+def measure(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            from app.models import db, User, Analytics, Task, Announcement
+            from app.projections import get_projection
+            
+            seed(args.rows)
+            print(f"{args.rows} rows per model")
+            print(f"{'model':<13} {'path':<11} {'rows/s':>10} {'peak B/row':>11}")
+            
+            for model in (User, Task, Analytics, Announcement):
+                projection = get_projection(model)
+                
+                def orm_path():
+                    rows = [obj.to_dict() for obj in model.query.all()]
+                    db.session.expunge_all()
+                    return rows
+                
+                def projection_path():
+                    return projection.fetch_serialized(projection.select())
+                
+                for name, fn in (('orm', orm_path), ('projection', projection_path)):
+                    seconds, peak = measure(fn, args.repeat)
+                    print(f"{model.__name__:<13} {name:<11} {args.rows / seconds:>10.0f} "
+                          f"{peak / args.rows:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: list serialization, to_dict() + jsonify vs. compiled serializers
+
+Usage (from backend/):
+    python -m benchmarks.serializers [--rows 20000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def build_app(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    return create_app('production')
+
+
+def seed(count):
+    from app.models import db, User, Analytics, Task, Announcement
+    
+    now = datetime.utcnow()
+    permissions = json.dumps({'chat': True, 'code_assist': False})
+    db.session.execute(db.insert(User), [{
+        'email': f'user{i}@example.com', 'username': f'user{i}', 'full_name': f'User {i}',
+        'password_hash': 'x', 'role': 'employee', 'status': 'active',
+        'permissions': permissions, 'created_at': now, 'last_login': now,
+    } for i in range(count)])
+    db.session.execute(db.insert(Task), [{
+        'user_id': 1 + i % count, 'title': f'Task {i}', 'description': 'Follow up ' * 20,
+        'status': 'pending', 'priority': 'medium', 'created_at': now,
+        'due_date': now + timedelta(days=3), 'source': 'manual',
+    } for i in range(count)])
+    db.session.execute(db.insert(Analytics), [{
+        'user_id': 1 + i % count, 'feature': 'chat', 'timestamp': now, 'device_type': 'web',
+        'metadata': json.dumps({'model': 'llama-3-8b', 'duration_ms': i, 'success': True}),
+    } for i in range(count)])
+    db.session.execute(db.insert(Announcement), [{
+        'sender_id': 1, 'title': f'Announcement {i}', 'message': 'Hello ' * 30,
+        'priority': 'info', 'target': 'all', 'created_at': now, 'status': 'active',
+    } for i in range(count)])
+    db.session.commit()
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.test_request_context():
+            from flask import jsonify
+            from app.models import db, User, Analytics, Task, Announcement
+            from app.serializers import get_serializer, json_response, orjson
+            
+            seed(args.rows)
+            print(f"{args.rows} rows per model, JSON encoder: {'orjson' if orjson else 'json'}")
+            print(f"{'model':<13} {'to_dict ms':>11} {'compiled obj ms':>16} {'compiled row ms':>16} {'speedup':>8}")
+            
+            for model in (User, Task, Analytics, Announcement):
+                serializer = get_serializer(model)
+                objects = model.query.all()
+                rows = db.session.execute(serializer.select()).all()
+                
+                baseline = best_of(args.repeat, lambda: jsonify([o.to_dict() for o in objects]).get_data())
+                compiled_objects = best_of(args.repeat, lambda: json_response(serializer.objects(objects)).get_data())
+                compiled_rows = best_of(args.repeat, lambda: json_response(serializer.rows(rows)).get_data())
+                print(f"{model.__name__:<13} {baseline:>11.1f} {compiled_objects:>16.1f} "
+                      f"{compiled_rows:>16.1f} {baseline / compiled_rows:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark: request throughput, development server vs. production server
+
+Starts run.py twice against the same seeded database: once with the
+Werkzeug development server and once in production mode (gunicorn,
+preforked workers with thread pools). Each is then driven by client
+threads holding keep-alive connections and issuing a mix of health
+checks, task listings and analytics summaries. Reports requests per
+second, latency percentiles and errors for both.
+
+Usage (from backend/):
+    python -m benchmarks.server_throughput [--clients 16] [--seconds 10] [--workers 0] [--threads 4]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = (
+    ('/api/health', 0.4),
+    ('/api/tasks', 0.4),
+    ('/api/analytics/summary', 0.2),
+)
+
+
+def start_server(port, mode, env, workers, threads):
+    env = {
+        **env,
+        'PORT': str(port),
+        'HOST': '127.0.0.1',
+        'SERVER_MODE': mode,
+        'SERVER_WORKERS': str(workers),
+        'SERVER_THREADS': str(threads),
+    }
+    process = subprocess.Popen(
+        [sys.executable, 'run.py'], cwd=BACKEND, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start on port {port}')
+
+
+def login(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request(
+        'POST', '/api/auth/login',
+        body=json.dumps({'email': 'admin@ainsight.ai', 'password': 'admin123'}),
+        headers={'Content-Type': 'application/json'}
+    )
+    return json.loads(conn.getresponse().read())['access_token']
+
+
+def seed_tasks(port, token, count):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    for i in range(count):
+        conn.request('POST', '/api/tasks', body=json.dumps({'title': f'Task {i}'}), headers=headers)
+        conn.getresponse().read()
+
+
+def client(port, token, deadline, results):
+    rng = random.Random()
+    paths = [path for path, _ in ROUTES]
+    weights = [weight for _, weight in ROUTES]
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies, errors = [], 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.perf_counter() < deadline:
+        path = rng.choices(paths, weights)[0]
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.close()
+    results.append((latencies, errors))
+
+
+def run(port, token, clients, seconds):
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(port, token, deadline, results)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(l for batch, _ in results for l in batch)
+    errors = sum(e for _, e in results)
+    return latencies, errors
+
+
+def report(label, latencies, errors, seconds):
+    def pct(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+    print(f'{label:<12} {len(latencies) / seconds:>9.0f} req/s  '
+          f'p50 {pct(0.50):>7.1f} ms  p99 {pct(0.99):>7.1f} ms  errors {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=0, help='Production workers (0 = from CPU count)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per production worker')
+    parser.add_argument('--tasks', type=int, default=50, help='Tasks seeded for the admin user')
+    parser.add_argument('--port', type=int, default=5601)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        'FLASK_ENV': 'production',
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+    }
+    
+    print(f'{args.clients} clients, {args.seconds:g}s per server')
+    for label, mode in (('development', 'development'), ('production', 'production')):
+        process = start_server(args.port, mode, env, args.workers, args.threads)
+        try:
+            token = login(args.port)
+            if mode == 'development':
+                seed_tasks(args.port, token, args.tasks)
+            latencies, errors = run(args.port, token, args.clients, args.seconds)
+            report(label, latencies, errors, args.seconds)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
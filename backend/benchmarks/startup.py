@@ -0,0 +1,107 @@
+"""
+Benchmark: cold start to first request, full bootstrap vs. FAST_START
+
+Starts fresh interpreters that import the app, call create_app() and
+serve one health check through the test client, and reports where the
+time goes (import, create_app, first request, whole process). The full
+bootstrap runs create_all, migrations and the admin seeding on every
+start; FAST_START runs against a database prepared once with
+`flask init-db` / `flask create-admin`. An import-time profile
+(python -X importtime) of one start lists the slowest imports.
+
+Usage (from backend/):
+    python -m benchmarks.startup [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in each fresh interpreter; prints its phase timings as JSON
+PROBE = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+assert app.test_client().get('/api/health').status_code == 200
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+}))
+"""
+
+
+def start_once(env, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    began = time.perf_counter()
+    result = subprocess.run(command, cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - began
+    return timings, result.stderr
+
+
+def import_profile(stderr, top):
+    """Slowest top-level imports and slowest app modules from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nesting shows as two spaces per level after the separator's own space
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    # Top-level entries are not indented in the module column
+    roots = [row for row in rows if not row[0].startswith(' ')]
+    app_modules = [row for row in rows if row[0].strip().startswith('app')]
+    by_cumulative = lambda row: -row[2]
+    return sorted(roots, key=by_cumulative)[:top], sorted(app_modules, key=by_cumulative)[:top]
+
+
+def report(label, runs):
+    print(f'{label}:')
+    for phase in ('import', 'create_app', 'first_request', 'process'):
+        values = [run[phase] * 1000 for run in runs]
+        print(f'  {phase:<14} median {statistics.median(values):>8.1f} ms  '
+              f'min {min(values):>8.1f} ms  max {max(values):>8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Starts per mode')
+    parser.add_argument('--top', type=int, default=15, help='Modules listed in the import profile')
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    env = {**os.environ, 'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'bench.db')}
+    
+    # Full bootstrap; each run also recreates the schema and checks the admin
+    full = [start_once({**env, 'FAST_START': 'False'})[0] for _ in range(args.runs)]
+    
+    # Database prepared above; FAST_START skips all of it
+    fast_env = {**env, 'FAST_START': 'True'}
+    fast = [start_once(fast_env)[0] for _ in range(args.runs)]
+    
+    report('full bootstrap', full)
+    report('FAST_START', fast)
+    
+    _, stderr = start_once(fast_env, importtime=True)
+    roots, app_modules = import_profile(stderr, args.top)
+    print('\nSlowest top-level imports (FAST_START, cumulative):')
+    for name, _, cumulative in roots:
+        print(f'  {cumulative / 1000:>8.1f} ms  {name}')
+    print('\nSlowest app modules (cumulative):')
+    for name, _, cumulative in app_modules:
+        print(f'  {cumulative / 1000:>8.1f} ms  {name.strip()}')
+
+
+if __name__ == '__main__':
+    main()
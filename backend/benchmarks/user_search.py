@@ -0,0 +1,105 @@
+"""
+Benchmark: admin user search, LIKE scan vs. the trigram index
+
+Usage (from backend/):
+    python -m benchmarks.user_search [--users 100000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+TERMS = [
+    ('prefix', 'user0421'),
+    ('substring', 'mith'),
+    ('domain', 'example.org'),
+    ('typo', 'willaims'),
+    ('miss', 'zzqzzq'),
+]
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis']
+DOMAINS = ['example.com', 'example.org', 'acme.io', 'corp.local']
+
+
+def build_app(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    return create_app('production')
+
+
+def seed(count):
+    from datetime import datetime
+    from app.models import db, User
+    
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        suffix = ''.join(rng.choices(string.ascii_lowercase, k=4))
+        rows.append({
+            'email': f'{first}.{last}{i}@{rng.choice(DOMAINS)}'.lower(),
+            'username': f'user{i:06d}{suffix}',
+            'full_name': f'{first} {last}',
+            'password_hash': 'x',
+            'role': 'employee',
+            'status': 'active',
+            'permissions': '{}',
+            'created_at': now,
+        })
+        if len(rows) == 5000:
+            db.session.execute(db.insert(User), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(User), rows)
+    db.session.commit()
+
+
+def time_query(build_filter, term, repeat):
+    from app.models import db, User
+    
+    samples = []
+    total = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query = User.query.filter(build_filter(term))
+        total = query.order_by(User.created_at.desc()).paginate(
+            page=1, per_page=20, error_out=False
+        ).total
+        samples.append(time.perf_counter() - start)
+        db.session.rollback()
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            from app.search import like_filter, search_filter
+            
+            start = time.perf_counter()
+            seed(args.users)
+            print(f"Seeded {args.users} users in {time.perf_counter() - start:.1f}s "
+                  f"(search backend: {app.extensions['user_search']})")
+            print(f"{'case':<10} {'term':<14} {'LIKE ms':>9} {'hits':>7} {'index ms':>9} {'hits':>7} {'speedup':>8}")
+            
+            for case, term in TERMS:
+                like_ms, like_hits = time_query(like_filter, term, args.repeat)
+                index_ms, index_hits = time_query(search_filter, term, args.repeat)
+                print(f"{case:<10} {term:<14} {like_ms:>9.2f} {like_hits:>7} "
+                      f"{index_ms:>9.2f} {index_hits:>7} {like_ms / index_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
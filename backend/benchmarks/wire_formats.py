@@ -0,0 +1,98 @@
+"""
+Benchmark: payload size and encode/decode cost per wire format
+
+Compares stdlib json, orjson, msgpack and cbor2 on representative sync and
+my-stats payloads. Formats whose package is not installed are skipped.
+
+Usage (from backend/):
+    python -m benchmarks.wire_formats [--tasks 200] [--repeat 2000]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+
+def sync_payload(count):
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    return {
+        'message': 'Tasks synced successfully',
+        'tasks': [{
+            'id': i,
+            'user_id': 7,
+            'title': f'Follow up on voice note {i}',
+            'description': 'Captured from the mobile app',
+            'status': 'pending' if i % 3 else 'completed',
+            'priority': ('low', 'medium', 'high')[i % 3],
+            'created_at': (now + timedelta(minutes=i)).isoformat(),
+            'due_date': None,
+            'completed_at': None if i % 3 else (now + timedelta(hours=i)).isoformat(),
+            'source': 'voice',
+            'voice_note_id': f'vn-{i:06d}',
+        } for i in range(count)],
+        'count': count,
+    }
+
+
+def stats_payload():
+    start = datetime(2024, 1, 1)
+    return {
+        'period_days': 30,
+        'total_usage': 1234,
+        'feature_usage': [{'feature': f, 'count': 100 + i} for i, f in
+                          enumerate(('chat', 'voice', 'tasks', 'announcements', 'search'))],
+        'daily_usage': [{'date': str((start + timedelta(days=d)).date()), 'count': 40 + d}
+                        for d in range(30)],
+    }
+
+
+def formats():
+    found = [('json', lambda p: json.dumps(p, separators=(',', ':')).encode(), json.loads)]
+    try:
+        import orjson
+        found.append(('orjson', orjson.dumps, orjson.loads))
+    except ImportError:
+        pass
+    try:
+        import msgpack
+        found.append(('msgpack', lambda p: msgpack.packb(p, use_bin_type=True),
+                      lambda b: msgpack.unpackb(b, raw=False)))
+    except ImportError:
+        pass
+    try:
+        import cbor2
+        found.append(('cbor2', cbor2.dumps, cbor2.loads))
+    except ImportError:
+        pass
+    return found
+
+
+def timed(fn, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+    
+    payloads = (
+        (f'sync ({args.tasks} tasks)', sync_payload(args.tasks)),
+        ('my-stats', stats_payload()),
+    )
+    for label, payload in payloads:
+        print(label)
+        print(f"  {'format':<8} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+        for name, encode, decode in formats():
+            body = encode(payload)
+            assert decode(body) == payload
+            print(f"  {name:<8} {len(body):>8} {timed(encode, payload, args.repeat):>10.1f} "
+                  f"{timed(decode, body, args.repeat):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
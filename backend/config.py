@@ -18,6 +18,24 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///ainsight.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool (server databases; file-backed SQLite uses the pool size only)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    # Compiled SQL statements cached per engine
+    DB_QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', '1200'))
+    
+    # SQLite: WAL lets readers run alongside the writer, and the busy timeout makes
+    # concurrent writers wait for the lock instead of failing with "database is locked"
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # negative = KiB
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_CACHED_STATEMENTS = int(os.getenv('SQLITE_CACHED_STATEMENTS', '256'))
+    
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '24')))
@@ -30,6 +48,49 @@ class Config:
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', '5000'))
     
+    # Request/SQL metrics at /api/metrics: directory where each worker process writes
+    # its snapshot for the others to aggregate (app.server and gunicorn.conf.py set one), how
+    # often it is written, a bearer token required to scrape (empty = open), and whether
+    # scraping is refused while no token is set (the production default)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_S = float(os.getenv('METRICS_FLUSH_S', '5'))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_TOKEN_REQUIRED = os.getenv('METRICS_TOKEN_REQUIRED', 'False') == 'True'
+    
+    # SQL statement budgets per request (@query_budget): 'off', 'warn' (log) or
+    # 'raise' (fail, for tests), and how many runs of one statement shape count as N+1
+    QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'off')
+    QUERY_BUDGET_REPEAT_THRESHOLD = int(os.getenv('QUERY_BUDGET_REPEAT_THRESHOLD', '3'))
+    
+    # Slow-request tracing: fraction of requests traced (0 = off), latency from which a
+    # traced request is written, the rotating per-process JSONL files (directory
+    # defaults to instance/traces), and the most the directory may hold across all
+    # processes, oldest files deleted first; summarize them with `flask traces`
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.01'))
+    TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', '500'))
+    TRACE_DIR = os.getenv('TRACE_DIR', '')
+    TRACE_MAX_BYTES = int(os.getenv('TRACE_MAX_BYTES', str(10 * 1024 * 1024)))
+    TRACE_BACKUP_COUNT = int(os.getenv('TRACE_BACKUP_COUNT', '3'))
+    TRACE_DIR_MAX_BYTES = int(os.getenv('TRACE_DIR_MAX_BYTES', str(100 * 1024 * 1024)))
+    
+    # Fast start: skip schema creation and admin seeding in create_app (run
+    # `flask init-db` and `flask create-admin` once per deployment instead)
+    FAST_START = os.getenv('FAST_START', 'False') == 'True'
+    
+    # Production server (python run.py --production, or SERVER_MODE=production; opt-in
+    # in every config, FLASK_ENV=production alone keeps the Werkzeug server): worker
+    # processes (0 = two per CPU plus one), threads per worker, keep-alive, request and
+    # graceful-shutdown timeouts, and requests after which a worker is recycled (0 = never)
+    SERVER_MODE = os.getenv('SERVER_MODE', 'development')
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '4'))
+    SERVER_KEEPALIVE_S = int(os.getenv('SERVER_KEEPALIVE_S', '5'))
+    SERVER_TIMEOUT_S = int(os.getenv('SERVER_TIMEOUT_S', '60'))
+    SERVER_GRACEFUL_TIMEOUT_S = int(os.getenv('SERVER_GRACEFUL_TIMEOUT_S', '30'))
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '10000'))
+    SERVER_ACCESS_LOG = os.getenv('SERVER_ACCESS_LOG', 'False') == 'True'
+    
     # Encryption
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', 'default-32-byte-key-change-this!')
     
@@ -39,6 +100,81 @@ class Config:
     # Pagination
     ITEMS_PER_PAGE = 20
     
+    # Seconds a cached cursor-pagination total is served before a background recount
+    APPROXIMATE_COUNT_TTL = int(os.getenv('APPROXIMATE_COUNT_TTL', '60'))
+    
+    # User search index: 'auto' (FTS5 on SQLite, pg_trgm on Postgres) or 'like'
+    USER_SEARCH_BACKEND = os.getenv('USER_SEARCH_BACKEND', 'auto')
+    
+    # Bulk user import: processes used for password hashing (0 = CPU count)
+    IMPORT_HASH_WORKERS = int(os.getenv('IMPORT_HASH_WORKERS', '0')) or None
+    
+    # Deleted-user purge: rows per DELETE (upper bound), per-chunk lock budget and pause
+    USER_PURGE_CHUNK_SIZE = int(os.getenv('USER_PURGE_CHUNK_SIZE', '1000'))
+    USER_PURGE_LOCK_BUDGET_MS = int(os.getenv('USER_PURGE_LOCK_BUDGET_MS', '50'))
+    USER_PURGE_PAUSE_MS = int(os.getenv('USER_PURGE_PAUSE_MS', '10'))
+    
+    # Response compression: encodings in server preference order (br/zstd need their
+    # packages), minimum body size, and byte budget of the compressed-body LRU
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True') == 'True'
+    COMPRESSION_ALGORITHMS = os.getenv('COMPRESSION_ALGORITHMS', 'br,zstd,gzip')
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_CACHE_BYTES = int(os.getenv('COMPRESSION_CACHE_BYTES', str(8 * 1024 * 1024)))
+    
+    # Response cache: in-process LRU plus an optional SQLite file shared by all workers
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True') == 'True'
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', '60'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    CACHE_SHARED_PATH = os.getenv('CACHE_SHARED_PATH', '')
+    CACHE_SHARED_MAX_ENTRIES = int(os.getenv('CACHE_SHARED_MAX_ENTRIES', '10000'))
+    
+    # Cross-worker invalidation log (defaults to the shared cache file; app.server and
+    # gunicorn.conf.py create one for their workers if neither is set), poll interval, lag after
+    # which a worker stops trusting its local level, and log retention
+    CACHE_BUS_PATH = os.getenv('CACHE_BUS_PATH', '')
+    CACHE_BUS_POLL_MS = int(os.getenv('CACHE_BUS_POLL_MS', '50'))
+    CACHE_BUS_MAX_LAG_MS = int(os.getenv('CACHE_BUS_MAX_LAG_MS', '1000'))
+    CACHE_BUS_RETENTION_S = int(os.getenv('CACHE_BUS_RETENTION_S', '300'))
+    
+    # Single-flight coalescing of expensive aggregates: how long a shared result is
+    # reused, how long followers wait for the leader, and per-endpoint TTL overrides
+    # ('analytics.get_summary=5000,analytics.export_analytics=0')
+    COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'True') == 'True'
+    COALESCE_RESULT_TTL_MS = int(os.getenv('COALESCE_RESULT_TTL_MS', '2000'))
+    COALESCE_WAIT_TIMEOUT_S = float(os.getenv('COALESCE_WAIT_TIMEOUT_S', '30'))
+    COALESCE_TTL_OVERRIDES = os.getenv('COALESCE_TTL_OVERRIDES', '')
+    
+    # Read replica for heavy read-only views (empty = primary only): lag after which
+    # reads fall back to the primary, how long a writer's reads stay on the primary,
+    # the SQLite file where worker processes share those writers (empty = per process;
+    # app.server and gunicorn.conf.py create one), and how often the primary writes the
+    # heartbeat the lag is measured with
+    REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL', '')
+    REPLICA_MAX_LAG_S = float(os.getenv('REPLICA_MAX_LAG_S', '5'))
+    REPLICA_STICKY_S = float(os.getenv('REPLICA_STICKY_S', '5'))
+    REPLICA_STICKY_PATH = os.getenv('REPLICA_STICKY_PATH', '')
+    REPLICA_HEARTBEAT_S = float(os.getenv('REPLICA_HEARTBEAT_S', '1'))
+    
+    # Admission control, per process: for each endpoint class, concurrent requests,
+    # requests allowed to queue, and how long one may queue (class=limit/queue/wait_ms;
+    # fitted to SERVER_THREADS at start, as queued requests hold a thread); the class
+    # of views without @admission_class, and Retry-After of shed requests
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True') == 'True'
+    ADMISSION_CLASSES = os.getenv('ADMISSION_CLASSES', 'heavy=2/1/5000,interactive=16/32/1000,ingest=32/64/250')
+    ADMISSION_DEFAULT_CLASS = os.getenv('ADMISSION_DEFAULT_CLASS', 'interactive')
+    ADMISSION_RETRY_AFTER_S = int(os.getenv('ADMISSION_RETRY_AFTER_S', '1'))
+    
+    # Database time budgets: how long a request may keep using the database once its
+    # first statement starts (0 = no limit), per-endpoint overrides
+    # ('analytics.export_analytics=30000'), and SQLite VM steps between deadline checks
+    DB_BUDGET_ENABLED = os.getenv('DB_BUDGET_ENABLED', 'True') == 'True'
+    DB_BUDGET_DEFAULT_MS = int(os.getenv('DB_BUDGET_DEFAULT_MS', '10000'))
+    DB_BUDGET_OVERRIDES = os.getenv('DB_BUDGET_OVERRIDES', '')
+    DB_BUDGET_SQLITE_STEPS = int(os.getenv('DB_BUDGET_SQLITE_STEPS', '10000'))
+    
+    # Dashboard bootstrap: threads fetching sections concurrently
+    DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', '4'))
+    
     # File Upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
@@ -52,18 +188,29 @@ class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     TESTING = False
+    QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'warn')
 
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     TESTING = False
+    # One connection per request thread and dashboard section thread, plus a few for
+    # the background threads (purges, approximate counts, replica heartbeat). Every
+    # worker has its own pool, so a host holds up to SERVER_WORKERS x (DB_POOL_SIZE +
+    # DB_MAX_OVERFLOW) connections: 9 x (4 + 4 + 2) = 90 with the defaults on 4 CPUs.
+    # Keep that under the database's max_connections (100 by default on PostgreSQL)
+    # for every host together, lowering SERVER_WORKERS or adding PgBouncer if needed
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', str(Config.SERVER_THREADS + Config.DASHBOARD_WORKERS)))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '2'))
+    METRICS_TOKEN_REQUIRED = os.getenv('METRICS_TOKEN_REQUIRED', 'True') == 'True'
 
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test_ainsight.db'
+    QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'raise')
 
 
 # Configuration dictionary
@@ -0,0 +1,43 @@
+"""
+gunicorn settings, read from this directory by `gunicorn run:app`
+
+Worker processes share cache invalidations, metrics snapshots and
+read-your-writes markers through files. Their paths are chosen here, in
+the master, so every worker gets the same ones, and go into the
+environment before the app is loaded, as config.py reads it at import.
+Paths set in the environment are kept. `python run.py --production`
+(app.server) sets up the same things itself.
+"""
+import os
+import tempfile
+
+_shared = tempfile.mkdtemp(prefix='ainsight-')
+if not os.getenv('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = os.path.join(_shared, 'metrics')
+if not (os.getenv('CACHE_BUS_PATH') or os.getenv('CACHE_SHARED_PATH')):
+    os.environ['CACHE_BUS_PATH'] = os.path.join(_shared, 'bus.db')
+if not os.getenv('REPLICA_STICKY_PATH'):
+    os.environ['REPLICA_STICKY_PATH'] = os.path.join(_shared, 'writers.db')
+
+# Create the app once, in the master, as app.server does: the schema bootstrap
+# then runs once instead of racing in every worker
+preload_app = True
+
+# Threaded workers as in app.server; the database pool is sized for SERVER_THREADS
+worker_class = 'gthread'
+threads = int(os.getenv('SERVER_THREADS', '4'))
+
+
+def post_fork(server, worker):
+    # A preloaded app's pooled connections belong to the master
+    if server.cfg.preload_app:
+        from app.server import reset_after_fork
+        reset_after_fork(worker.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Queued requests hold a thread; fit the admission limits to this worker's threads
+    from app.admission import admission
+    app = worker.wsgi
+    if app.config['ADMISSION_ENABLED']:
+        admission.build_gates(app, worker.cfg.threads)
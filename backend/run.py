@@ -1,23 +1,36 @@
 """
 Run the Flask application
+
+    python run.py                 Werkzeug development server
+    python run.py --production    gunicorn with preforked workers (app.server)
 """
 import os
+import sys
 from app import create_app
 
 # Get config from environment
 config_name = os.getenv('FLASK_ENV', 'development')
 
-# Create app
-app = create_app(config_name)
+# Create app (not in the hashing processes of a user import, which import this
+# module as __mp_main__ and only need the functions they are sent)
+if __name__ != '__mp_main__':
+    app = create_app(config_name)
 
 if __name__ == '__main__':
     host = app.config['HOST']
     port = app.config['PORT']
     debug = app.config['DEBUG']
+    production = '--production' in sys.argv or app.config['SERVER_MODE'] == 'production'
     
     print(f"Starting AInSight API Server...")
     print(f"Environment: {config_name}")
     print(f"Server: http://{host}:{port}")
     print(f"Debug: {debug}")
     
-    app.run(host=host, port=port, debug=debug)
+    if production:
+        from app.server import serve, server_options
+        options = server_options(app.config)
+        print(f"Workers: {options['workers']} x {options['threads']} threads")
+        serve(app)
+    else:
+        app.run(host=host, port=port, debug=debug)
@@ -0,0 +1,60 @@
+"""
+Shared fixtures: a fresh app and SQLite database per test
+"""
+import pytest
+from config import TestingConfig
+from app import create_app
+from app.bootstrap import DEFAULT_ADMIN_EMAIL, DEFAULT_ADMIN_PASSWORD
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """create_app('testing') on a database in tmp_path, with config overrides"""
+    def make(**settings):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+            'TRACE_SAMPLE_RATE': 0,
+            **settings,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(TestingConfig, name, value, raising=False)
+        return create_app('testing')
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f'Bearer {response.get_json()["access_token"]}'}
+
+
+@pytest.fixture
+def admin(client):
+    """Authorization headers of the default admin"""
+    return login(client, DEFAULT_ADMIN_EMAIL, DEFAULT_ADMIN_PASSWORD)
+
+
+@pytest.fixture
+def register(client):
+    """Register an employee; returns (user dict, authorization headers)"""
+    def register(name, **fields):
+        response = client.post('/api/auth/register', json={
+            'email': f'{name}@example.com',
+            'username': name,
+            'password': 'password123',
+            'full_name': name.title(),
+            **fields,
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['user'], login(client, f'{name}@example.com', 'password123')
+    return register
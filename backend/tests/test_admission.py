@@ -0,0 +1,41 @@
+"""
+Admission control per endpoint class
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.admission import admission, fit_classes
+
+
+def test_limits_are_fitted_to_the_worker_threads():
+    classes = {'heavy': (2, 2, 5000), 'interactive': (16, 32, 1000), 'ingest': (32, 64, 250)}
+    assert fit_classes(classes, 4) == {'heavy': (2, 1, 5000), 'interactive': (4, 32, 1000), 'ingest': (4, 64, 250)}
+    assert fit_classes(classes, 3)['heavy'] == (2, 0, 5000)
+
+
+def test_saturated_heavy_class_leaves_a_thread_for_ingest(make_app, admin, register):
+    app = make_app(SERVER_THREADS=4, ADMISSION_CLASSES='heavy=2/2/5000,ingest=32/64/250')
+    _, headers = register('noah')
+    release = threading.Event()
+    summary = app.view_functions['analytics.get_summary']
+    
+    def slow_summary(*args, **kwargs):
+        release.wait(10)
+        return summary(*args, **kwargs)
+    slow_summary.admission_class = summary.admission_class
+    app.view_functions['analytics.get_summary'] = slow_summary
+    
+    # The worker's threads, each serving one request at a time
+    with ThreadPoolExecutor(max_workers=app.config['SERVER_THREADS']) as threads:
+        try:
+            heavy = [
+                threads.submit(lambda: app.test_client().get('/api/analytics/summary', headers=admin).status_code)
+                for _ in range(8)
+            ]
+            log = threads.submit(
+                lambda: app.test_client().post('/api/analytics/log', json={'feature': 'chat'}, headers=headers)
+            )
+            assert log.result(timeout=2).status_code == 201
+            assert admission.gates['heavy'].get_stats()['active'] == 2
+        finally:
+            release.set()
+        assert sorted(f.result() for f in heavy) == [200] * 3 + [503] * 5
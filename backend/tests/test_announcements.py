@@ -0,0 +1,38 @@
+"""
+Announcement listing
+"""
+
+
+def test_sparse_fieldsets_with_the_read_flag(client, admin, register):
+    _, employee = register('liam')
+    client.post('/api/announcements', json={'title': 'Hello', 'message': 'World'}, headers=admin)
+    
+    def listed(fields):
+        response = client.get(f'/api/announcements?fields={fields}', headers=employee)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()['announcements']
+    
+    assert listed('read') == [{'read': False}]
+    assert listed('title,read') == [{'title': 'Hello', 'read': False}]
+    assert listed('title') == [{'title': 'Hello'}]
+    assert client.get('/api/announcements?fields=bogus', headers=employee).status_code == 400
+
+
+def test_hidden_announcements_stay_unread_until_they_reach_the_user(client, admin, register):
+    _, employee = register('nina')
+    
+    def post(target):
+        response = client.post('/api/announcements', json={'title': target, 'message': 'Hi', 'target': target}, headers=admin)
+        return response.get_json()['announcement']['id']
+    
+    def unread():
+        return client.get('/api/announcements/unread-count', headers=employee).get_json()['unread_count']
+    
+    for_admins = post('role:admin')
+    for_all = post('all')
+    client.post('/api/announcements/mark-read', json={'ids': [for_all]}, headers=employee)
+    assert unread() == 0
+    
+    # Retargeted at everyone, the admins' announcement is news to the employee
+    client.put(f'/api/announcements/{for_admins}', json={'target': 'all'}, headers=admin)
+    assert unread() == 1
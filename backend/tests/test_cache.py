@@ -0,0 +1,156 @@
+"""
+Response cache: a read after a write never serves the pre-write response
+"""
+
+
+def cached_get(client, url, headers):
+    """GET a cached view twice, checking the second response came from the cache"""
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200, first.get_json()
+    second = client.get(url, headers=headers)
+    assert second.headers['X-Cache'] == 'HIT'
+    return second.get_json()
+
+
+def fresh_get(client, url, headers):
+    """GET a cached view that a write just invalidated"""
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert response.headers['X-Cache'] == 'MISS'
+    return response.get_json()
+
+
+def by_id(items, item_id):
+    return next(item for item in items if item['id'] == item_id)
+
+
+def test_user_update_refreshes_user_reads(client, admin, register):
+    user, _ = register('alice')
+    cached_get(client, '/api/users', admin)
+    cached_get(client, f'/api/users/{user["id"]}', admin)
+    
+    response = client.put(f'/api/users/{user["id"]}', json={'full_name': 'Alice Renamed'}, headers=admin)
+    assert response.status_code == 200
+    
+    listed = fresh_get(client, '/api/users', admin)['users']
+    assert by_id(listed, user['id'])['full_name'] == 'Alice Renamed'
+    assert fresh_get(client, f'/api/users/{user["id"]}', admin)['user']['full_name'] == 'Alice Renamed'
+
+
+def test_sender_rename_refreshes_announcement_sender_name(client, admin, register):
+    _, employee = register('bob')
+    client.post('/api/announcements', json={'title': 'Hello', 'message': 'World'}, headers=admin)
+    admin_id = client.get('/api/auth/me', headers=admin).get_json()['user']['id']
+    cached_get(client, '/api/announcements', employee)
+    cached_get(client, '/api/announcements/all', admin)
+    
+    client.put(f'/api/users/{admin_id}', json={'full_name': 'Head Office'}, headers=admin)
+    
+    assert fresh_get(client, '/api/announcements', employee)['announcements'][0]['sender_name'] == 'Head Office'
+    assert fresh_get(client, '/api/announcements/all', admin)['announcements'][0]['sender_name'] == 'Head Office'
+
+
+def test_permission_and_status_changes_refresh_user_reads(client, admin, register):
+    user, _ = register('carol')
+    cached_get(client, '/api/users', admin)
+    cached_get(client, f'/api/users/{user["id"]}', admin)
+    cached_get(client, '/api/users?permission=chat', admin)
+    
+    client.put(f'/api/users/{user["id"]}/permissions', json={'permissions': {'chat': False}}, headers=admin)
+    assert fresh_get(client, f'/api/users/{user["id"]}', admin)['user']['permissions']['chat'] is False
+    chat_users = fresh_get(client, '/api/users?permission=chat', admin)['users']
+    assert user['id'] not in [item['id'] for item in chat_users]
+    
+    cached_get(client, '/api/users', admin)
+    client.put(f'/api/users/{user["id"]}/status', json={'status': 'suspended'}, headers=admin)
+    assert by_id(fresh_get(client, '/api/users', admin)['users'], user['id'])['status'] == 'suspended'
+    assert fresh_get(client, f'/api/users/{user["id"]}', admin)['user']['status'] == 'suspended'
+
+
+def dashboard_tasks(client, headers):
+    response = client.get('/api/dashboard/bootstrap?sections=tasks', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['sections']['tasks']['data']['tasks']
+
+
+def test_task_writes_refresh_task_reads(client, register):
+    _, employee = register('dave')
+    assert cached_get(client, '/api/tasks', employee)['count'] == 0
+    
+    task = client.post('/api/tasks', json={'title': 'Write report'}, headers=employee).get_json()['task']
+    assert [t['title'] for t in fresh_get(client, '/api/tasks', employee)['tasks']] == ['Write report']
+    assert [t['id'] for t in dashboard_tasks(client, employee)] == [task['id']]
+    
+    cached_get(client, f'/api/tasks/{task["id"]}', employee)
+    client.post('/api/tasks/sync', json={'tasks': [{'id': task['id'], 'status': 'completed'}]}, headers=employee)
+    assert fresh_get(client, f'/api/tasks/{task["id"]}', employee)['task']['status'] == 'completed'
+    
+    cached_get(client, '/api/tasks', employee)
+    client.post('/api/tasks/sync', json={'tasks': [{'voice_note_id': 'vn-1', 'title': 'From voice'}]}, headers=employee)
+    titles = {t['title'] for t in fresh_get(client, '/api/tasks', employee)['tasks']}
+    assert titles == {'Write report', 'From voice'}
+    assert {t['title'] for t in dashboard_tasks(client, employee)} == titles
+    
+    cached_get(client, '/api/tasks', employee)
+    client.delete(f'/api/tasks/{task["id"]}', headers=employee)
+    assert [t['title'] for t in fresh_get(client, '/api/tasks', employee)['tasks']] == ['From voice']
+    assert [t['title'] for t in dashboard_tasks(client, employee)] == ['From voice']
+
+
+def unread(client, headers):
+    return client.get('/api/announcements/unread-count', headers=headers).get_json()['unread_count']
+
+
+def test_announcement_writes_refresh_lists_and_unread_count(client, admin, register):
+    _, employee = register('erin')
+    assert cached_get(client, '/api/announcements', employee)['count'] == 0
+    cached_get(client, '/api/announcements/all', admin)
+    assert unread(client, employee) == 0
+    
+    created = client.post('/api/announcements', json={'title': 'Launch', 'message': 'Today'}, headers=admin)
+    announcement = created.get_json()['announcement']
+    listed = fresh_get(client, '/api/announcements', employee)['announcements']
+    assert [(a['title'], a['read']) for a in listed] == [('Launch', False)]
+    assert fresh_get(client, '/api/announcements/all', admin)['count'] == 1
+    assert unread(client, employee) == 1
+    
+    cached_get(client, '/api/announcements', employee)
+    client.post('/api/announcements/mark-read', json={'ids': [announcement['id']]}, headers=employee)
+    assert fresh_get(client, '/api/announcements', employee)['announcements'][0]['read'] is True
+    assert unread(client, employee) == 0
+    
+    cached_get(client, '/api/announcements', employee)
+    cached_get(client, '/api/announcements/all', admin)
+    client.put(f'/api/announcements/{announcement["id"]}', json={'title': 'Launch moved'}, headers=admin)
+    assert fresh_get(client, '/api/announcements', employee)['announcements'][0]['title'] == 'Launch moved'
+    assert fresh_get(client, '/api/announcements/all', admin)['announcements'][0]['title'] == 'Launch moved'
+    
+    client.post('/api/announcements', json={'title': 'Second', 'message': 'Later'}, headers=admin)
+    assert unread(client, employee) == 1
+    cached_get(client, '/api/announcements', employee)
+    client.post('/api/announcements/mark-read', json={'all': True}, headers=employee)
+    assert all(a['read'] for a in fresh_get(client, '/api/announcements', employee)['announcements'])
+    assert unread(client, employee) == 0
+    
+    cached_get(client, '/api/announcements', employee)
+    cached_get(client, '/api/announcements/all?status=active', admin)
+    client.delete(f'/api/announcements/{announcement["id"]}', headers=admin)
+    assert [a['title'] for a in fresh_get(client, '/api/announcements', employee)['announcements']] == ['Second']
+    assert fresh_get(client, '/api/announcements/all?status=active', admin)['count'] == 1
+
+
+def test_analytics_log_refreshes_analytics_reads(client, admin, register):
+    user, employee = register('frank')
+    assert cached_get(client, '/api/analytics/my-stats', employee)['total_usage'] == 0
+    assert cached_get(client, f'/api/analytics/user/{user["id"]}', admin)['total_usage'] == 0
+    assert cached_get(client, '/api/analytics/summary', admin)['total_usage'] == 0
+    assert cached_get(client, '/api/analytics/export', admin)['count'] == 0
+    
+    response = client.post('/api/analytics/log', json={'feature': 'chat', 'metadata': {'ms': 12}}, headers=employee)
+    assert response.status_code == 201
+    
+    assert fresh_get(client, '/api/analytics/my-stats', employee)['total_usage'] == 1
+    assert fresh_get(client, f'/api/analytics/user/{user["id"]}', admin)['total_usage'] == 1
+    assert fresh_get(client, '/api/analytics/summary', admin)['total_usage'] == 1
+    exported = fresh_get(client, '/api/analytics/export', admin)['data']
+    assert [(row['feature'], row['metadata']) for row in exported] == [('chat', {'ms': 12})]
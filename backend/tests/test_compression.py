@@ -0,0 +1,34 @@
+"""
+Response compression
+"""
+import gzip
+import json
+from flask import Response, stream_with_context
+
+BODY = json.dumps({'items': list(range(1000))})
+
+
+def test_compressed_responses_weaken_a_strong_etag(app, client):
+    @app.route('/test/etag')
+    def tagged():
+        response = Response(BODY, mimetype='application/json')
+        response.set_etag('v1')
+        return response
+    
+    @app.route('/test/etag/stream')
+    def streamed():
+        response = Response(stream_with_context(iter([BODY])), mimetype='application/json')
+        response.set_etag('v1')
+        return response
+    
+    plain = client.get('/test/etag', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] == '"v1"'
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    
+    for path in ('/test/etag', '/test/etag/stream'):
+        encoded = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        assert encoded.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(encoded.get_data()).decode() == BODY
+        assert encoded.headers['ETag'] == 'W/"v1"'
+        assert 'Accept-Encoding' in encoded.headers['Vary']
@@ -0,0 +1,43 @@
+"""
+Dashboard bootstrap
+"""
+from app.bootstrap import DEFAULT_ADMIN_EMAIL, DEFAULT_ADMIN_PASSWORD
+from app.metrics import metrics
+from app.tracing import read_traces
+
+LABELS = ('dashboard', 'dashboard.bootstrap', 'GET')
+
+
+def bootstrap(client, headers, sections):
+    response = client.get(f'/api/dashboard/bootstrap?sections={sections}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    response.close()
+    return response
+
+
+def test_section_statements_count_towards_the_request(client, register):
+    _, employee = register('mia')
+    
+    # The token's user lookup, then the three statements of the stats section
+    assert bootstrap(client, employee, 'user').headers['X-Query-Count'] == '1'
+    before = metrics.statements[LABELS][1]
+    assert bootstrap(client, employee, 'stats').headers['X-Query-Count'] == '4'
+    assert metrics.statements[LABELS][1] - before == 4
+
+
+def test_sections_are_traced_with_their_request(make_app, tmp_path):
+    app = make_app(TRACE_SAMPLE_RATE=1.0, TRACE_SLOW_MS=0, TRACE_DIR=str(tmp_path / 'traces'))
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={
+        'email': DEFAULT_ADMIN_EMAIL, 'password': DEFAULT_ADMIN_PASSWORD
+    })
+    admin = {'Authorization': f'Bearer {response.get_json()["access_token"]}'}
+    
+    bootstrap(client, admin, 'tasks,stats')
+    trace = [t for t in read_traces(app.config['TRACE_DIR']) if t['endpoint'] == 'dashboard.bootstrap'][-1]
+    spans = {span['id']: span for span in trace['spans']}
+    sections = {span['attrs']['section']: span['id'] for span in trace['spans'] if span['name'] == 'dashboard.section'}
+    assert sorted(sections) == ['stats', 'tasks']
+    statements = [span for span in trace['spans'] if span['name'] == 'sql' and span['parent'] == sections['stats']]
+    assert len(statements) == 3
+    assert spans[sections['stats']]['parent'] == 0
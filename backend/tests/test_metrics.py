@@ -0,0 +1,80 @@
+"""
+Metrics across worker processes
+"""
+import json
+import os
+import subprocess
+import sys
+from importlib import import_module
+from types import SimpleNamespace
+from app.metrics import Metrics
+
+# The module, not the Metrics instance app/__init__ exports under the same name
+metrics_module = import_module('app.metrics')
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def worker_snapshot(pid, requests):
+    return {
+        'extra': [['jobs_total', 'counter', 'Jobs', [], requests], ['queue_depth', 'gauge', 'Queued', [], 3]],
+        'pid': pid,
+        'in_flight': 1,
+        'latency': [[['users', 'users.get_users', 'GET'], [[requests] + [0] * 11, 0.001 * requests]]],
+        'statements': [],
+        'sql_seconds': [],
+        'responses': [[['users', 'users.get_users', 'GET', '200'], requests]],
+    }
+
+
+def test_exited_workers_are_folded_into_the_retired_totals(make_app, tmp_path):
+    directory = tmp_path / 'metrics'
+    directory.mkdir()
+    app = make_app(METRICS_DIR=str(directory))
+    for pid, requests in ((exited_pid(), 2), (exited_pid(), 5)):
+        (directory / f'metrics-{pid}.json').write_text(json.dumps(worker_snapshot(pid, requests)))
+    metrics = Metrics()
+    metrics.init_app(app)
+    
+    text = metrics.render()
+    assert 'http_requests_total{blueprint="users",endpoint="users.get_users",method="GET",status="200"} 7' in text
+    assert 'jobs_total{} 7' in text and 'queue_depth' not in text
+    assert 'http_requests_in_flight 0' in text
+    assert sorted(os.listdir(directory)) == sorted(['metrics-retired.json', f'metrics-{os.getpid()}.json', 'retire.lock'])
+    assert text == metrics.render()
+
+
+def test_a_reused_pid_does_not_overwrite_an_exited_workers_totals(make_app, tmp_path):
+    app = make_app(METRICS_DIR=str(tmp_path))
+    # Left by an exited worker that had the pid of this process
+    (tmp_path / f'metrics-{os.getpid()}.json').write_text(json.dumps(worker_snapshot(os.getpid(), 4)))
+    metrics = Metrics()
+    metrics.init_app(app)
+    
+    metrics.flush()
+    text = metrics.render()
+    assert 'status="200"} 4' in text and 'jobs_total{} 4' in text
+
+
+def test_retirement_lock_works_without_fcntl(monkeypatch, tmp_path):
+    calls = []
+    msvcrt = SimpleNamespace(LK_LOCK=1, LK_UNLCK=0, locking=lambda fd, mode, size: calls.append((mode, size)))
+    monkeypatch.setattr(metrics_module, 'fcntl', None)
+    monkeypatch.setattr(metrics_module, 'msvcrt', msvcrt, raising=False)
+    
+    with metrics_module._retire_lock(str(tmp_path)):
+        assert calls == [(1, 1)]
+    assert calls == [(1, 1), (0, 1)]
+
+
+def test_production_refuses_scrapes_without_a_token(make_app):
+    client = make_app(METRICS_TOKEN_REQUIRED=True).test_client()
+    assert client.get('/api/metrics').status_code == 403
+    
+    client = make_app(METRICS_TOKEN_REQUIRED=True, METRICS_TOKEN='s3cret').test_client()
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
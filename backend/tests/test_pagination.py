@@ -0,0 +1,62 @@
+"""
+Cursor pagination totals
+"""
+import threading
+import time
+from app.models import db, User
+from app.pagination import ApproximateCounter, MAX_CURSOR_PAGE
+
+
+def test_approximate_counts_refresh_one_at_a_time_with_a_bounded_queue(app):
+    counter = ApproximateCounter(max_pending=4)
+    release = threading.Event()
+    running = []
+    
+    def count():
+        running.append(threading.current_thread().name)
+        release.wait(5)
+        return 1
+    
+    with app.app_context():
+        assert counter.get(0, count, ttl=60) == (None, False)
+        deadline = time.monotonic() + 5
+        while not running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for key in range(1, 20):
+            assert counter.get(key, count, ttl=60) == (None, False)
+    
+    assert running == ['approximate-counts']
+    assert list(counter._pending) == [1, 2, 3, 4]
+    
+    release.set()
+    while counter._pending or counter._running is not None:
+        time.sleep(0.01)
+    assert len(running) == 5
+    with app.app_context():
+        assert counter.get(0, count, ttl=60) == (1, True)
+        assert counter.get(19, count, ttl=60) == (None, False)
+
+
+def test_cursor_search_skips_the_approximate_total(client, admin, register):
+    register('grace')
+    response = client.get('/api/users?cursor=&search=grace', headers=admin)
+    body = response.get_json()
+    assert [user['username'] for user in body['users']] == ['grace']
+    assert body['total'] is None and body['total_approximate'] is True
+    
+    exact = client.get('/api/users?cursor=&search=grace&include_total=1', headers=admin).get_json()
+    assert exact['total'] == 1 and exact['total_approximate'] is False
+
+
+def test_cursor_page_size_is_normalized(app, client, admin):
+    with app.app_context():
+        db.session.add_all(
+            User(email=f'page{i}@example.com', username=f'page{i}', password_hash='x') for i in range(25)
+        )
+        db.session.commit()
+    for per_page, expected in (('0', 20), ('-1', 20), ('-2', 20), ('100000', MAX_CURSOR_PAGE)):
+        response = client.get(f'/api/users?cursor=&per_page={per_page}', headers=admin)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['per_page'] == expected
+        assert len(body['users']) == min(expected, 26)
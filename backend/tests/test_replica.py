@@ -0,0 +1,38 @@
+"""
+Read replica routing
+"""
+import os
+import time
+from app import replica
+from app.replica import ReplicaRouter
+
+
+def test_a_write_on_one_worker_keeps_the_writer_on_the_primary_everywhere(make_app, tmp_path):
+    app = make_app(REPLICA_STICKY_PATH=str(tmp_path / 'writers.db'), REPLICA_STICKY_S=60)
+    workers = [ReplicaRouter(), ReplicaRouter()]
+    for router in workers:
+        router.init_app(app)
+    
+    workers[0].record_write(7)
+    assert workers[1]._wrote_recently(7)
+    assert not workers[1]._wrote_recently(8)
+    
+    app.config['REPLICA_STICKY_S'] = 0
+    assert not workers[1]._wrote_recently(7)
+
+
+def test_one_worker_writes_the_heartbeat(make_app, tmp_path, monkeypatch):
+    app = make_app(REPLICA_STICKY_PATH=str(tmp_path / 'writers.db'), REPLICA_HEARTBEAT_S=1)
+    workers = [ReplicaRouter(), ReplicaRouter()]
+    for router in workers:
+        router.init_app(app)
+    
+    assert workers[0].holds_heartbeat_lease()
+    assert workers[0].holds_heartbeat_lease()
+    # Same host, another process
+    monkeypatch.setattr(os, 'getpid', lambda: 1)
+    assert not workers[1].holds_heartbeat_lease()
+    
+    # The holder stopped renewing; its lease lapses and the next worker takes over
+    monkeypatch.setattr(time, 'time', lambda now=time.time(): now + replica.LEASE_INTERVALS + 1)
+    assert workers[1].holds_heartbeat_lease()
@@ -0,0 +1,81 @@
+"""
+Production server setup
+"""
+import os
+import runpy
+from types import SimpleNamespace
+import pytest
+from app import server
+from app.admission import admission
+from app.cache import response_cache
+from app.cache_bus import InvalidationBus
+
+
+class StubServer:
+    """Records the gunicorn options instead of serving"""
+    options = None
+    
+    def __init__(self, app, options):
+        StubServer.options = options
+    
+    def run(self):
+        pass
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setattr(server, 'Server', StubServer)
+    return server.serve
+
+
+def test_workers_share_an_invalidation_bus(app, serve):
+    assert response_cache.bus is None
+    serve(app, workers=3)
+    
+    path = app.config['CACHE_BUS_PATH']
+    assert path and response_cache.bus is not None and response_cache.bus.path == path
+    
+    # Another worker's write evicts this worker's local copy
+    response_cache.local.set('users:list', 'cached', ('users',), 60, (0,))
+    InvalidationBus(path).publish(['users'])
+    response_cache.bus.poll()
+    assert response_cache.local.get('users:list') is None
+
+
+def test_single_worker_needs_no_bus(app, serve):
+    serve(app, workers=1)
+    assert not app.config['CACHE_BUS_PATH'] and response_cache.bus is None
+
+
+def test_workers_share_read_your_writes_markers(app, serve):
+    app.config['REPLICA_DATABASE_URL'] = 'sqlite:///replica.db'
+    serve(app, workers=3)
+    assert app.config['REPLICA_STICKY_PATH'].endswith('writers.db')
+
+
+
+@pytest.fixture
+def gunicorn_conf(monkeypatch):
+    """Runs gunicorn.conf.py as gunicorn does, restoring the environment afterwards"""
+    for name in ('METRICS_DIR', 'CACHE_BUS_PATH', 'CACHE_SHARED_PATH', 'REPLICA_STICKY_PATH'):
+        monkeypatch.setenv(name, '')
+    
+    def load():
+        return runpy.run_path(os.path.join(os.path.dirname(server.__file__), '..', 'gunicorn.conf.py'))
+    return load
+
+
+def test_gunicorn_config_shares_paths_between_workers(gunicorn_conf, monkeypatch):
+    monkeypatch.setenv('REPLICA_STICKY_PATH', '/srv/writers.db')
+    settings = gunicorn_conf()
+    
+    shared = os.path.dirname(os.environ['CACHE_BUS_PATH'])
+    assert os.path.isdir(shared)
+    assert os.environ['METRICS_DIR'] == os.path.join(shared, 'metrics')
+    assert os.environ['REPLICA_STICKY_PATH'] == '/srv/writers.db'
+    assert {'post_fork', 'post_worker_init'} <= set(settings)
+
+
+def test_gunicorn_workers_fit_admission_to_their_threads(app, gunicorn_conf):
+    gunicorn_conf()['post_worker_init'](SimpleNamespace(wsgi=app, cfg=SimpleNamespace(threads=3)))
+    assert admission.gates['heavy'].limit + admission.gates['heavy'].queue == 2
@@ -0,0 +1,28 @@
+"""
+Task sync from the mobile app
+"""
+
+
+def test_sync_creates_a_batch_of_tasks_within_its_query_budget(client, register):
+    _, headers = register('liam')
+    batch = [{'title': f'Task {i}', 'voice_note_id': f'note-{i % 40}'} for i in range(50)]
+    
+    response = client.post('/api/tasks/sync', json={'tasks': batch}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    tasks = response.get_json()['tasks']
+    assert len(tasks) == 50 and len({task['id'] for task in tasks}) == 40
+    assert [task['title'] for task in tasks[:2]] == ['Task 40', 'Task 41']
+    assert len(client.get('/api/tasks', headers=headers).get_json()['tasks']) == 40
+
+
+def test_sync_matches_ids_sent_as_strings(client, register):
+    _, headers = register('mia')
+    created = client.post('/api/tasks/sync', json={'tasks': [{'title': 'Draft'}]}, headers=headers)
+    task_id = created.get_json()['tasks'][0]['id']
+    
+    response = client.post(
+        '/api/tasks/sync', json={'tasks': [{'id': str(task_id), 'title': 'Final'}]}, headers=headers
+    )
+    assert response.status_code == 200, response.get_json()
+    tasks = client.get('/api/tasks', headers=headers).get_json()['tasks']
+    assert [(task['id'], task['title']) for task in tasks] == [(task_id, 'Final')]
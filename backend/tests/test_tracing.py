@@ -0,0 +1,35 @@
+"""
+Slow-request trace files
+"""
+import os
+import subprocess
+import sys
+from app.tracing import TraceFileHandler
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_trace_directory_stays_under_its_cap_as_workers_come_and_go(tmp_path):
+    # Three recycled workers' files, oldest first, 1000 bytes each
+    for age, name in enumerate(f'traces-{exited_pid()}.jsonl{suffix}' for suffix in ('.1', '', '')):
+        path = tmp_path / name
+        path.write_text('x' * 999 + '\n')
+        os.utime(path, (1000 + age, 1000 + age))
+    newest = sorted(tmp_path.iterdir(), key=lambda p: p.stat().st_mtime)[-1].name
+    
+    handler = TraceFileHandler(
+        str(tmp_path / f'traces-{os.getpid()}.jsonl'), max_dir_bytes=1500, maxBytes=100, backupCount=1
+    )
+    handler.prune()
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([newest, f'traces-{os.getpid()}.jsonl'])
+    
+    # Rotation prunes too; this process's open file is never removed
+    handler.max_dir_bytes = 0
+    handler.stream.write('y' * 200 + '\n')
+    handler.doRollover()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f'traces-{os.getpid()}.jsonl']
+    handler.close()
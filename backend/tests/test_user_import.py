@@ -0,0 +1,30 @@
+"""
+Bulk user import
+"""
+import json
+from app.user_import import hash_pool_context
+
+
+def test_passwords_are_never_hashed_in_a_fork_of_the_server():
+    assert hash_pool_context().get_start_method() != 'fork'
+
+
+def test_import_creates_users_that_can_log_in(make_app):
+    app = make_app(IMPORT_HASH_WORKERS=2)
+    client = app.test_client()
+    admin = client.post('/api/auth/login', json={'email': 'admin@ainsight.ai', 'password': 'admin123'})
+    headers = {'Authorization': f'Bearer {admin.get_json()["access_token"]}'}
+    rows = [
+        {'email': f'imported{i}@example.com', 'username': f'imported{i}', 'password': f'secret{i}', 'full_name': 'Imported'}
+        for i in range(3)
+    ] + [{'email': 'imported0@example.com', 'username': 'again', 'password': 'x', 'full_name': 'Dup'}]
+    body = ''.join(json.dumps(row) + '\n' for row in rows)
+    
+    response = client.post('/api/users/import', data=body, headers={**headers, 'Content-Type': 'application/x-ndjson'})
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+    
+    assert [r.get('status') for r in results[:4]] == ['created', 'created', 'created', 'error']
+    assert results[-1] == {'summary': {'created': 3, 'failed': 1}}
+    login = client.post('/api/auth/login', json={'email': 'imported2@example.com', 'password': 'secret2'})
+    assert login.status_code == 200
@@ -0,0 +1,91 @@
+"""
+Deleted-user purge
+"""
+from app.models import db, User
+from app.user_purge import user_purger
+
+
+def test_tombstone_releases_email_and_username(app, client, admin, register):
+    user, headers = register('henry', role='admin')
+    client.post('/api/announcements', json={'title': 'From Henry', 'message': 'Hi'}, headers=headers)
+    
+    assert client.delete(f'/api/users/{user["id"]}', headers=admin).status_code == 200
+    user_purger.join()
+    
+    with app.app_context():
+        tombstone = db.session.get(User, user['id'])
+        assert (tombstone.status, tombstone.email, tombstone.username) == (
+            'deleted', f'deleted-{user["id"]}@invalid', f'deleted-{user["id"]}'
+        )
+    announcements = client.get('/api/announcements/all', headers=admin).get_json()['announcements']
+    assert announcements[0]['sender_name'] == 'Henry'
+    
+    again, _ = register('henry')
+    assert again['id'] != user['id']
+
+
+def test_unreferenced_user_is_removed(app, client, admin, register):
+    user, _ = register('iris')
+    client.delete(f'/api/users/{user["id"]}', headers=admin)
+    user_purger.join()
+    
+    with app.app_context():
+        assert db.session.get(User, user['id']) is None
+
+
+def test_deleted_admin_loses_access_at_once(app, client, admin, register):
+    user, headers = register('ivan', role='admin')
+    client.post('/api/announcements', json={'title': 'From Ivan', 'message': 'Hi'}, headers=headers)
+    assert client.get('/api/users', headers=headers).status_code == 200
+    
+    client.delete(f'/api/users/{user["id"]}', headers=admin)
+    assert client.get('/api/users', headers=headers).status_code == 401
+    user_purger.join()
+    
+    assert client.get('/api/users', headers=headers).status_code == 401
+    created = client.post('/api/users', json={
+        'email': 'x@example.com', 'username': 'x', 'password': 'password123', 'full_name': 'X'
+    }, headers=headers)
+    assert created.status_code == 401
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    with app.app_context():
+        assert db.session.get(User, user['id']).role == 'employee'
+
+
+def test_inactive_users_tokens_stop_working(client, admin, register):
+    user, headers = register('jack')
+    assert client.get('/api/tasks', headers=headers).status_code == 200
+    client.put(f'/api/users/{user["id"]}/status', json={'status': 'suspended'}, headers=admin)
+    assert client.get('/api/tasks', headers=headers).status_code == 401
+
+
+def test_tombstones_are_not_found_by_user_management(client, admin, register):
+    user, headers = register('kate', role='admin')
+    client.post('/api/announcements', json={'title': 'From Kate', 'message': 'Hi'}, headers=headers)
+    client.delete(f'/api/users/{user["id"]}', headers=admin)
+    user_purger.join()
+    
+    url = f'/api/users/{user["id"]}'
+    assert client.get(url, headers=admin).status_code == 404
+    assert client.put(url, json={'full_name': 'Kate'}, headers=admin).status_code == 404
+    assert client.put(f'{url}/permissions', json={'permissions': {'chat': True}}, headers=admin).status_code == 404
+    assert client.put(f'{url}/status', json={'status': 'active'}, headers=admin).status_code == 404
+    assert client.get('/api/users', headers=headers).status_code == 401
+
+
+def test_interrupted_purges_resume_with_the_first_request(make_app, app, client, register):
+    user, _ = register('lena')
+    # As left by a process that stopped before the purge thread got to it
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == user['id']).values(status='deleted'))
+        db.session.commit()
+    
+    restarted = make_app()
+    user_purger.join()
+    with restarted.app_context():
+        assert db.session.get(User, user['id']) is not None
+    
+    restarted.test_client().get('/api/health')
+    user_purger.join()
+    with restarted.app_context():
+        assert db.session.get(User, user['id']) is None